@@ -0,0 +1,151 @@
+import os
+import shutil
+import tracemalloc
+import numpy as np
+import pytest
+import rasterio
+
+from rasterio.transform import from_origin
+from eo_validation.sampling import generate_points, init_validation_points
+from eo_validation.validation_dashboard import ValidationDashboard
+
+# number of points of every benchmark, e.g. 1000,10000 for a quick run
+SIZES = [
+    int(size) for size in os.getenv(
+        'EO_VALIDATION_BENCHMARK_SIZES',
+        '1000,10000,100000,1000000').split(',')
+]
+
+# annotators the points are split between for the report merge
+N_ANNOTATORS = 8
+
+CRS = 'EPSG:32628'
+
+
+def write_raster(filename: str, size: int, n_bands: int = 7) -> None:
+    """
+    Write a tiled uint16 raster of size by size pixels.
+    """
+    rng = np.random.default_rng(0)
+    with rasterio.open(
+            filename, 'w', driver='GTiff', width=size, height=size,
+            count=n_bands, dtype='uint16', crs=CRS, tiled=True,
+            transform=from_origin(300000, 1600000, 30, 30)) as dst:
+        for band in range(1, n_bands + 1):
+            dst.write(rng.integers(
+                0, 10000, (size, size), dtype=np.uint16), band)
+
+
+def write_mask(filename: str, size: int, block: int = 32) -> None:
+    """
+    Write a class mask of size by size pixels, classes 0 to 3 in square
+    patches of block pixels, with some no-data.
+    """
+    rng = np.random.default_rng(1)
+    patches = rng.choice(
+        [0, 1, 2, 3, 255], p=[0.55, 0.2, 0.15, 0.05, 0.05],
+        size=(size // block + 1, size // block + 1)).astype(np.uint8)
+    mask = np.kron(patches, np.ones((block, block), dtype=np.uint8))
+    with rasterio.open(
+            filename, 'w', driver='GTiff', width=size, height=size,
+            count=1, dtype='uint8', crs=CRS, tiled=True, nodata=255,
+            transform=from_origin(300000, 1600000, 30, 30)) as dst:
+        dst.write(mask[:size, :size], 1)
+
+
+class Campaign(object):
+    """
+    Synthetic campaign of n_points points: raster, mask, original points
+    and one validation file per annotator.
+    """
+
+    def __init__(self, directory: str, n_points: int):
+
+        self.n_points = n_points
+        self.data_dir = os.path.join(directory, 'data')
+        self.mask_dir = os.path.join(directory, 'mask')
+        self.points_dir = os.path.join(directory, 'original_points')
+        self.validation_dir = os.path.join(directory, 'validation')
+        for path in [self.data_dir, self.mask_dir, self.points_dir]:
+            os.makedirs(path)
+
+        # enough valid pixels of every class for the stratified sample
+        size = max(256, int(np.ceil(np.sqrt(n_points * 8))))
+        self.raster_filename = os.path.join(self.data_dir, 'scene.tif')
+        self.mask_filename = os.path.join(self.mask_dir, 'scene_mask.tif')
+        write_raster(self.raster_filename, size)
+        write_mask(self.mask_filename, size)
+
+        self.points = init_validation_points(
+            generate_points(
+                self.raster_filename, self.mask_filename, n_points),
+            'other')
+        self.points_filename = os.path.join(self.points_dir, 'scene.gpkg')
+        self.points.to_file(self.points_filename, layer='validation')
+
+        self.validation_filenames = []
+        for annotator, positions in enumerate(np.array_split(
+                np.arange(n_points), N_ANNOTATORS)):
+            filename = os.path.join(
+                self.validation_dir, f'user{annotator}', 'data', 'region',
+                f'user{annotator}-scene.gpkg')
+            os.makedirs(os.path.dirname(filename))
+            self.points.iloc[positions].to_file(
+                filename, layer='validation')
+            self.validation_filenames.append(filename)
+
+
+@pytest.fixture(scope='session', params=SIZES, ids=lambda size: f'{size}')
+def campaign(request, tmp_path_factory):
+    directory = tmp_path_factory.mktemp(f'campaign-{request.param}')
+    yield Campaign(str(directory), request.param)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def dashboard(campaign, tmp_path):
+    return ValidationDashboard(
+        data_dir=campaign.data_dir,
+        mask_dir=campaign.mask_dir,
+        points_dir=campaign.points_dir,
+        output_dir=str(tmp_path / 'output'),
+        cache_dir=str(tmp_path / 'cache'),
+        preload_whitebox=False
+    )
+
+
+def peak_memory(function, setup=None) -> float:
+    """
+    Run function once and return its peak traced memory in MiB, the
+    Python and numpy allocations of this process. Memory of worker
+    processes and of GDAL is not traced.
+    """
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 ** 2
+
+
+@pytest.fixture
+def measure(benchmark, campaign):
+    """
+    Time function with pytest-benchmark and record its peak memory and
+    number of points in the saved results.
+    """
+    def run(function, setup=None):
+        benchmark.extra_info['n_points'] = campaign.n_points
+        benchmark.extra_info['peak_memory_mib'] = round(
+            peak_memory(function, setup), 2)
+
+        # fewer rounds for the larger campaigns
+        rounds = 5 if campaign.n_points <= 10000 else 1
+        return benchmark.pedantic(
+            function, setup=setup, rounds=rounds, iterations=1,
+            warmup_rounds=0)
+
+    return run
@@ -0,0 +1,38 @@
+import os
+
+
+def test_load_gpkg(campaign, dashboard, measure):
+    points = measure(lambda: dashboard.load_gpkg(campaign.points_filename))
+    assert len(points) == campaign.n_points
+
+
+def test_save_gpkg(campaign, dashboard, measure, tmp_path):
+    df = campaign.points.drop(columns='geometry')
+    dashboard.raster_crs = campaign.points.crs
+    filename = str(tmp_path / 'saved.gpkg')
+
+    def save():
+        dashboard.save_gpkg(df, filename)
+        dashboard.async_writer.flush()
+
+    measure(save)
+    assert os.path.isfile(filename)
+
+
+def test_add_markers_offline(campaign, dashboard, measure):
+
+    # every round starts from the original points, not the saved output
+    def setup():
+        dashboard.async_writer.flush()
+        if dashboard.output_filename is not None \
+                and os.path.isfile(dashboard.output_filename):
+            os.remove(dashboard.output_filename)
+
+    def add_markers():
+        dashboard.add_markers(
+            campaign.raster_filename, n_points=campaign.n_points,
+            offline=True)
+        dashboard.async_writer.flush()
+
+    measure(add_markers, setup)
+    assert len(dashboard._point_store) == campaign.n_points
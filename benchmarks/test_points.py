@@ -0,0 +1,7 @@
+from eo_validation.sampling import generate_points
+
+
+def test_generate_points(campaign, measure):
+    points = measure(lambda: generate_points(
+        campaign.raster_filename, campaign.mask_filename, campaign.n_points))
+    assert len(points) == campaign.n_points
@@ -0,0 +1,22 @@
+import shutil
+
+from eo_validation.validation_database import build_database, \
+    progress_report
+
+
+def test_progress_report(campaign, measure, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    progress = measure(
+        lambda: progress_report(
+            campaign.validation_filenames, cache_dir, n_workers=4),
+        # every round reads the files, not the cached summaries
+        setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    assert progress['n_points'].sum() == campaign.n_points
+
+
+def test_build_database(campaign, measure, tmp_path):
+    database_filename = str(tmp_path / 'database.gpkg')
+    report = measure(lambda: build_database(
+        campaign.validation_filenames, database_filename, n_workers=4,
+        rebuild=True))
+    assert report['added'] == len(campaign.validation_filenames)
@@ -0,0 +1,424 @@
+import sys
+import time
+import warnings
+import argparse
+import rasterio
+import numpy as np
+import pandas as pd
+
+from eo_validation.cache import DEFAULT_CACHE_DIR, FileCache
+from eo_validation.storage import read_table
+from eo_validation.mask_index import get_mask_index
+from eo_validation.sampling import class_histogram, class_offset, \
+    is_verified, reproject_points
+
+# estimates reported per class, each with a standard error and interval
+CLASS_ESTIMATES = [
+    'users_accuracy', 'producers_accuracy', 'area_proportion']
+
+
+def confusion_matrix(
+            map_labels,
+            reference_labels,
+            n_classes: int
+        ) -> np.ndarray:
+    """
+    Count the samples per map (rows) and reference (columns) class.
+    Labels outside 0..n_classes - 1 are ignored.
+    """
+    map_labels = np.asarray(map_labels, dtype=np.int64)
+    reference_labels = np.asarray(reference_labels, dtype=np.int64)
+    keep = (map_labels >= 0) & (map_labels < n_classes) & \
+        (reference_labels >= 0) & (reference_labels < n_classes)
+    return np.bincount(
+        map_labels[keep] * n_classes + reference_labels[keep],
+        minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def _row_proportions(matrix) -> np.ndarray:
+    """
+    Proportion of each reference class in the samples of a map class,
+    zero for map classes without samples.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    totals = matrix.sum(axis=-1, keepdims=True)
+    return np.divide(
+        matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+
+
+def area_weighted_estimates(matrix, pixel_counts) -> dict:
+    """
+    Stratified estimators of Olofsson et al. (2014), the map classes are
+    the strata. Leading dimensions of matrix are treated as a batch, so a
+    stack of bootstrap matrices is estimated at once.
+    Args:
+        matrix (np.ndarray): (..., k, k) confusion matrix, map rows
+        pixel_counts (np.ndarray): mapped pixels per class, the strata size
+    Returns:
+        dict: overall accuracy, user's and producer's accuracies and area
+            proportion of every reference class
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    weights = np.asarray(pixel_counts, dtype=float)
+    weights = weights / weights.sum()
+
+    # estimated proportion of the area in map class i, reference class j
+    proportions = weights[:, None] * _row_proportions(matrix)
+    diagonal = np.diagonal(proportions, axis1=-2, axis2=-1)
+    area_proportion = proportions.sum(axis=-2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'overall_accuracy': diagonal.sum(axis=-1),
+            'users_accuracy': np.diagonal(matrix, axis1=-2, axis2=-1)
+            / matrix.sum(axis=-1),
+            'producers_accuracy': diagonal / area_proportion,
+            'area_proportion': area_proportion
+        }
+
+
+def standard_errors(matrix, pixel_counts) -> dict:
+    """
+    Standard errors of the stratified estimators (Olofsson et al., 2014),
+    undefined (nan) for map classes with less than two samples.
+    Args:
+        matrix (np.ndarray): (k, k) confusion matrix, map rows
+        pixel_counts (np.ndarray): mapped pixels per class, the strata size
+    Returns:
+        dict: standard error of every estimate of area_weighted_estimates
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    pixel_counts = np.asarray(pixel_counts, dtype=float)
+    weights = pixel_counts / pixel_counts.sum()
+    estimates = area_weighted_estimates(matrix, pixel_counts)
+
+    n_samples = matrix.sum(axis=1)
+    degrees = np.where(n_samples > 1, n_samples - 1, np.nan)
+    rows = _row_proportions(matrix)
+    proportions = weights[:, None] * rows
+    users = estimates['users_accuracy']
+    producers = estimates['producers_accuracy']
+
+    # estimated number of pixels of every reference class
+    reference_pixels = (pixel_counts[:, None] * rows).sum(axis=0)
+    omission = pixel_counts[:, None] ** 2 * rows * (1 - rows) \
+        / degrees[:, None]
+    omission = omission.sum(axis=0) - np.diagonal(omission)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        producers_variance = (
+            pixel_counts ** 2 * (1 - producers) ** 2
+            * users * (1 - users) / degrees
+            + producers ** 2 * omission
+        ) / reference_pixels ** 2
+
+    return {
+        'overall_accuracy': np.sqrt(
+            (weights ** 2 * users * (1 - users) / degrees).sum()),
+        'users_accuracy': np.sqrt(users * (1 - users) / degrees),
+        'producers_accuracy': np.sqrt(producers_variance),
+        'area_proportion': np.sqrt((
+            (weights[:, None] * proportions - proportions ** 2)
+            / degrees[:, None]).sum(axis=0))
+    }
+
+
+def bootstrap_matrices(
+            matrix,
+            n_replicates: int = 10000,
+            random_state: int = None
+        ) -> np.ndarray:
+    """
+    Draw stratified bootstrap replicates of a confusion matrix.
+
+    Resampling the points of every map class with replacement is the same
+    as drawing each row from a multinomial with the row proportions, so
+    the replicates are drawn from the matrix alone, at a cost independent
+    of the number of points.
+    Args:
+        matrix (np.ndarray): (k, k) confusion matrix, map rows
+        n_replicates (int): number of bootstrap replicates
+        random_state (int): seed of the random generator
+    Returns:
+        np.ndarray: (n_replicates, k, k) confusion matrices
+    """
+    matrix = np.asarray(matrix, dtype=np.int64)
+    n_classes = matrix.shape[0]
+    n_samples = matrix.sum(axis=1)
+
+    # map classes without samples draw zero points from any distribution
+    probabilities = _row_proportions(matrix)
+    probabilities[n_samples == 0] = 1.0 / n_classes
+
+    return np.random.default_rng(random_state).multinomial(
+        n_samples, probabilities, size=(n_replicates, n_classes))
+
+
+def bootstrap_intervals(
+            matrix,
+            pixel_counts,
+            n_replicates: int = 10000,
+            confidence: float = 0.95,
+            random_state: int = None
+        ) -> dict:
+    """
+    Percentile bootstrap confidence intervals of the stratified estimates.
+    Returns:
+        dict: (low, high) arrays for every estimate of
+            area_weighted_estimates
+    """
+    replicates = area_weighted_estimates(
+        bootstrap_matrices(matrix, n_replicates, random_state),
+        pixel_counts)
+    percentiles = [50 * (1 - confidence), 50 * (1 + confidence)]
+
+    intervals = dict()
+    with warnings.catch_warnings():
+        # estimates undefined in every replicate, e.g. of a reference class
+        # never sampled, get a nan interval
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for name, values in replicates.items():
+            low, high = np.nanpercentile(values, percentiles, axis=0)
+            intervals[name] = (low, high)
+    return intervals
+
+
+def assess_accuracy(
+            map_labels,
+            reference_labels,
+            pixel_counts,
+            class_names: list = None,
+            pixel_area: float = 1.0,
+            n_replicates: int = 10000,
+            confidence: float = 0.95,
+            random_state: int = None
+        ) -> dict:
+    """
+    Accuracy assessment and area estimation of a classification map from
+    stratified validation points (Olofsson et al., 2014).
+    Args:
+        map_labels (np.ndarray): map class of every point, from 0
+        reference_labels (np.ndarray): validated class of every point
+        pixel_counts (np.ndarray): mapped pixels per class, the strata size
+        class_names (list): class names, indexed by the class value
+        pixel_area (float): area of a pixel, areas are in these units
+        n_replicates (int): bootstrap replicates, no intervals if 0
+        confidence (float): confidence level of the intervals
+        random_state (int): seed of the bootstrap
+    Returns:
+        dict: confusion_matrix and classes dataframes and overall dict
+    """
+    pixel_counts = np.asarray(pixel_counts, dtype=np.int64)
+    n_classes = pixel_counts.size
+    if class_names is None:
+        class_names = [str(class_id) for class_id in range(n_classes)]
+
+    matrix = confusion_matrix(map_labels, reference_labels, n_classes)
+    estimates = area_weighted_estimates(matrix, pixel_counts)
+    errors = standard_errors(matrix, pixel_counts)
+    intervals = dict()
+    if n_replicates > 0:
+        intervals = bootstrap_intervals(
+            matrix, pixel_counts, n_replicates, confidence, random_state)
+
+    classes = pd.DataFrame({
+        'class': class_names,
+        'map_pixels': pixel_counts,
+        'n_samples': matrix.sum(axis=1),
+    })
+    for name in CLASS_ESTIMATES:
+        classes[name] = estimates[name]
+        classes[f'{name}_se'] = errors[name]
+        if intervals:
+            classes[f'{name}_low'], classes[f'{name}_high'] = \
+                intervals[name]
+
+    # areas are the proportions scaled by the mapped area
+    total_area = pixel_counts.sum() * pixel_area
+    for suffix in ['', '_se', '_low', '_high']:
+        if f'area_proportion{suffix}' in classes:
+            classes[f'area{suffix}'] = \
+                classes[f'area_proportion{suffix}'] * total_area
+
+    overall = {
+        'overall_accuracy': float(estimates['overall_accuracy']),
+        'overall_accuracy_se': float(errors['overall_accuracy']),
+        'n_samples': int(matrix.sum())
+    }
+    if intervals:
+        low, high = intervals['overall_accuracy']
+        overall['overall_accuracy_low'] = float(low)
+        overall['overall_accuracy_high'] = float(high)
+
+    return {
+        'confusion_matrix': pd.DataFrame(
+            matrix,
+            index=pd.Index(class_names, name='map'),
+            columns=pd.Index(class_names, name='reference')),
+        'classes': classes,
+        'overall': overall
+    }
+
+
+def reference_labels(values, classes) -> np.ndarray:
+    """
+    Convert the validated classes to class values, -1 if not mapped.
+    Args:
+        values (pd.Series): validated class names, e.g. operator
+        classes (list or dict): class names in class value order, or a
+            dict from validated class name to class value
+    """
+    if not isinstance(classes, dict):
+        classes = {name: class_id for class_id, name in enumerate(classes)}
+    return pd.Series(values).map(classes).fillna(-1).to_numpy(np.int64)
+
+
+def mask_counts(mask_filename: str, histogram_cache=None) -> np.ndarray:
+    """
+    Pixel count per class value of a mask, from the histogram cache when
+    available.
+    """
+    counts = None
+    if histogram_cache is not None:
+        counts = histogram_cache.get(mask_filename)
+    if counts is None:
+        counts = class_histogram(mask_filename)
+        if histogram_cache is not None:
+            histogram_cache.put(mask_filename, counts.tolist())
+    return np.asarray(counts, dtype=np.int64)
+
+
+def sample_mask(mask_filename: str, lon, lat, offset: int = 0):
+    """
+    Read the mask class under points, -1 outside the mask or on no-data.
+    """
+    with rasterio.open(mask_filename) as src:
+        x, y = reproject_points(lon, lat, 'EPSG:4326', src.crs.to_wkt())
+        values = np.fromiter(
+            (value[0] for value in src.sample(
+                zip(x, y), indexes=1, masked=False)),
+            dtype=np.int64, count=len(x))
+        inside = (x >= src.bounds.left) & (x <= src.bounds.right) & \
+            (y >= src.bounds.bottom) & (y <= src.bounds.top)
+    values = values - offset
+    return np.where(inside & (values >= 0) & (values < 255 - offset),
+                    values, -1)
+
+
+def map_labels_from_masks(
+            gdf,
+            mask_dir: str,
+            cache_dir: str = None,
+            raster_column: str = 'short_filename'
+        ) -> tuple:
+    """
+    Read the map class of the database points from the masks they were
+    sampled from, and the pixel counts of those masks.
+    Args:
+        gdf (gpd.GeoDataFrame): validation database
+        mask_dir (str): directory with the masks
+        cache_dir (str): cache of the mask histograms and listing
+        raster_column (str): column with the raster stem of every point
+    Returns:
+        tuple: map class per point, -1 without mask, and the pixel counts
+            per class summed over the masks
+    """
+    mask_index = get_mask_index(mask_dir, cache_dir)
+    histogram_cache = None
+    if cache_dir is not None:
+        histogram_cache = FileCache(cache_dir, 'histograms')
+
+    gdf = gdf.to_crs('EPSG:4326')
+    lon, lat = gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()
+    labels = np.full(len(gdf), -1, dtype=np.int64)
+    pixel_counts = np.zeros(0, dtype=np.int64)
+
+    groups = pd.Series(np.arange(len(gdf))).groupby(
+        gdf[raster_column].to_numpy())
+    for raster, positions in groups:
+        mask_filename = mask_index.lookup(raster)
+        if mask_filename is None:
+            continue
+
+        # classes start from 0, as in generate_points
+        counts = mask_counts(mask_filename, histogram_cache)
+        offset = class_offset(counts)
+        counts = counts[offset:]
+        if counts.size > pixel_counts.size:
+            pixel_counts = np.pad(
+                pixel_counts, (0, counts.size - pixel_counts.size))
+        pixel_counts[:counts.size] += counts
+
+        positions = positions.to_numpy()
+        labels[positions] = sample_mask(
+            mask_filename, lon[positions], lat[positions], offset)
+
+    return labels, np.trim_zeros(pixel_counts, 'b')
+
+
+def main(argv=None):
+    """
+    Command line entry point for the accuracy assessment.
+    """
+    parser = argparse.ArgumentParser(
+        description='Accuracy assessment and area estimation of a map '
+                    'from the validation database.')
+    parser.add_argument(
+        '--database', type=str, required=True, help='validation database')
+    parser.add_argument(
+        '--mask-dir', type=str, required=True, help='mask directory')
+    parser.add_argument(
+        '--classes', type=str, nargs='+', required=True,
+        help='validated class names in the order of the mask classes')
+    parser.add_argument(
+        '--reference-column', type=str, default='operator',
+        help='database column with the validated class')
+    parser.add_argument(
+        '--pixel-area', type=float, default=1.0,
+        help='area of a mask pixel, areas are reported in its units')
+    parser.add_argument('--n-replicates', type=int, default=10000)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--random-state', type=int, default=None)
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        '--output', type=str, default=None, help='per class estimates CSV')
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    gdf = read_table(args.database)
+    gdf = gdf[is_verified(gdf['verified']).to_numpy()]
+
+    map_labels, pixel_counts = map_labels_from_masks(
+        gdf, args.mask_dir, args.cache_dir)
+    n_classes = len(args.classes)
+    pixel_counts = np.pad(
+        pixel_counts, (0, max(0, n_classes - pixel_counts.size))
+    )[:n_classes]
+
+    assessment = assess_accuracy(
+        map_labels,
+        reference_labels(gdf[args.reference_column], args.classes),
+        pixel_counts,
+        class_names=args.classes,
+        pixel_area=args.pixel_area,
+        n_replicates=args.n_replicates,
+        confidence=args.confidence,
+        random_state=args.random_state
+    )
+
+    print(assessment['confusion_matrix'].to_string())
+    print(assessment['classes'].to_string(index=False))
+    overall = assessment['overall']
+    print(
+        f"overall accuracy {overall['overall_accuracy']:.4f} "
+        f"(SE {overall['overall_accuracy_se']:.4f}) from "
+        f"{overall['n_samples']} of {len(gdf)} verified points in "
+        f"{time.time() - start_time:.1f}s")
+
+    if args.output is not None:
+        assessment['classes'].to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
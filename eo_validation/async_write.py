@@ -1,16 +1,190 @@
+import os
+import atexit
+import logging
 import threading
 
+from collections import OrderedDict
+from eo_validation.storage import write_table
+
+logger = logging.getLogger(__name__)
+
+_path_locks = dict()
+_path_locks_lock = threading.Lock()
+
+
+def path_lock(filename: str) -> threading.RLock:
+    """
+    Return the lock of this process serializing the writers of filename,
+    e.g. the background writer and the journal compaction.
+    """
+    filename = os.path.abspath(filename)
+    with _path_locks_lock:
+        if filename not in _path_locks:
+            _path_locks[filename] = threading.RLock()
+        return _path_locks[filename]
+
+
+def atomic_to_file(
+            gdf_object,
+            output_filename: str,
+            layer: str = 'validation',
+            driver: str = 'GPKG'
+        ) -> None:
+    """
+    Write a GeoDataFrame through a temporary file and an atomic rename,
+    an interrupted write never leaves a truncated output behind. The
+    format, GeoPackage or (Geo)Parquet, follows the extension. Writers of
+    the same file in this process are serialized, the temporary file is
+    unique to the process and thread.
+    """
+    extension = os.path.splitext(output_filename)[1]
+    tmp_filename = os.path.join(
+        os.path.dirname(output_filename),
+        f'.{os.path.basename(output_filename)}.{os.getpid()}.'
+        f'{threading.get_ident()}.tmp{extension}')
+    with path_lock(output_filename):
+        try:
+            write_table(gdf_object, tmp_filename, layer=layer, driver=driver)
+            os.replace(tmp_filename, output_filename)
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
 
 # Inheriting the base class 'Thread'
 class AsyncWriteGDF(threading.Thread):
+    """
+    Background writer for GeoDataFrame snapshots.
+
+    Save requests are queued per output file and coalesced, only the
+    newest snapshot of each file is written. The queue is bounded by the
+    number of distinct files, save blocks when it is full. Pending
+    snapshots are flushed when the interpreter (kernel) shuts down.
+    Failed writes are kept in errors until taken with pop_errors, and
+    reported to on_error from the writer thread.
+    Args:
+        max_pending (int): maximum number of files waiting to be written
+        on_error (callable): called with the filename and the exception
+            of every failed write
+    """
 
-    def __init__(self):
+    def __init__(self, max_pending: int = 16, on_error=None):
 
         # calling superclass init
-        threading.Thread.__init__(self)
+        threading.Thread.__init__(self, daemon=True)
+
+        self.max_pending = max_pending
+        self.on_error = on_error
+        self.errors = []
+
+        self._pending = OrderedDict()
+        self._in_progress = None
+        self._closed = False
+        self._condition = threading.Condition()
+
+        atexit.register(self.close)
+        self.start()
 
-    def save(self, gdf_object, output_filename):
+    def save(
+                self,
+                gdf_object,
+                output_filename: str,
+                layer: str = 'validation',
+                driver: str = 'GPKG'
+            ) -> None:
+        """
+        Queue a snapshot of gdf_object to be written to output_filename.
+        """
+        snapshot = gdf_object.copy()
+        with self._condition:
 
-        gdf_object.to_file(
-            output_filename, layer='validation', driver="GPKG")
+            if self._closed:
+                raise RuntimeError('AsyncWriteGDF is closed')
+
+            # a newer snapshot replaces the queued one for the same file
+            while output_filename not in self._pending \
+                    and len(self._pending) >= self.max_pending:
+                self._condition.wait()
+
+            self._pending[output_filename] = (snapshot, layer, driver)
+            self._condition.notify_all()
         return
+
+    def is_pending(self, output_filename: str) -> bool:
+        """
+        Check if a write to output_filename is queued or in progress.
+        """
+        with self._condition:
+            return output_filename in self._pending \
+                or self._in_progress == output_filename
+
+    def run_if_idle(self, output_filename: str, function) -> bool:
+        """
+        Call function while no write to output_filename is queued or in
+        progress, no new snapshot can be queued until it returns.
+        """
+        with self._condition:
+            if output_filename in self._pending \
+                    or self._in_progress == output_filename:
+                return False
+            function()
+            return True
+
+    def pop_errors(self) -> list:
+        """
+        Return the (filename, exception) of the failed writes not
+        reported yet.
+        """
+        with self._condition:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every queued snapshot has been written.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and self._in_progress is None,
+                timeout=timeout)
+
+    def close(self, timeout: float = None) -> None:
+        """
+        Flush the pending snapshots and stop the writer thread.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self.join(timeout)
+        atexit.unregister(self.close)
+
+    def run(self) -> None:
+        while True:
+
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                output_filename, (gdf_object, layer, driver) = \
+                    self._pending.popitem(last=False)
+                self._in_progress = output_filename
+                self._condition.notify_all()
+
+            try:
+                atomic_to_file(gdf_object, output_filename, layer, driver)
+            except Exception as e:
+                logger.exception(f'Failed to write {output_filename}')
+                with self._condition:
+                    self.errors.append((output_filename, e))
+                if self.on_error is not None:
+                    try:
+                        self.on_error(output_filename, e)
+                    except Exception:
+                        logger.exception('Failed to report a write error')
+
+            with self._condition:
+                self._in_progress = None
+                self._condition.notify_all()
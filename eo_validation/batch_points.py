@@ -0,0 +1,268 @@
+import os
+import sys
+import time
+import argparse
+import resource
+import pandas as pd
+
+from glob import glob
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from eo_validation.async_write import atomic_to_file
+from eo_validation.storage import format_extension
+from eo_validation.cache import DEFAULT_CACHE_DIR, FileCache
+from eo_validation.mask_index import get_mask_index
+from eo_validation.sampling import generate_points, init_validation_points
+
+SUMMARY_COLUMNS = [
+    'raster', 'mask', 'output', 'status', 'n_points', 'seconds', 'error']
+
+
+def match_masks(
+            raster_filenames: list, mask_dir: str, cache_dir: str = None
+        ) -> dict:
+    """
+    Match each raster with its mask, see MaskIndex for the rules.
+    The mask directory is listed once for all the rasters.
+    """
+    mask_index = get_mask_index(mask_dir, cache_dir)
+    return {
+        raster_filename: mask_index.lookup(raster_filename)
+        for raster_filename in raster_filenames
+    }
+
+
+def _limit_memory(memory_limit: int) -> None:
+    """
+    Worker initializer, cap the address space of the process in bytes.
+    """
+    if memory_limit is not None:
+        resource.setrlimit(
+            resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def process_raster(
+            raster_filename: str,
+            mask_filename: str,
+            output_filename: str,
+            n_points: int = None,
+            expected_accuracies: list = [0.90, 0.90, 0.90, 0.90],
+            expected_standard_error: float = 0.01,
+            default_class: str = 'other',
+            chunks: dict = None,
+            cache_dir: str = None
+        ) -> dict:
+    """
+    Generate and write the original points of a single raster.
+    """
+    start_time = time.time()
+    report = {
+        'raster': raster_filename,
+        'mask': mask_filename,
+        'output': output_filename,
+        'status': 'done',
+        'n_points': 0,
+        'seconds': 0.0,
+        'error': None
+    }
+
+    try:
+        validation_points = init_validation_points(
+            generate_points(
+                raster_filename,
+                mask_filename,
+                n_points,
+                expected_accuracies=expected_accuracies,
+                expected_standard_error=expected_standard_error,
+                chunks=chunks,
+                histogram_cache=FileCache(cache_dir, 'histograms')
+            ),
+            default_class
+        )
+        atomic_to_file(validation_points, output_filename)
+        report['n_points'] = validation_points.shape[0]
+    except Exception as e:
+        report['status'] = 'failed'
+        report['error'] = f'{type(e).__name__}: {e}'
+
+    report['seconds'] = round(time.time() - start_time, 2)
+    return report
+
+
+def generate_campaign_points(
+            data_dir: str,
+            mask_dir: str,
+            points_dir: str,
+            pattern: str = '*.tif',
+            n_workers: int = None,
+            memory_limit: int = None,
+            overwrite: bool = False,
+            storage_format: str = 'gpkg',
+            report_filename: str = None,
+            **kwargs
+        ) -> pd.DataFrame:
+    """
+    Generate points_dir/<stem>.gpkg, or .parquet, for every raster
+    under data_dir.
+    Rasters with an existing output are skipped unless overwrite is set,
+    so an interrupted campaign can be resumed by running it again. A
+    worker dying, e.g. killed for its memory, fails the rasters still
+    queued, they are generated on the next run.
+    Args:
+        data_dir (str): directory with the rasters
+        mask_dir (str): directory with the masks, <stem>*.tif
+        points_dir (str): output directory for the point files
+        pattern (str): glob pattern of the rasters inside data_dir
+        n_workers (int): number of processes, all cores if None
+        memory_limit (int): address space limit per worker in bytes
+        overwrite (bool): regenerate existing outputs
+        storage_format (str): output format, gpkg or parquet
+        report_filename (str): summary CSV, written even if the run is
+            interrupted
+        kwargs: forwarded to process_raster
+    Returns:
+        pd.DataFrame: one summary row per raster
+    """
+    os.makedirs(points_dir, exist_ok=True)
+    extension = format_extension(storage_format)
+
+    raster_filenames = sorted(
+        glob(os.path.join(data_dir, pattern), recursive=True))
+    matches = match_masks(
+        raster_filenames, mask_dir, kwargs.get('cache_dir'))
+
+    reports, futures = [], dict()
+    try:
+        with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_limit_memory,
+                initargs=(memory_limit,)) as executor:
+
+            for raster_filename, mask_filename in matches.items():
+
+                output_filename = os.path.join(
+                    points_dir, f'{Path(raster_filename).stem}{extension}')
+
+                if not overwrite and os.path.isfile(output_filename):
+                    reports.append({
+                        'raster': raster_filename,
+                        'mask': mask_filename,
+                        'output': output_filename,
+                        'status': 'skipped'
+                    })
+                    continue
+
+                future = executor.submit(
+                    process_raster, raster_filename, mask_filename,
+                    output_filename, **kwargs)
+                futures[future] = (
+                    raster_filename, mask_filename, output_filename)
+
+            for future in as_completed(futures):
+                try:
+                    report = future.result()
+                except BrokenProcessPool as e:
+                    raster_filename, mask_filename, output_filename = \
+                        futures[future]
+                    report = {
+                        'raster': raster_filename,
+                        'mask': mask_filename,
+                        'output': output_filename,
+                        'status': 'failed',
+                        'n_points': 0,
+                        'seconds': 0.0,
+                        'error': f'{type(e).__name__}: {e}'
+                    }
+                reports.append(report)
+                print(
+                    f"{report['status']}: {report['raster']} "
+                    f"({report['n_points']} points, {report['seconds']}s)",
+                    flush=True)
+
+    # keep the rasters done so far when the run stops
+    finally:
+        summary = pd.DataFrame(reports, columns=SUMMARY_COLUMNS)
+        if report_filename is not None:
+            summary.to_csv(report_filename, index=False)
+
+    return summary
+
+
+def main(argv=None):
+    """
+    Command line entry point for campaign point generation.
+    """
+    parser = argparse.ArgumentParser(
+        description='Generate validation points for a whole campaign.')
+    parser.add_argument(
+        '--data-dir', type=str, required=True, help='raster directory')
+    parser.add_argument(
+        '--mask-dir', type=str, required=True, help='mask directory')
+    parser.add_argument(
+        '--points-dir', type=str, required=True, help='output directory')
+    parser.add_argument(
+        '--pattern', type=str, default='*.tif',
+        help='glob pattern of the rasters inside data-dir')
+    parser.add_argument(
+        '--n-points', type=int, default=None,
+        help='static number of points, Olofsson allocation if not given')
+    parser.add_argument(
+        '--expected-accuracies', type=float, nargs='+',
+        default=[0.90, 0.90, 0.90, 0.90])
+    parser.add_argument(
+        '--expected-standard-error', type=float, default=0.01)
+    parser.add_argument('--default-class', type=str, default='other')
+    parser.add_argument(
+        '--chunk-size', type=int, default=2048,
+        help='window size in pixels used to read the masks')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        '--n-workers', type=int, default=os.cpu_count(),
+        help='number of worker processes')
+    parser.add_argument(
+        '--memory-limit', type=float, default=None,
+        help='memory limit per worker in GB')
+    parser.add_argument(
+        '--overwrite', action='store_true',
+        help='regenerate existing point files')
+    parser.add_argument(
+        '--format', type=str, default='gpkg', choices=['gpkg', 'parquet'],
+        help='storage format of the point files')
+    parser.add_argument(
+        '--report', type=str, default=None,
+        help='summary CSV, points-dir/summary.csv by default')
+    args = parser.parse_args(argv)
+
+    memory_limit = None
+    if args.memory_limit is not None:
+        memory_limit = int(args.memory_limit * 1024 ** 3)
+
+    report_filename = args.report
+    if report_filename is None:
+        report_filename = os.path.join(args.points_dir, 'summary.csv')
+
+    summary = generate_campaign_points(
+        args.data_dir,
+        args.mask_dir,
+        args.points_dir,
+        pattern=args.pattern,
+        n_workers=args.n_workers,
+        memory_limit=memory_limit,
+        overwrite=args.overwrite,
+        storage_format=args.format,
+        report_filename=report_filename,
+        n_points=args.n_points,
+        expected_accuracies=args.expected_accuracies,
+        expected_standard_error=args.expected_standard_error,
+        default_class=args.default_class,
+        chunks={'band': 1, 'x': args.chunk_size, 'y': args.chunk_size},
+        cache_dir=args.cache_dir
+    )
+
+    print(summary['status'].value_counts().to_string())
+    return int((summary['status'] == 'failed').any())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
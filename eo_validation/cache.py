@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'eo-validation')
+
+# optimized copies of the rasters written by eo-validation-prepare
+DEFAULT_COG_DIR = os.path.join(
+    os.path.expanduser('~'), 'eo-validation', 'cogs')
+
+
+def file_signature(filename: str) -> dict:
+    """
+    Return the path, size and modification time identifying a file.
+    """
+    filename = os.path.abspath(filename)
+    file_stat = os.stat(filename)
+    return {
+        'filename': filename,
+        'size': file_stat.st_size,
+        'mtime': file_stat.st_mtime_ns
+    }
+
+
+class FileCache(object):
+    """
+    JSON cache of values computed from a file.
+
+    Entries are keyed by the absolute path of the file, and by key when
+    values are computed from the same file with different parameters,
+    and invalidated when its size or modification time changes.
+    Args:
+        cache_dir (str): root cache directory
+        namespace (str): subdirectory for this kind of entries
+    """
+
+    def __init__(self, cache_dir: str = None, namespace: str = 'default'):
+
+        if cache_dir is None:
+            cache_dir = DEFAULT_CACHE_DIR
+
+        self.cache_dir = os.path.join(cache_dir, namespace)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_filename(self, filename: str, key: str = None) -> str:
+        name = os.path.abspath(filename)
+        if key is not None:
+            name = f'{name}\0{key}'
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}.json')
+
+    def get(self, filename: str, signature: dict = None, key: str = None):
+        """
+        Return the cached value for filename, None if missing or stale.
+        signature identifies the current state of filename, its
+        file_signature by default.
+        """
+        entry_filename = self._entry_filename(filename, key)
+        if not os.path.isfile(entry_filename):
+            return None
+
+        try:
+            with open(entry_filename, 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+
+        if signature is None:
+            signature = file_signature(filename)
+        if entry.get('signature') != signature:
+            return None
+        return entry['value']
+
+    def put(
+                self,
+                filename: str,
+                value,
+                signature: dict = None,
+                key: str = None
+            ) -> None:
+        """
+        Store a JSON serializable value for filename.
+        """
+        if signature is None:
+            signature = file_signature(filename)
+        entry = {'signature': signature, 'value': value}
+
+        # write to a temporary file and rename, readers never see a
+        # partial entry
+        fd, tmp_filename = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(tmp_filename, self._entry_filename(filename, key))
+        except OSError:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
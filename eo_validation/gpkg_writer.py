@@ -0,0 +1,276 @@
+import os
+import math
+import struct
+import sqlite3
+
+from eo_validation.storage import is_parquet
+
+# declared GeoPackage column types and the python values they accept
+_COLUMN_TYPES = {
+    'BOOLEAN': (bool, int),
+    'TINYINT': (bool, int),
+    'SMALLINT': (bool, int),
+    'MEDIUMINT': (bool, int),
+    'INT': (bool, int),
+    'INTEGER': (bool, int),
+    'FLOAT': (int, float),
+    'DOUBLE': (int, float),
+    'REAL': (int, float),
+    'TEXT': (str,),
+    'DATE': (str,),
+    'DATETIME': (str,),
+}
+
+
+class SchemaChangedError(Exception):
+    """
+    The row cannot be updated in place, the file needs a full write.
+    """
+    pass
+
+
+def _envelope_value(blob, position: int):
+    """
+    Read a value of the envelope stored in a GeoPackage geometry header,
+    position is 0 to 3 for minx, maxx, miny and maxy.
+    """
+    if blob is None or (blob[3] >> 1) & 0x07 == 0:
+        return None
+    byte_order = '<' if blob[3] & 0x01 else '>'
+    return struct.unpack_from(f'{byte_order}d', blob, 8 + 8 * position)[0]
+
+
+def _register_geometry_functions(connection) -> None:
+    """
+    The rtree triggers of a GeoPackage call the ST_* functions that GDAL
+    provides, register minimal versions so plain sqlite3 can update rows.
+    """
+    connection.create_function(
+        'ST_IsEmpty', 1,
+        lambda blob: None if blob is None else int(bool(blob[3] & 0x10)),
+        deterministic=True)
+    for position, name in enumerate(
+            ['ST_MinX', 'ST_MaxX', 'ST_MinY', 'ST_MaxY']):
+        connection.create_function(
+            name, 1,
+            lambda blob, position=position: _envelope_value(blob, position),
+            deterministic=True)
+
+
+def _to_sql_value(value):
+    """
+    Convert numpy scalars and missing values to sqlite friendly values.
+    """
+    if hasattr(value, 'item'):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _accepts(declared_type: str, value) -> bool:
+    """
+    Check if a value fits the declared type of a GeoPackage column.
+    """
+    if value is None:
+        return True
+    # TEXT(255) and similar declarations
+    declared_type = declared_type.split('(')[0].upper()
+    accepted = _COLUMN_TYPES.get(declared_type)
+    if accepted is None:
+        return False
+    if isinstance(value, bool) and bool not in accepted:
+        return False
+    return isinstance(value, accepted)
+
+
+def layer_columns(
+            filename: str,
+            layer: str = 'validation',
+            timeout: float = 30.0
+        ) -> dict:
+    """
+    Return the declared type of every column of a GeoPackage layer.
+    """
+    connection = sqlite3.connect(filename, timeout=timeout)
+    try:
+        return {
+            row[1]: row[2] for row in connection.execute(
+                f'PRAGMA table_info("{layer}")')
+        }
+    finally:
+        connection.close()
+
+
+def accepts_column(declared_type: str, values) -> bool:
+    """
+    Check if a column of declared_type can store a pandas column without
+    a type conversion, a column holds a single type so its first value
+    decides, missing values always fit.
+    """
+    values = values.dropna()
+    if values.empty:
+        return True
+    return _accepts(declared_type, _to_sql_value(values.iloc[0]))
+
+
+def update_feature(
+            filename: str,
+            values: dict,
+            key_column: str,
+            key_value,
+            layer: str = 'validation',
+            timeout: float = 30.0
+        ) -> None:
+    """
+    Update the attributes of a single feature of a GeoPackage in place.
+    The update runs in a transaction on the SQLite tables of the layer,
+    the cost does not depend on the number of features in the file.
+    Args:
+        filename (str): GeoPackage filename
+        values (dict): column to new value, geometry is not updated
+        key_column (str): column identifying the feature, e.g. fid or ID
+        key_value: value of key_column for the feature
+        layer (str): layer (table) name
+        timeout (float): seconds to wait for a locked database
+    Raises:
+        FileNotFoundError: the GeoPackage does not exist yet
+        SchemaChangedError: columns or types differ, the feature is
+            missing or the file is Parquet, the file needs a full write
+    """
+    update_features(filename, {key_value: values}, key_column, layer, timeout)
+
+
+def update_features(
+            filename: str,
+            rows: dict,
+            key_column: str,
+            layer: str = 'validation',
+            timeout: float = 30.0
+        ) -> None:
+    """
+    Update the attributes of several features in a single transaction.
+    Args:
+        filename (str): GeoPackage filename
+        rows (dict): key_value to a dict of column to new value
+        key_column (str): column identifying the features
+        layer (str): layer (table) name
+        timeout (float): seconds to wait for a locked database
+    Raises:
+        FileNotFoundError: the GeoPackage does not exist yet
+        SchemaChangedError: columns or types differ, a feature is
+            missing or the file is Parquet, nothing is written and the
+            file needs a full write
+    """
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(filename)
+
+    # Parquet files cannot be updated in place
+    if is_parquet(filename):
+        raise SchemaChangedError(f'{filename} is not a GeoPackage')
+
+    rows = {
+        _to_sql_value(key_value): {
+            column: _to_sql_value(value) for column, value in values.items()
+        }
+        for key_value, values in rows.items()
+    }
+
+    connection = sqlite3.connect(filename, timeout=timeout)
+    _register_geometry_functions(connection)
+    try:
+        with connection:
+
+            # take the write lock before reading the schema
+            connection.execute('BEGIN IMMEDIATE')
+
+            columns = {
+                row[1]: row[2] for row in connection.execute(
+                    f'PRAGMA table_info("{layer}")')
+            }
+            if key_column not in columns:
+                raise SchemaChangedError(f'{key_column} not in {layer}')
+
+            # index the lookup column once, fid is already the primary key
+            if key_column != 'fid':
+                connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{layer}_{key_column}" '
+                    f'ON "{layer}" ("{key_column}")')
+
+            for key_value, values in rows.items():
+
+                for column, value in values.items():
+                    if column not in columns:
+                        raise SchemaChangedError(f'{column} not in {layer}')
+                    if not _accepts(columns[column], value):
+                        raise SchemaChangedError(
+                            f'{column} ({columns[column]}) does not accept '
+                            f'{type(value).__name__}')
+
+                assignments = ', '.join(
+                    f'"{column}" = ?' for column in values)
+                cursor = connection.execute(
+                    f'UPDATE "{layer}" SET {assignments} '
+                    f'WHERE "{key_column}" = ?',
+                    list(values.values()) + [key_value]
+                )
+                if cursor.rowcount != 1:
+                    raise SchemaChangedError(
+                        f'{cursor.rowcount} features with '
+                        f'{key_column} = {key_value}')
+
+            # keep the GeoPackage metadata consistent
+            connection.execute(
+                'UPDATE gpkg_contents SET last_change = '
+                "strftime('%Y-%m-%dT%H:%M:%fZ', 'now') "
+                'WHERE table_name = ?', (layer,))
+    finally:
+        connection.close()
+
+
+def delete_features(
+            filename: str,
+            key_column: str,
+            key_values: list,
+            layer: str = 'validation',
+            timeout: float = 30.0
+        ) -> int:
+    """
+    Delete the features of a GeoPackage whose key_column is in key_values,
+    in a single transaction.
+    Args:
+        filename (str): GeoPackage filename
+        key_column (str): column identifying the features
+        key_values (list): values of key_column to delete
+        layer (str): layer (table) name
+        timeout (float): seconds to wait for a locked database
+    Returns:
+        int: number of deleted features
+    """
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(filename)
+
+    connection = sqlite3.connect(filename, timeout=timeout)
+    _register_geometry_functions(connection)
+    try:
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+
+            if key_column != 'fid':
+                connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{layer}_{key_column}" '
+                    f'ON "{layer}" ("{key_column}")')
+
+            deleted = 0
+            for key_value in key_values:
+                deleted += connection.execute(
+                    f'DELETE FROM "{layer}" WHERE "{key_column}" = ?',
+                    (_to_sql_value(key_value),)).rowcount
+
+            connection.execute(
+                'UPDATE gpkg_contents SET last_change = '
+                "strftime('%Y-%m-%dT%H:%M:%fZ', 'now') "
+                'WHERE table_name = ?', (layer,))
+    finally:
+        connection.close()
+    return deleted
@@ -0,0 +1,313 @@
+import os
+import json
+import atexit
+import logging
+import threading
+import pandas as pd
+
+from eo_validation.async_write import atomic_to_file, path_lock
+from eo_validation.gpkg_writer import SchemaChangedError, update_features
+from eo_validation.storage import read_table
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    """
+    Serialize numpy scalars and timestamps found in the edits.
+    """
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _read_entries(filename: str) -> list:
+    """
+    Read the entries of a journal file, a torn last line is ignored.
+    """
+    if not os.path.isfile(filename):
+        return []
+
+    entries = []
+    with open(filename, 'r') as journal_file:
+        for line in journal_file:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.warning(f'Skipping incomplete entry in {filename}')
+    return entries
+
+
+def _torn_tail(filename: str) -> bool:
+    """
+    Check if the last line of a journal file was cut short, a session
+    killed while appending leaves it without its newline.
+    """
+    try:
+        with open(filename, 'rb') as journal_file:
+            journal_file.seek(-1, os.SEEK_END)
+            return journal_file.read(1) != b'\n'
+    except OSError:
+        # missing or empty
+        return False
+
+
+def read_journal(filename: str) -> list:
+    """
+    Return the edits of filename that have not been compacted yet.
+    """
+    return _read_entries(f'{filename}.journal.compacting') \
+        + _read_entries(f'{filename}.journal')
+
+
+def journal_signature(filename: str) -> list:
+    """
+    Return the size and modification time of the journal files of
+    filename, empty when every edit has been compacted.
+    """
+    signature = []
+    for journal_filename in [
+            f'{filename}.journal.compacting', f'{filename}.journal']:
+        try:
+            file_stat = os.stat(journal_filename)
+        except FileNotFoundError:
+            continue
+        signature.append([
+            os.path.basename(journal_filename), file_stat.st_size,
+            file_stat.st_mtime_ns])
+    return signature
+
+
+def fold_entries(entries: list) -> dict:
+    """
+    Merge the edits per feature, later edits win.
+    Returns:
+        dict: key column to {key value: {column: value}}
+    """
+    folded = dict()
+    for entry in entries:
+        rows = folded.setdefault(entry['key'], dict())
+        rows.setdefault(entry['id'], dict()).update(entry['values'])
+    return folded
+
+
+def replay_journal(gdf, filename: str, entries: list = None):
+    """
+    Apply the uncompacted edits of filename to a GeoDataFrame read from it,
+    entries are read from its journal if not given.
+    """
+    if entries is None:
+        entries = read_journal(filename)
+    for key_column, rows in fold_entries(entries).items():
+
+        # fids are assigned in row order on full writes
+        if key_column == 'fid':
+            positions = [key_value - 1 for key_value in rows]
+        else:
+            positions = pd.Index(gdf[key_column]).get_indexer(list(rows))
+
+        for position, values in zip(positions, rows.values()):
+            if position < 0 or position >= gdf.shape[0]:
+                continue
+            for column, value in values.items():
+                if column not in gdf.columns:
+                    gdf[column] = None
+                try:
+                    gdf.at[gdf.index[position], column] = value
+                except (TypeError, ValueError):
+                    # the edit does not fit the stored dtype
+                    gdf[column] = gdf[column].astype(object)
+                    gdf.at[gdf.index[position], column] = value
+    return gdf
+
+
+def read_journaled_table(
+            filename: str,
+            columns: list = None,
+            geometry: bool = True
+        ):
+    """
+    Read a validation file with the edits of its journal applied, a
+    session killed before compacting leaves its last edits there.
+    """
+    entries = read_journal(filename)
+    if not entries:
+        return read_table(filename, columns=columns, geometry=geometry)
+
+    # the edits may be keyed by and change any column
+    gdf = replay_journal(
+        read_table(filename, geometry=geometry), filename, entries)
+    if columns is not None:
+        columns = [column for column in columns if column in gdf.columns]
+        if geometry:
+            columns.append(gdf.geometry.name)
+        gdf = gdf[columns]
+    return gdf
+
+
+class EditJournal(object):
+    """
+    Append-only journal of the edits made to a validation GeoPackage.
+
+    Every edit is a JSON line appended to <filename>.journal. A background
+    thread periodically folds the journal into the GeoPackage with a single
+    transaction, Parquet files are rewritten instead, and moves the folded
+    lines to <filename>.history, which keeps the full audit trail of the
+    session.
+    Args:
+        filename (str): validation GeoPackage filename
+        user (str): username stored with every edit
+        writer (AsyncWriteGDF): writer queueing full snapshots of filename
+        layer (str): layer name inside the GeoPackage
+        compact_interval (float): seconds between compactions
+        fsync (bool): fsync every edit, slower but survives a host crash
+    """
+
+    def __init__(
+                self,
+                filename: str,
+                user: str = None,
+                writer=None,
+                layer: str = 'validation',
+                compact_interval: float = 30.0,
+                fsync: bool = False
+            ):
+
+        self.filename = filename
+        self.user = user
+        self.writer = writer
+        self.layer = layer
+        self.compact_interval = compact_interval
+        self.fsync = fsync
+
+        self.journal_filename = f'{filename}.journal'
+        self.compacting_filename = f'{filename}.journal.compacting'
+        self.history_filename = f'{filename}.history'
+
+        self._journal_file = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def append(
+                self,
+                key_column: str,
+                key_value,
+                values: dict,
+                seconds_taken: float = None
+            ) -> None:
+        """
+        Append a single edit to the journal.
+        """
+        entry = json.dumps({
+            'key': key_column,
+            'id': key_value,
+            'values': values,
+            'timestamp': str(pd.Timestamp.now()),
+            'seconds_taken': seconds_taken,
+            'user': self.user
+        }, default=_json_default)
+
+        with self._lock:
+            if self._journal_file is None:
+                torn = _torn_tail(self.journal_filename)
+                self._journal_file = open(self.journal_filename, 'a')
+                # end the torn line, the edit would be lost with it
+                if torn:
+                    self._journal_file.write('\n')
+            self._journal_file.write(entry + '\n')
+            self._journal_file.flush()
+            if self.fsync:
+                os.fsync(self._journal_file.fileno())
+
+        # start compacting in the background on the first edit
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._compact_loop, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _rotate(self) -> None:
+        """
+        Move the journal aside so new edits go to a fresh file.
+        """
+        with self._lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+            if os.path.isfile(self.journal_filename):
+                os.replace(self.journal_filename, self.compacting_filename)
+
+    def compact(self) -> int:
+        """
+        Fold the journal into the GeoPackage.
+        Returns:
+            int: number of edits folded
+        """
+        with self._compact_lock:
+
+            # a previous compaction may have been interrupted, finish it
+            # before moving the current journal aside
+            if not os.path.isfile(self.compacting_filename):
+
+                if not os.path.isfile(self.journal_filename):
+                    return 0
+
+                # a snapshot queued before the rotation may not include
+                # the journaled edits, wait for the next round
+                if self.writer is None:
+                    self._rotate()
+                elif not self.writer.run_if_idle(
+                        self.filename, self._rotate):
+                    return 0
+
+            # the GeoPackage is written for the first time in the background
+            if not os.path.isfile(self.filename) or (
+                    self.writer is not None
+                    and self.writer.is_pending(self.filename)):
+                return 0
+
+            entries = _read_entries(self.compacting_filename)
+
+            # the background writer replaces the file under the same lock
+            with path_lock(self.filename):
+                try:
+                    for key_column, rows in fold_entries(entries).items():
+                        update_features(
+                            self.filename, rows, key_column, self.layer)
+                except SchemaChangedError:
+                    gdf = replay_journal(
+                        read_table(self.filename, layer=self.layer),
+                        self.filename)
+                    atomic_to_file(gdf, self.filename, layer=self.layer)
+
+            # keep the audit trail, then drop the folded journal
+            with open(self.compacting_filename, 'r') as compacting_file, \
+                    open(self.history_filename, 'a') as history_file:
+                history_file.write(compacting_file.read())
+            os.remove(self.compacting_filename)
+
+            return len(entries)
+
+    def _compact_loop(self) -> None:
+        while not self._closed.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception(f'Failed to compact {self.journal_filename}')
+
+    def close(self) -> None:
+        """
+        Stop the background compaction and fold the remaining edits.
+        """
+        self._closed.set()
+        if self.writer is not None:
+            self.writer.flush()
+        try:
+            self.compact()
+        finally:
+            with self._lock:
+                if self._journal_file is not None:
+                    self._journal_file.close()
+                    self._journal_file = None
@@ -0,0 +1,108 @@
+import os
+import time
+import bisect
+
+from pathlib import Path
+from functools import lru_cache
+from eo_validation.cache import FileCache
+
+
+class MaskIndex(object):
+    """
+    Index of the masks of a directory by filename.
+
+    The directory is listed once and listed again only when its
+    modification time changes, looking up the mask of a raster is a
+    binary search over the sorted filenames. When several masks start
+    with the raster stem, the exact <stem>.tif wins, otherwise the first
+    one in sorted order where the stem is followed by a separator, so
+    tile1.tif never gets tile10_mask.tif.
+    Args:
+        mask_dir (str): directory with the masks
+        extension (str): extension of the masks
+        cache (FileCache): cache of the listing shared across processes
+        check_interval (float): seconds between directory mtime checks
+    """
+
+    def __init__(
+                self,
+                mask_dir: str,
+                extension: str = '.tif',
+                cache=None,
+                check_interval: float = 5.0
+            ):
+
+        self.mask_dir = mask_dir
+        self.extension = extension
+        self.cache = cache
+        self.check_interval = check_interval
+
+        self._filenames = []
+        self._mtime = None
+        self._checked = 0.0
+        self.refresh()
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        List the directory again if its modification time changed.
+        """
+        self._checked = time.monotonic()
+        mtime = os.stat(self.mask_dir).st_mtime_ns
+        if not force and mtime == self._mtime:
+            return
+
+        filenames = None
+        if self.cache is not None and not force:
+            filenames = self.cache.get(self.mask_dir)
+
+        if filenames is None:
+            with os.scandir(self.mask_dir) as entries:
+                filenames = sorted(
+                    entry.name for entry in entries
+                    if entry.name.endswith(self.extension))
+            if self.cache is not None:
+                self.cache.put(self.mask_dir, filenames)
+
+        self._filenames = filenames
+        self._mtime = mtime
+
+    def __len__(self) -> int:
+        return len(self._filenames)
+
+    def lookup(self, raster_filename: str) -> str:
+        """
+        Return the mask of a raster, None if there is no match.
+        """
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.refresh()
+
+        stem = Path(raster_filename).stem
+
+        # exact match first
+        exact = f'{stem}{self.extension}'
+        position = bisect.bisect_left(self._filenames, exact)
+        if position < len(self._filenames) \
+                and self._filenames[position] == exact:
+            return os.path.join(self.mask_dir, exact)
+
+        # then the first filename with stem followed by a separator
+        position = bisect.bisect_left(self._filenames, stem)
+        while position < len(self._filenames) \
+                and self._filenames[position].startswith(stem):
+            filename = self._filenames[position]
+            if not filename[len(stem)].isalnum():
+                return os.path.join(self.mask_dir, filename)
+            position += 1
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_mask_index(mask_dir: str, cache_dir: str = None) -> MaskIndex:
+    """
+    Return the mask index of this process for a directory, the listing
+    is cached under cache_dir when given.
+    """
+    cache = None
+    if cache_dir is not None:
+        cache = FileCache(cache_dir, 'masks')
+    return MaskIndex(mask_dir, cache=cache)
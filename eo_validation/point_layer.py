@@ -0,0 +1,131 @@
+from ipyleaflet import GeoJSON, LayerGroup
+from eo_validation.sampling import is_verified
+
+# colors cycled over the validation classes
+DEFAULT_PALETTE = [
+    '#1f78b4', '#33a02c', '#ff7f00', '#6a3d9a', '#a6cee3', '#e31a1c',
+    '#b15928', '#fb9a99', '#cab2d6', '#ffff99'
+]
+
+
+class PointLayer(LayerGroup):
+    """
+    Vector layer drawing every point of a PointStore as a circle marker.
+
+    The points are split in a few GeoJSON chunks grouped as a single layer,
+    so a style change only re-sends the chunks holding the updated points
+    instead of one widget per point. Features carry the point ID, clicks
+    are resolved through the store.
+    Args:
+        store (PointStore): points to draw
+        classes (list): validation classes, used to build the palette
+        palette (dict): class to fill color, overrides the default palette
+        chunk_size (int): number of points per GeoJSON chunk
+        radius (int): marker radius in pixels
+    """
+
+    def __init__(
+                self,
+                store,
+                classes: list = None,
+                palette: dict = None,
+                chunk_size: int = 2000,
+                radius: int = 6,
+                **kwargs
+            ):
+
+        self.store = store
+        self.chunk_size = chunk_size
+
+        self.palette = {
+            name: DEFAULT_PALETTE[index % len(DEFAULT_PALETTE)]
+            for index, name in enumerate(classes or [])
+        }
+        self.palette.update(palette or {})
+
+        self._click_handlers = []
+
+        chunks = []
+        for start in range(0, len(store), chunk_size):
+            chunk = GeoJSON(
+                data={
+                    'type': 'FeatureCollection',
+                    'features': [
+                        self._feature(position) for position in range(
+                            start, min(start + chunk_size, len(store)))
+                    ]
+                },
+                point_style={'radius': radius, 'weight': 2}
+            )
+            chunk.on_click(self._chunk_clicked)
+            chunks.append(chunk)
+
+        kwargs.setdefault('name', 'validation')
+        super().__init__(layers=chunks, **kwargs)
+
+        store.observe(self._store_updated)
+
+    def point_style(self, position: int) -> dict:
+        """
+        Style of a point from its verified and operator columns.
+        """
+        verified = is_verified(self.store.columns['verified'][position])
+        return {
+            'color': 'green' if verified else 'black',
+            'fillColor': self.palette.get(
+                self.store.columns['operator'][position], 'gray'),
+            'fillOpacity': 0.9 if verified else 0.4,
+        }
+
+    def _feature(self, position: int) -> dict:
+        return {
+            'type': 'Feature',
+            'id': position,
+            'properties': {
+                'ID': self.store.ids[position].item(),
+                'style': self.point_style(position)
+            },
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [
+                    float(self.store.lon[position]),
+                    float(self.store.lat[position])
+                ]
+            }
+        }
+
+    def on_click(self, callback) -> None:
+        """
+        Register callback(point_id) called when a point is clicked.
+        """
+        self._click_handlers.append(callback)
+
+    def _chunk_clicked(self, event=None, feature=None, **kwargs) -> None:
+        if event != 'click' or feature is None:
+            return
+        for callback in self._click_handlers:
+            callback(feature['properties']['ID'])
+
+    def restyle(self, point_ids) -> None:
+        """
+        Update the style of several points, each chunk is sent once.
+        """
+        changed = dict()
+        for point_id in point_ids:
+            position = self.store.position(point_id)
+            changed.setdefault(
+                position // self.chunk_size, []).append(position)
+
+        for chunk_index, positions in changed.items():
+            chunk = self.layers[chunk_index]
+
+            # a new list so the widget sees the change
+            features = list(chunk.data['features'])
+            for position in positions:
+                features[position % self.chunk_size] = \
+                    self._feature(position)
+            chunk.data = {'type': 'FeatureCollection', 'features': features}
+
+    def _store_updated(self, point_id, position, values) -> None:
+        if 'verified' in values or 'operator' in values:
+            self.restyle([point_id])
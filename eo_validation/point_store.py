@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+import ipywidgets as widgets
+
+
+def _fits(array, value) -> bool:
+    """
+    Check if value can be stored in a numpy column without coercion.
+    """
+    kind = array.dtype.kind
+    if kind == 'O':
+        return True
+    if kind == 'b':
+        return isinstance(value, (bool, np.bool_))
+    if kind in 'iu':
+        return isinstance(value, (int, np.integer)) \
+            and not isinstance(value, (bool, np.bool_))
+    if kind == 'f':
+        return value is None or (
+            isinstance(value, (int, float, np.number))
+            and not isinstance(value, (bool, np.bool_)))
+    return False
+
+
+class PointStore(object):
+    """
+    Columnar in-kernel store of validation points keyed by point ID.
+
+    Every attribute is a numpy array and the point ID maps to its row
+    position, reading or updating a point is O(1) and the GeoDataFrame is
+    only rebuilt, vectorized, when the whole table is saved.
+    Args:
+        gdf (gpd.GeoDataFrame): validation points, the index is the ID
+    """
+
+    def __init__(self, gdf):
+
+        self.crs = gdf.crs
+        self.ids = gdf.index.to_numpy()
+        self.lon = gdf.geometry.x.to_numpy()
+        self.lat = gdf.geometry.y.to_numpy()
+        self.columns = {
+            column: gdf[column].to_numpy(copy=True)
+            for column in gdf.columns if column != gdf.geometry.name
+        }
+
+        # a RangeIndex does not need a lookup table
+        if isinstance(gdf.index, pd.RangeIndex) \
+                and gdf.index.start == 0 and gdf.index.step == 1:
+            self._positions = None
+        else:
+            self._positions = {
+                point_id: position
+                for position, point_id in enumerate(self.ids.tolist())
+            }
+
+        self._callbacks = []
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    def position(self, point_id) -> int:
+        """
+        Return the row position of a point ID.
+        """
+        if self._positions is None:
+            if not 0 <= point_id < self.ids.size:
+                raise KeyError(point_id)
+            return int(point_id)
+        return self._positions[point_id]
+
+    def get(self, point_id) -> dict:
+        """
+        Return the attributes of a single point.
+        """
+        position = self.position(point_id)
+        return {
+            column: values[position]
+            for column, values in self.columns.items()
+        }
+
+    def location(self, point_id) -> tuple:
+        """
+        Return the (lat, lon) location of a single point.
+        """
+        position = self.position(point_id)
+        return (float(self.lat[position]), float(self.lon[position]))
+
+    def update(self, point_id, values: dict) -> None:
+        """
+        Update the attributes of a single point.
+        """
+        position = self.position(point_id)
+        for column, value in values.items():
+
+            if column not in self.columns:
+                self.columns[column] = np.full(len(self), None, object)
+
+            # keep the column usable when a value does not fit its dtype
+            if not _fits(self.columns[column], value):
+                self.columns[column] = self.columns[column].astype(object)
+
+            self.columns[column][position] = value
+
+        for callback in self._callbacks:
+            callback(point_id, position, values)
+
+    def observe(self, callback) -> None:
+        """
+        Register callback(point_id, position, values) called on updates.
+        """
+        self._callbacks.append(callback)
+
+    def to_dataframe(self, start: int = 0, stop: int = None):
+        """
+        Return the attributes of the rows between start and stop.
+        """
+        return pd.DataFrame(
+            {column: values[start:stop]
+             for column, values in self.columns.items()},
+            index=self.ids[start:stop])
+
+    def to_geodataframe(self):
+        """
+        Rebuild the GeoDataFrame of the whole table.
+        """
+        import geopandas as gpd
+
+        return gpd.GeoDataFrame(
+            self.to_dataframe(),
+            crs=self.crs,
+            geometry=gpd.points_from_xy(self.lon, self.lat))
+
+
+class PointTableView(widgets.VBox):
+    """
+    Table of a PointStore that only shows a window of rows.
+
+    A single ipysheet holds one cell per column for the visible rows,
+    paging or updating a visible point only rewrites those cells.
+    Args:
+        store (PointStore): store to display
+        rows (int): number of visible rows
+    """
+
+    def __init__(self, store: PointStore, rows: int = 20, **kwargs):
+
+        import ipysheet
+
+        self.store = store
+        self.rows = rows
+
+        self.sheet = ipysheet.sheet(
+            rows=min(rows, len(store)),
+            columns=len(store.columns),
+            column_headers=list(store.columns)
+        )
+        self.cells = [
+            ipysheet.column(index, [None] * self.sheet.rows, read_only=True)
+            for index in range(len(store.columns))
+        ]
+
+        self.start_widget = widgets.BoundedIntText(
+            value=0,
+            min=0,
+            max=max(len(store) - 1, 0),
+            step=rows,
+            description='First row:'
+        )
+        self.start_widget.observe(lambda change: self.refresh(), 'value')
+
+        super().__init__([self.start_widget, self.sheet], **kwargs)
+
+        store.observe(self._store_updated)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Load the visible window of rows into the sheet.
+        """
+        start = self.start_widget.value
+        window = self.store.to_dataframe(start, start + self.rows)
+
+        with self.sheet.hold_sync():
+            self.sheet.rows = window.shape[0]
+            self.sheet.row_headers = [str(index) for index in window.index]
+            for cell, column in zip(self.cells, window.columns):
+                cell.row_end = window.shape[0] - 1
+                cell.value = [
+                    None if pd.isna(value) else value
+                    for value in window[column].tolist()
+                ]
+
+    def _store_updated(self, point_id, position, values) -> None:
+        start = self.start_widget.value
+        if start <= position < start + self.rows:
+            self.refresh()
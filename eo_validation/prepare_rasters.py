@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+import argparse
+import rasterio
+import pandas as pd
+import rasterio.shutil
+
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from rasterio.enums import Resampling
+from eo_validation.cache import DEFAULT_COG_DIR
+
+SUMMARY_COLUMNS = ['raster', 'output', 'status', 'seconds', 'error']
+
+
+def is_optimized(filename: str, min_overview_size: int = 512) -> bool:
+    """
+    Check if a raster is internally tiled and, when larger than
+    min_overview_size pixels, has overviews.
+    """
+    with rasterio.open(filename) as src:
+        if src.driver not in ('GTiff', 'COG'):
+            return False
+        if not src.profile.get('tiled', False):
+            return False
+        if max(src.width, src.height) > min_overview_size \
+                and not src.overviews(1):
+            return False
+    return True
+
+
+def optimized_filename(filename: str, data_dir: str, cog_dir: str) -> str:
+    """
+    Return the path of the optimized copy of a raster, the directory
+    layout under data_dir is kept under cog_dir.
+    """
+    relative = os.path.relpath(
+        os.path.abspath(filename), os.path.abspath(data_dir))
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(filename)
+    return os.path.join(cog_dir, f'{os.path.splitext(relative)[0]}.tif')
+
+
+def find_optimized(filename: str, data_dir: str, cog_dir: str) -> str:
+    """
+    Return the optimized copy of a raster if it exists and is newer than
+    the raster, the raster itself otherwise.
+    """
+    if cog_dir is None or not os.path.isfile(filename):
+        return filename
+    output_filename = optimized_filename(filename, data_dir, cog_dir)
+    if os.path.isfile(output_filename) and \
+            os.path.getmtime(output_filename) >= os.path.getmtime(filename):
+        return output_filename
+    return filename
+
+
+def write_cog(
+            filename: str,
+            output_filename: str,
+            blocksize: int = 512,
+            compress: str = 'DEFLATE',
+            resampling: str = 'average'
+        ) -> None:
+    """
+    Write a tiled Cloud-Optimized GeoTIFF with overviews, through a
+    temporary file and an atomic rename.
+    """
+    os.makedirs(os.path.dirname(output_filename) or '.', exist_ok=True)
+    tmp_filename = os.path.join(
+        os.path.dirname(output_filename),
+        f'.{os.path.basename(output_filename)}.{os.getpid()}.tmp.tif')
+
+    try:
+        with rasterio.Env() as env:
+
+            if 'COG' in env.drivers():
+                rasterio.shutil.copy(
+                    filename, tmp_filename, driver='COG',
+                    BLOCKSIZE=blocksize, COMPRESS=compress,
+                    OVERVIEW_RESAMPLING=resampling.upper(),
+                    BIGTIFF='IF_SAFER')
+
+            # GDAL < 3.1, tiled GeoTIFF with internal overviews
+            else:
+                rasterio.shutil.copy(
+                    filename, tmp_filename, driver='GTiff', tiled=True,
+                    blockxsize=blocksize, blockysize=blocksize,
+                    compress=compress, BIGTIFF='IF_SAFER')
+                with rasterio.open(tmp_filename, 'r+') as dst:
+                    factors, size = [], max(dst.width, dst.height)
+                    while size // 2 ** (len(factors) + 1) >= blocksize:
+                        factors.append(2 ** (len(factors) + 1))
+                    dst.build_overviews(factors, Resampling[resampling])
+
+        os.replace(tmp_filename, output_filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def prepare_raster(
+            filename: str,
+            output_filename: str,
+            overwrite: bool = False,
+            **kwargs
+        ) -> dict:
+    """
+    Convert a single raster to a COG unless it is already optimized
+    or its copy is up to date.
+    """
+    start_time = time.time()
+    report = {
+        'raster': filename,
+        'output': output_filename,
+        'status': 'done',
+        'seconds': 0.0,
+        'error': None
+    }
+
+    try:
+        if not overwrite and os.path.isfile(output_filename) and \
+                os.path.getmtime(output_filename) >= \
+                os.path.getmtime(filename):
+            report['status'] = 'skipped'
+        elif not overwrite and is_optimized(filename):
+            report['status'] = 'optimized'
+            report['output'] = None
+        else:
+            write_cog(filename, output_filename, **kwargs)
+    except Exception as e:
+        report['status'] = 'failed'
+        report['error'] = f'{type(e).__name__}: {e}'
+
+    report['seconds'] = round(time.time() - start_time, 2)
+    return report
+
+
+def prepare_rasters(
+            data_dir: str,
+            cog_dir: str = DEFAULT_COG_DIR,
+            pattern: str = '*.tif',
+            n_workers: int = None,
+            overwrite: bool = False,
+            **kwargs
+        ) -> pd.DataFrame:
+    """
+    Convert every raster under data_dir that is not tiled or has no
+    overviews to a COG under cog_dir. Rasters with an up to date copy
+    are skipped, so the preparation can be run again after new scenes
+    are added. A worker dying fails the rasters still queued, they are
+    converted on the next run.
+    Args:
+        data_dir (str): directory with the rasters
+        cog_dir (str): output directory for the optimized copies
+        pattern (str): glob pattern of the rasters inside data_dir
+        n_workers (int): number of processes, all cores if None
+        overwrite (bool): convert every raster again
+        kwargs: forwarded to write_cog
+    Returns:
+        pd.DataFrame: one summary row per raster
+    """
+    filenames = sorted(glob(os.path.join(data_dir, pattern), recursive=True))
+
+    reports = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+
+        futures = {
+            executor.submit(
+                prepare_raster, filename,
+                optimized_filename(filename, data_dir, cog_dir),
+                overwrite, **kwargs): filename
+            for filename in filenames
+        }
+
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except BrokenProcessPool as e:
+                report = {
+                    'raster': futures[future],
+                    'output': optimized_filename(
+                        futures[future], data_dir, cog_dir),
+                    'status': 'failed',
+                    'seconds': 0.0,
+                    'error': f'{type(e).__name__}: {e}'
+                }
+            reports.append(report)
+            print(
+                f"{report['status']}: {report['raster']} "
+                f"({report['seconds']}s)", flush=True)
+
+    return pd.DataFrame(reports, columns=SUMMARY_COLUMNS)
+
+
+def main(argv=None):
+    """
+    Command line entry point for raster preparation.
+    """
+    parser = argparse.ArgumentParser(
+        description='Convert campaign rasters to Cloud-Optimized GeoTIFFs.')
+    parser.add_argument(
+        '--data-dir', type=str, required=True, help='raster directory')
+    parser.add_argument(
+        '--cog-dir', type=str, default=DEFAULT_COG_DIR,
+        help='output directory')
+    parser.add_argument(
+        '--pattern', type=str, default='*.tif',
+        help='glob pattern of the rasters inside data-dir')
+    parser.add_argument(
+        '--blocksize', type=int, default=512, help='tile size in pixels')
+    parser.add_argument('--compress', type=str, default='DEFLATE')
+    parser.add_argument(
+        '--resampling', type=str, default='average',
+        help='overview resampling method')
+    parser.add_argument(
+        '--n-workers', type=int, default=os.cpu_count(),
+        help='number of worker processes')
+    parser.add_argument(
+        '--overwrite', action='store_true',
+        help='convert rasters that already have a copy')
+    args = parser.parse_args(argv)
+
+    summary = prepare_rasters(
+        args.data_dir,
+        args.cog_dir,
+        pattern=args.pattern,
+        n_workers=args.n_workers,
+        overwrite=args.overwrite,
+        blocksize=args.blocksize,
+        compress=args.compress,
+        resampling=args.resampling
+    )
+
+    print(summary['status'].value_counts().to_string())
+    return int((summary['status'] == 'failed').any())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
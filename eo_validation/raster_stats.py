@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import rasterio
+
+from rasterio.enums import Resampling
+
+# percentiles stored for every band
+PERCENTILES = [2, 98]
+
+
+def compute_band_stats(
+            filename: str,
+            max_size: int = 1024,
+            exact: bool = False
+        ) -> dict:
+    """
+    Compute the statistics of every band of a raster.
+
+    Bands are read decimated so the longest side is at most max_size
+    pixels, GDAL serves the read from the overviews when the raster has
+    them. Nodata pixels are ignored.
+    Args:
+        filename (str): raster filename
+        max_size (int): longest side of the subsample in pixels
+        exact (bool): compute mean, std, min and max at full resolution
+    Returns:
+        dict: band number (str) to mean, std, min, max and percentiles
+    """
+    with rasterio.open(filename) as src:
+
+        scale = max(src.width, src.height) / max_size
+        out_shape = (
+            src.count,
+            max(1, int(round(src.height / max(scale, 1)))),
+            max(1, int(round(src.width / max(scale, 1))))
+        )
+        data = src.read(
+            out_shape=out_shape, resampling=Resampling.nearest, masked=True)
+
+        band_stats = dict()
+        for index, band in enumerate(data):
+
+            values = band.compressed().astype('float64')
+            if values.size == 0:
+                values = np.zeros(1)
+
+            stats = {
+                'mean': float(values.mean()),
+                'std': float(values.std()),
+                'min': float(values.min()),
+                'max': float(values.max())
+            }
+            for percentile, value in zip(
+                    PERCENTILES, np.percentile(values, PERCENTILES)):
+                stats[f'p{percentile}'] = float(value)
+
+            if exact:
+                # rasterio < 1.4 only has the deprecated statistics
+                if hasattr(src, 'stats'):
+                    full_stats = src.stats(
+                        indexes=[index + 1], approx=False)[0]
+                else:
+                    full_stats = src.statistics(index + 1, approx=False)
+                stats.update({
+                    'mean': full_stats.mean,
+                    'std': full_stats.std,
+                    'min': full_stats.min,
+                    'max': full_stats.max
+                })
+
+            band_stats[str(index + 1)] = stats
+
+    return band_stats
+
+
+def get_band_stats(
+            filename: str,
+            cache=None,
+            max_size: int = 1024,
+            exact: bool = False
+        ) -> dict:
+    """
+    Return the statistics of every band of a raster, cached by file.
+    Args:
+        filename (str): raster filename
+        cache (FileCache): cache of the statistics, None to disable it
+        max_size (int): longest side of the subsample in pixels
+        exact (bool): compute mean, std, min and max at full resolution
+    Returns:
+        dict: band number (str) to mean, std, min, max and percentiles
+    """
+    # remote rasters have no signature to key the cache with
+    if cache is None or not os.path.isfile(filename):
+        return compute_band_stats(filename, max_size, exact)
+
+    # every set of parameters has its own entry
+    key = f'max_size={max_size},exact={exact}'
+    band_stats = cache.get(filename, key=key)
+    if band_stats is not None:
+        return band_stats
+
+    band_stats = compute_band_stats(filename, max_size, exact)
+    cache.put(filename, band_stats, key=key)
+    return band_stats
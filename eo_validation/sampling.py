@@ -0,0 +1,546 @@
+import math
+import numpy as np
+import pandas as pd
+
+from functools import lru_cache
+
+# rasterio, pyproj and geopandas are imported by the functions using them,
+# the dashboard imports this module for the validation columns
+
+# attribute columns edited by the annotators
+VALIDATION_COLUMNS = [
+    'operator', 'burnt', 'confidence', 'verified', 'date', 'seconds_taken']
+
+
+def is_verified(verified):
+    """
+    Verified is stored as a boolean, or as the 'false' string by files of
+    older versions, missing values are not verified. Applied element-wise
+    to a pandas Series.
+    """
+    if isinstance(verified, pd.Series):
+        return verified.map(is_verified).astype(bool)
+    if isinstance(verified, str):
+        return verified.lower() not in ('false', '')
+    if pd.isna(verified):
+        return False
+    return bool(verified)
+
+
+@lru_cache(maxsize=None)
+def get_transformer(src_crs: str, dst_crs: str = 'EPSG:4326'):
+    """
+    Return a cached pyproj transformer between two coordinate systems.
+    """
+    from pyproj import Transformer
+
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def reproject_points(x, y, src_crs, dst_crs: str = 'EPSG:4326'):
+    """
+    Reproject point coordinates, only the selected points are warped.
+    Args:
+        x (np.ndarray): x coordinates in src_crs
+        y (np.ndarray): y coordinates in src_crs
+        src_crs: source coordinate system, anything with to_wkt or a str
+        dst_crs (str): destination coordinate system
+    Returns:
+        tuple: x, y coordinates in dst_crs
+    """
+    if hasattr(src_crs, 'to_wkt'):
+        src_crs = src_crs.to_wkt()
+    transformer = get_transformer(src_crs, dst_crs)
+    return transformer.transform(np.asarray(x), np.asarray(y))
+
+
+def iter_blocks(filename: str, chunks: dict = None, band: int = 1):
+    """
+    Read a single band one window at a time.
+    Args:
+        filename (str): raster filename to read
+        chunks (dict): xarray style chunks, only x and y are used
+        band (int): band index to read, starting from 1
+    Returns:
+        generator: (row_offset, col_offset, block) tuples
+    """
+    import rasterio
+    from rasterio.windows import Window
+
+    with rasterio.open(filename) as src:
+
+        # default to the native block size of the raster
+        if chunks is None:
+            block_height, block_width = src.block_shapes[band - 1]
+        else:
+            block_height, block_width = chunks['y'], chunks['x']
+
+        for row_off in range(0, src.height, block_height):
+            for col_off in range(0, src.width, block_width):
+                window = Window(
+                    col_off, row_off,
+                    min(block_width, src.width - col_off),
+                    min(block_height, src.height - row_off)
+                )
+                yield row_off, col_off, src.read(band, window=window)
+
+
+def valid_classes(block):
+    """
+    Return the row, column and class of the valid pixels of a mask block.
+    """
+    # Only select appropiate values, remove no-data
+    rows, cols = np.nonzero((block >= 0) & (block < 255))
+    return rows, cols, block[rows, cols].astype(np.int64)
+
+
+def class_histogram(filename: str, chunks: dict = None):
+    """
+    Compute the number of valid pixels per class of a mask.
+    Args:
+        filename (str): mask filename
+        chunks (dict): xarray style chunks used as the window size
+    Returns:
+        np.ndarray: pixel count indexed by the class value in the mask
+    """
+    counts = np.zeros(255, dtype=np.int64)
+    for _, _, block in iter_blocks(filename, chunks):
+        counts += np.bincount(
+            valid_classes(block)[2], minlength=counts.size)
+    return counts
+
+
+def class_offset(counts) -> int:
+    """
+    Classes are expected to start from 0, return 1 if the mask starts at 1.
+    """
+    return 1 if np.asarray(counts)[0] == 0 else 0
+
+
+def allocate_points(
+            counts,
+            expected_accuracies: list,
+            expected_standard_error: float,
+            n_points: int = None
+        ):
+    """
+    Allocate validation points per class (Olofsson et al., 2014).
+    Args:
+        counts (np.ndarray): pixel count indexed by the class value
+        expected_accuracies (list): expected user's accuracy per class
+        expected_standard_error (float): target standard error of the
+            overall accuracy
+        n_points (int): static total number of points, Olofsson if None
+    Returns:
+        np.ndarray: number of points indexed by the class value
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    classes = np.flatnonzero(counts)
+    labels = classes - class_offset(counts)
+
+    # Make sure expected accuracies match size of classes found
+    accuracies = np.asarray(expected_accuracies, dtype=float)
+    if accuracies.size != labels.max() + 1:
+        accuracies = np.full(labels.max() + 1, accuracies[0])
+    accuracies = accuracies[labels]
+
+    percent = np.round(counts[classes] / counts.sum(), 2)
+    standard_deviation = np.round(
+        np.sqrt(accuracies * (1 - accuracies)), 2)
+
+    # Choose between Oloffson or static number of points
+    if n_points is not None:
+        val_total_points = n_points
+    else:
+        val_total_points = int(round((
+            (percent * standard_deviation).sum()
+            / expected_standard_error) ** 2))
+
+    # Get the number of points per class, the remainder goes to the
+    # first class
+    n_point = np.floor(percent * val_total_points)
+    difference = val_total_points - n_point.sum()
+    if difference > 0:
+        n_point[np.argmin(labels)] += difference
+    elif difference < 0:
+        # ties go to the most frequent class
+        order = np.argsort(-counts[classes], kind='stable')
+        n_point[order[np.argmax(n_point[order])]] += difference
+
+    allocation = np.zeros(counts.size, dtype=np.int64)
+    allocation[classes] = n_point
+    return allocation
+
+
+class StratifiedBlockSampler(object):
+    """
+    Streaming per-class sampler over a classification mask.
+
+    The mask is read one window at a time, the class histogram is
+    accumulated with bincount and every class keeps a bottom-k reservoir
+    (the capacity pixels with the smallest random key). A uniform
+    subsample of the reservoir is a uniform sample of the class, so the
+    full table of pixels is never built.
+
+    When the class histogram is already known (counts), the reservoirs
+    are skipped and sample draws the pixel ranks per class up front and
+    picks them in a single pass over the mask.
+    Args:
+        filename (str): mask filename
+        capacity (int): maximum number of pixels kept per class
+        chunks (dict): xarray style chunks used as the window size
+        random_state (int): seed for the random keys
+        counts (np.ndarray): known pixel count indexed by the class value
+    """
+
+    def __init__(
+                self,
+                filename: str,
+                capacity: int,
+                chunks: dict = None,
+                random_state: int = 24,
+                counts=None
+            ):
+
+        self.filename = filename
+        self.capacity = capacity
+        self.chunks = chunks
+        self.histogram_known = counts is not None
+
+        if counts is None:
+            self.counts = np.zeros(255, dtype=np.int64)
+        else:
+            self.counts = np.asarray(counts, dtype=np.int64)
+
+        self._rng = np.random.default_rng(random_state)
+        self._keys = dict()
+        self._index = dict()
+
+        import rasterio
+        with rasterio.open(filename) as src:
+            self.crs = src.crs
+            self.transform = src.transform
+            self.width = src.width
+
+    def run(self):
+        """
+        Walk the mask and fill the class histogram and reservoirs.
+        """
+        for row_off, col_off, block in iter_blocks(
+                self.filename, self.chunks):
+            self.update(block, row_off, col_off)
+        return self
+
+    def update(self, block, row_off: int, col_off: int) -> None:
+        """
+        Add a single window of the mask to the sampler.
+        """
+        rows, cols, values = valid_classes(block)
+        if rows.size == 0:
+            return
+
+        block_counts = np.bincount(values, minlength=self.counts.size)
+        self.counts += block_counts
+
+        keys = self._rng.random(values.size)
+        for class_id in np.flatnonzero(block_counts):
+
+            selected = values == class_id
+            class_keys = keys[selected]
+
+            # skip candidates that cannot enter a full reservoir
+            if class_id in self._keys \
+                    and self._keys[class_id].size >= self.capacity:
+                selected = np.flatnonzero(selected)[
+                    class_keys < self._keys[class_id].max()]
+                class_keys = keys[selected]
+                if class_keys.size == 0:
+                    continue
+
+            class_index = (row_off + rows[selected]) * self.width \
+                + (col_off + cols[selected])
+
+            if class_id in self._keys:
+                class_keys = np.concatenate(
+                    [self._keys[class_id], class_keys])
+                class_index = np.concatenate(
+                    [self._index[class_id], class_index])
+
+            if class_keys.size > self.capacity:
+                keep = np.argpartition(
+                    class_keys, self.capacity - 1)[:self.capacity]
+                class_keys = class_keys[keep]
+                class_index = class_index[keep]
+
+            self._keys[class_id] = class_keys
+            self._index[class_id] = class_index
+
+    def _values(self, class_id: int, keep):
+        """
+        Return the pixel values of the kept reservoir entries.
+        """
+        return np.full(keep.size, class_id, np.int64)
+
+    def class_counts(self) -> dict:
+        """
+        Return the number of valid pixels per class found in the mask.
+        """
+        return {
+            int(class_id): int(self.counts[class_id])
+            for class_id in np.flatnonzero(self.counts)
+        }
+
+    def sample(self, n_per_class: dict):
+        """
+        Select the requested number of pixels per class.
+        Args:
+            n_per_class (dict): class value in the mask to number of points
+        Returns:
+            tuple: x, y pixel centre coordinates and class value arrays
+        """
+        if self.histogram_known:
+            selected_index, selected_class = self._select(n_per_class)
+        else:
+            selected_index, selected_class = self._from_reservoir(
+                n_per_class)
+
+        if len(selected_index) == 0:
+            return np.empty(0), np.empty(0), np.empty(0, np.int64)
+
+        selected_index = np.concatenate(selected_index)
+        selected_class = np.concatenate(selected_class)
+
+        # keep the row-major order of the mask
+        order = np.argsort(selected_index, kind='stable')
+        selected_index = selected_index[order]
+        selected_class = selected_class[order]
+
+        rows, cols = np.divmod(selected_index, self.width)
+        x, y = self.transform * (cols + 0.5, rows + 0.5)
+        return np.asarray(x), np.asarray(y), selected_class
+
+    def _from_reservoir(self, n_per_class: dict):
+        """
+        Take the pixels with the smallest keys from each reservoir.
+        """
+        selected_index, selected_class = [], []
+        for class_id, n_point in n_per_class.items():
+
+            n_point = int(n_point)
+            if n_point <= 0:
+                continue
+
+            class_keys = self._keys.get(class_id, np.empty(0))
+            if n_point > class_keys.size:
+                raise ValueError(
+                    f'Requested {n_point} points for class {class_id}, '
+                    f'only {class_keys.size} available in the reservoir')
+
+            keep = np.argsort(class_keys)[:n_point]
+            selected_index.append(self._index[class_id][keep])
+            selected_class.append(self._values(class_id, keep))
+
+        return selected_index, selected_class
+
+    def _select(self, n_per_class: dict):
+        """
+        Draw the pixel ranks per class and pick them in one pass.
+        """
+        ranks = dict()
+        for class_id, n_point in n_per_class.items():
+            n_point = int(n_point)
+            if n_point <= 0:
+                continue
+            if n_point > self.counts[class_id]:
+                raise ValueError(
+                    f'Requested {n_point} points for class {class_id}, '
+                    f'only {self.counts[class_id]} pixels available')
+            ranks[class_id] = np.sort(self._rng.choice(
+                self.counts[class_id], n_point, replace=False))
+
+        selected_index, selected_class = [], []
+        seen = np.zeros(self.counts.size, dtype=np.int64)
+        for row_off, col_off, block in iter_blocks(
+                self.filename, self.chunks):
+
+            rows, cols, values = valid_classes(block)
+            for class_id, class_ranks in ranks.items():
+
+                position = np.flatnonzero(values == class_id)
+                first_rank = seen[class_id]
+                seen[class_id] += position.size
+
+                start, end = np.searchsorted(
+                    class_ranks, [first_rank, seen[class_id]])
+                if end > start:
+                    picked = position[class_ranks[start:end] - first_rank]
+                    selected_index.append(
+                        (row_off + rows[picked]) * self.width
+                        + (col_off + cols[picked]))
+                    selected_class.append(
+                        np.full(picked.size, class_id, np.int64))
+
+        return selected_index, selected_class
+
+
+class RandomBlockSampler(StratifiedBlockSampler):
+    """
+    Streaming uniform sampler over every valid pixel of a raster band.
+
+    All pixels share a single reservoir, the pixel values are kept with
+    it so they can be returned with the sampled locations.
+    Args:
+        filename (str): raster filename
+        capacity (int): number of pixels to sample
+        chunks (dict): xarray style chunks used as the window size
+        random_state (int): seed for the random keys
+    """
+
+    def __init__(
+                self,
+                filename: str,
+                capacity: int,
+                chunks: dict = None,
+                random_state: int = 24
+            ):
+        super().__init__(filename, capacity, chunks, random_state)
+        import rasterio
+        with rasterio.open(filename) as src:
+            self.nodata = src.nodata
+        self._pixel_values = np.empty(0, dtype=np.int64)
+
+    def update(self, block, row_off: int, col_off: int) -> None:
+        """
+        Add a single window of the raster to the sampler.
+        """
+        # Only select appropiate values, remove no-data
+        valid = block >= 0
+        if self.nodata is not None:
+            valid &= block != self.nodata
+        rows, cols = np.nonzero(valid)
+        if rows.size == 0:
+            return
+        self.counts[0] += rows.size
+
+        keys = self._rng.random(rows.size)
+        values = block[rows, cols].astype(np.int64)
+        index = (row_off + rows) * self.width + (col_off + cols)
+
+        if 0 in self._keys:
+            keys = np.concatenate([self._keys[0], keys])
+            index = np.concatenate([self._index[0], index])
+            values = np.concatenate([self._pixel_values, values])
+
+        if keys.size > self.capacity:
+            keep = np.argpartition(keys, self.capacity - 1)[:self.capacity]
+            keys, index, values = keys[keep], index[keep], values[keep]
+
+        self._keys[0] = keys
+        self._index[0] = index
+        self._pixel_values = values
+
+    def _values(self, class_id: int, keep):
+        return self._pixel_values[keep]
+
+    def sample(self, n_points: int):
+        """
+        Select n_points pixels uniformly from the raster.
+        Args:
+            n_points (int): number of points to sample
+        Returns:
+            tuple: x, y pixel centre coordinates and pixel value arrays
+        """
+        return super().sample({0: n_points})
+
+
+def generate_points(
+            raster_filename: str,
+            mask_filename: str,
+            n_points: int = None,
+            expected_accuracies: list = [0.90, 0.90, 0.90, 0.90],
+            expected_standard_error: float = 0.01,
+            chunks: dict = None,
+            histogram_cache=None
+        ):
+    """
+    Generate validation points from a mask, or randomly from the raster.
+    Args:
+        raster_filename (str): raster filename, used when there is no mask
+        mask_filename (str): mask filename for stratified sampling
+        n_points (int): static total number of points, Olofsson if None
+        expected_accuracies (list): expected user's accuracy per class
+        expected_standard_error (float): target standard error
+        chunks (dict): xarray style chunks used as the window size
+        histogram_cache (FileCache): optional cache of mask histograms
+    Returns:
+        gpd.GeoDataFrame: y, x and predicted columns in EPSG:4326
+    """
+    import geopandas as gpd
+
+    if mask_filename is not None:
+
+        # the Olofsson total is bounded by (max std / std error) ** 2,
+        # use it as the reservoir size when no static number is given
+        if n_points is not None:
+            capacity = n_points
+        else:
+            capacity = math.ceil((1.0 / expected_standard_error) ** 2)
+
+        # with a cached histogram the kept pixels are picked directly,
+        # otherwise walk the mask once filling per-class reservoirs
+        counts = None
+        if histogram_cache is not None:
+            counts = histogram_cache.get(mask_filename)
+
+        sampler = StratifiedBlockSampler(
+            mask_filename, capacity, chunks=chunks, counts=counts)
+        if not sampler.histogram_known:
+            sampler.run()
+            if histogram_cache is not None:
+                histogram_cache.put(mask_filename, sampler.counts.tolist())
+
+        # Get the number of points per class
+        n_point = allocate_points(
+            sampler.counts, expected_accuracies,
+            expected_standard_error, n_points)
+
+        # select the points per class, make sure classes start from 0
+        x, y, predicted = sampler.sample({
+            class_id: n_point[class_id]
+            for class_id in np.flatnonzero(n_point)
+        })
+        predicted = predicted - class_offset(sampler.counts)
+
+    # we do not have any mask filename
+    else:
+
+        # walk the first band of the raster in its native grid
+        sampler = RandomBlockSampler(
+            raster_filename, n_points, chunks=chunks).run()
+
+        # Generate random points from the valid pixels
+        x, y, predicted = sampler.sample(n_points)
+
+    # Only the selected pixel centres are reprojected to EPSG:4326
+    x, y = reproject_points(x, y, sampler.crs)
+    raster_prediction = pd.DataFrame({'y': y, 'x': x, 'predicted': predicted})
+
+    # Generate geometry dataframe
+    return gpd.GeoDataFrame(
+        raster_prediction,
+        crs='EPSG:4326',
+        geometry=gpd.points_from_xy(x, y)).reset_index(drop=True)
+
+
+def init_validation_points(points, default_class: str):
+    """
+    Add the validation columns to freshly generated points.
+    """
+    points = points.drop(['predicted'], axis=1).to_crs(4326)
+    points['operator'] = default_class
+    points['burnt'] = 0
+    points['confidence'] = 1
+    points['verified'] = False
+    points['date'] = None
+    points['seconds_taken'] = None
+    return points
@@ -0,0 +1,149 @@
+import time
+
+from eo_validation.validation_store import ValidationStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    short_filename TEXT NOT NULL,
+    point_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (short_filename, point_id, username)
+);
+CREATE INDEX IF NOT EXISTS leases_expires ON leases (expires);
+"""
+
+# points of the group still needing a label from username: not verified
+# by them, not leased to them and verified or leased by less than overlap
+# other annotators, an annotator saving a leased point counts once
+_CANDIDATES = """
+SELECT points.point_id FROM points
+WHERE points.short_filename = :short_filename
+AND (:point_group IS NULL OR points.point_group = :point_group)
+AND NOT EXISTS (
+    SELECT 1 FROM labels
+    WHERE labels.short_filename = points.short_filename
+    AND labels.point_id = points.point_id
+    AND labels.username = :username AND labels.verified = 1)
+AND NOT EXISTS (
+    SELECT 1 FROM leases
+    WHERE leases.short_filename = points.short_filename
+    AND leases.point_id = points.point_id
+    AND leases.username = :username)
+AND (
+    SELECT COUNT(*) FROM (
+        SELECT labels.username FROM labels
+        WHERE labels.short_filename = points.short_filename
+        AND labels.point_id = points.point_id
+        AND labels.username != :username AND labels.verified = 1
+        UNION
+        SELECT leases.username FROM leases
+        WHERE leases.short_filename = points.short_filename
+        AND leases.point_id = points.point_id
+        AND leases.username != :username)
+) < :overlap
+ORDER BY points.point_id
+LIMIT :n_points
+"""
+
+
+class PointScheduler(object):
+    """
+    Hand out the points of the validation store to annotators in leased
+    batches.
+
+    A lease reserves a point for an annotator until it expires, so
+    annotators working on the same file get different points. Leases of
+    abandoned sessions expire and their points go back to the queue. With
+    overlap k every point is labelled by k annotators, e.g. for agreement
+    studies.
+    Args:
+        store (ValidationStore): central validation store
+        lease_seconds (float): seconds before an unfinished lease expires
+        overlap (int): number of annotators labelling each point
+    """
+
+    def __init__(
+                self,
+                store: ValidationStore,
+                lease_seconds: float = 1800.0,
+                overlap: int = 1
+            ):
+
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.overlap = overlap
+
+        self.store.create_tables(_SCHEMA)
+
+    def lease(
+                self,
+                short_filename: str,
+                username: str,
+                n_points: int = 20,
+                group=None
+            ) -> list:
+        """
+        Lease up to n_points points of a file to an annotator, only of
+        group when given. Points not leased yet come first, the points
+        already leased to them, e.g. skipped ones, fill the rest of the
+        batch and every lease of the annotator is renewed.
+        Returns:
+            list: point ids in leasing order, empty when the file is done
+        """
+        now = time.time()
+        with self.store.transaction() as connection:
+
+            # abandoned sessions give their points back
+            connection.execute(
+                'DELETE FROM leases WHERE expires < ?', (now,))
+
+            new_ids = [row[0] for row in connection.execute(_CANDIDATES, {
+                'short_filename': short_filename,
+                'username': username,
+                'point_group': None if group is None else str(group),
+                'overlap': self.overlap,
+                'n_points': n_points
+            })]
+
+            connection.execute(
+                'UPDATE leases SET expires = ? '
+                'WHERE short_filename = ? AND username = ?',
+                (now + self.lease_seconds, short_filename, username))
+            point_ids = [row[0] for row in connection.execute(
+                'SELECT point_id FROM leases '
+                'WHERE short_filename = ? AND username = ? '
+                'ORDER BY point_id LIMIT ?',
+                (short_filename, username, n_points - len(new_ids)))]
+
+            connection.executemany(
+                'INSERT INTO leases VALUES (?, ?, ?, ?)',
+                [(short_filename, point_id, username,
+                  now + self.lease_seconds) for point_id in new_ids])
+
+        return new_ids + point_ids
+
+    def complete(
+                self,
+                short_filename: str,
+                username: str,
+                point_ids: list
+            ) -> None:
+        """
+        End the leases of the points labelled by an annotator.
+        """
+        with self.store.transaction() as connection:
+            connection.executemany(
+                'DELETE FROM leases WHERE short_filename = ? '
+                'AND point_id = ? AND username = ?',
+                [(short_filename, int(point_id), username)
+                 for point_id in point_ids])
+
+    def release(self, short_filename: str, username: str) -> None:
+        """
+        Give back every point of a file leased to an annotator.
+        """
+        with self.store.transaction() as connection:
+            connection.execute(
+                'DELETE FROM leases WHERE short_filename = ? '
+                'AND username = ?', (short_filename, username))
@@ -0,0 +1,128 @@
+import os
+import pandas as pd
+
+from glob import glob
+from eo_validation.sampling import is_verified
+
+# file extensions of each storage format
+FORMAT_EXTENSIONS = {
+    'gpkg': '.gpkg',
+    'parquet': '.parquet',
+}
+
+PARQUET_EXTENSIONS = ('.parquet', '.geoparquet')
+
+
+def is_parquet(filename: str) -> bool:
+    """
+    Check if filename is stored as (Geo)Parquet, a file or a directory
+    of parts, from its extension.
+    """
+    return filename.rstrip(os.sep).lower().endswith(PARQUET_EXTENSIONS)
+
+
+def format_extension(storage_format: str) -> str:
+    """
+    Return the file extension of a storage format, gpkg or parquet.
+    """
+    if storage_format not in FORMAT_EXTENSIONS:
+        raise ValueError(
+            f'Unknown storage format {storage_format}, '
+            f'expected one of {list(FORMAT_EXTENSIONS)}')
+    return FORMAT_EXTENSIONS[storage_format]
+
+
+def dataset_schema(dirname: str):
+    """
+    Union of the schemas of the Parquet parts in a directory, parts with
+    more columns or wider types are read without losing any of them.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pa.unify_schemas(
+        [pq.read_schema(filename)
+         for filename in sorted(glob(os.path.join(dirname, '*.parquet')))],
+        promote_options='permissive')
+
+
+def read_table(
+            filename: str,
+            columns: list = None,
+            layer: str = None,
+            geometry: bool = True,
+            filters: list = None
+        ):
+    """
+    Read a validation table, the format is selected by the extension.
+    Parquet reads only the requested columns and skips the row groups
+    whose statistics do not match the filters.
+    Args:
+        filename (str): GeoPackage or (Geo)Parquet filename
+        columns (list): columns to read, all of them if None
+        layer (str): layer name, the default layer of the file if None,
+            GeoPackage only
+        geometry (bool): read the geometry column
+        filters (list): pyarrow filters, e.g. [('verified', '==', True)],
+            Parquet only
+    Returns:
+        gpd.GeoDataFrame or pd.DataFrame if geometry is False
+    """
+    # imported on the first read, the dashboard imports this module
+    import geopandas as gpd
+
+    if is_parquet(filename):
+        kwargs = dict()
+        if os.path.isdir(filename):
+            kwargs['schema'] = dataset_schema(filename)
+        if not geometry:
+            return pd.read_parquet(
+                filename, columns=columns, filters=filters, **kwargs)
+        if columns is not None and 'geometry' not in columns:
+            columns = list(columns) + ['geometry']
+        return gpd.read_parquet(
+            filename, columns=columns, filters=filters, **kwargs)
+
+    if filters is not None:
+        raise ValueError('filters are only supported by Parquet files')
+    return gpd.read_file(
+        filename, layer=layer, columns=columns, ignore_geometry=not geometry)
+
+
+def write_table(
+            gdf,
+            filename: str,
+            layer: str = 'validation',
+            driver: str = 'GPKG',
+            row_group_size: int = 65536
+        ) -> None:
+    """
+    Write a validation table, the format is selected by the extension.
+    Args:
+        gdf (gpd.GeoDataFrame): table to write
+        filename (str): GeoPackage or (Geo)Parquet filename
+        layer (str): layer name, GeoPackage only
+        driver (str): OGR driver of non Parquet files
+        row_group_size (int): rows per Parquet row group
+    """
+    if is_parquet(filename):
+        # older files mix booleans and the 'false' string, which Arrow
+        # cannot store in one column
+        if 'verified' in gdf.columns:
+            gdf = gdf.assign(verified=is_verified(gdf['verified']))
+        gdf.to_parquet(
+            filename, compression='zstd', row_group_size=row_group_size)
+        return
+    gdf.to_file(filename, layer=layer, driver=driver)
+
+
+def convert_table(
+            input_filename: str,
+            output_filename: str,
+            layer: str = 'validation'
+        ) -> None:
+    """
+    Convert a validation table between GeoPackage and (Geo)Parquet, the
+    default layer of the input is written to layer.
+    """
+    write_table(read_table(input_filename), output_filename, layer=layer)
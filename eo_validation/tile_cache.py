@@ -0,0 +1,399 @@
+import os
+import grp
+import json
+import math
+import stat
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+from functools import lru_cache
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# private to the user, share a cache with tile_cache_group instead
+DEFAULT_TILE_CACHE_DIR = os.path.join(
+    tempfile.gettempdir(), f'eo-validation-tiles-{os.getuid()}')
+
+
+def _check_directory(cache_dir: str, gid: int = None) -> None:
+    """
+    Refuse a cache directory other users could write to, tiles written
+    there are served to every session using it.
+    """
+    dir_stat = os.lstat(cache_dir)
+    if not stat.S_ISDIR(dir_stat.st_mode):
+        raise PermissionError(f'{cache_dir} is not a directory')
+    if dir_stat.st_mode & stat.S_IWOTH:
+        raise PermissionError(f'{cache_dir} is writable by every user')
+    if dir_stat.st_uid == os.getuid():
+        return
+    if gid is not None and dir_stat.st_gid == gid:
+        return
+    raise PermissionError(
+        f'{cache_dir} is owned by another user, set a group to share it')
+
+
+def prepare_cache_dir(cache_dir: str, group: str = None) -> None:
+    """
+    Create the cache directory, private to the user (0700) or shared
+    with the members of group (2770, new tiles inherit the group), and
+    check the ownership of an existing one.
+    """
+    gid = None if group is None else grp.getgrnam(group).gr_gid
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    os.makedirs(parent, exist_ok=True)
+    try:
+        os.mkdir(cache_dir, 0o700)
+    except FileExistsError:
+        pass
+    else:
+        if gid is not None:
+            os.chown(cache_dir, -1, gid)
+            os.chmod(cache_dir, 0o2770)
+    _check_directory(cache_dir, gid)
+
+
+class TileCache(object):
+    """
+    Size-bounded on-disk LRU cache of rendered tiles.
+
+    Each tile is a file named by the hash of its key, reading a tile
+    refreshes its modification time and the least recently used tiles are
+    removed once the cache grows past max_bytes. Several processes of the
+    user, and the members of group when given, can use the same cache
+    directory. Each process counts the tiles it writes and measures the
+    directory again every size_check_interval seconds, so the tiles of
+    the other processes count towards max_bytes too.
+    Args:
+        cache_dir (str): cache directory
+        max_bytes (int): maximum size of the cache
+        group (str): group sharing the cache, private to the user if None
+        size_check_interval (float): seconds between directory size checks
+    """
+
+    def __init__(
+                self,
+                cache_dir: str = None,
+                max_bytes: int = 2 * 1024 ** 3,
+                group: str = None,
+                size_check_interval: float = 30.0
+            ):
+
+        if cache_dir is None:
+            cache_dir = DEFAULT_TILE_CACHE_DIR
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.group = group
+        self.size_check_interval = size_check_interval
+
+        prepare_cache_dir(cache_dir, group)
+
+        self._lock = threading.Lock()
+        self._size = self._disk_size()
+        self._size_checked = time.monotonic()
+
+    def key(self, *parts) -> str:
+        """
+        Hash the parts identifying a tile into a cache key.
+        """
+        return hashlib.sha1(
+            json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.tile')
+
+    def _disk_size(self) -> int:
+        size = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.tile'):
+                    try:
+                        size += entry.stat().st_size
+                    except OSError:
+                        continue
+        return size
+
+    def get(self, key: str):
+        """
+        Return the cached tile, None if missing.
+        """
+        filename = self._filename(key)
+        try:
+            with open(filename, 'rb') as tile_file:
+                data = tile_file.read()
+            os.utime(filename)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store a tile, evicting the least recently used ones if needed.
+        """
+        fd, tmp_filename = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tile_file:
+                tile_file.write(data)
+            os.chmod(tmp_filename, 0o644)
+            os.replace(tmp_filename, self._filename(key))
+        except OSError:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        with self._lock:
+            self._size += len(data)
+            if time.monotonic() - self._size_checked \
+                    >= self.size_check_interval:
+                self._size = self._disk_size()
+                self._size_checked = time.monotonic()
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def evict(self, ratio: float = 0.9) -> None:
+        """
+        Remove the least recently used tiles until the cache is below
+        ratio times max_bytes.
+        """
+        tiles = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.tile'):
+                    try:
+                        tile_stat = entry.stat()
+                    except OSError:
+                        continue
+                    tiles.append(
+                        (tile_stat.st_mtime, tile_stat.st_size, entry.path))
+
+        size = sum(tile[1] for tile in tiles)
+        for _, tile_size, filename in sorted(tiles):
+            if size <= self.max_bytes * ratio:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                # removed by another process
+                pass
+            size -= tile_size
+        self._size = size
+        self._size_checked = time.monotonic()
+
+
+class _TileRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        # /tiles/<layer>/<z>/<x>/<y>.png
+        parts = self.path.split('?')[0].strip('/').split('/')
+        try:
+            _, layer_key, z, x, y = parts
+            y = y.split('.')[0]
+            data = self.server.tile_server.get_tile(
+                layer_key, int(z), int(x), int(y))
+        except (KeyError, ValueError):
+            self.send_error(404)
+            return
+        except urllib.error.HTTPError as e:
+            self.send_error(e.code)
+            return
+        except Exception as e:
+            logger.exception(f'Failed to render {self.path}')
+            self.send_error(502, str(e))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        return
+
+
+class CachedTileServer(object):
+    """
+    Local HTTP server answering tile requests from a TileCache and
+    forwarding the misses to the tile server rendering the raster.
+    Args:
+        cache (TileCache): tile cache
+        host (str): address to listen on
+        port (int): port to listen on, any free port if 0
+        timeout (float): seconds to wait for the upstream tile server
+    """
+
+    def __init__(
+                self,
+                cache: TileCache,
+                host: str = '127.0.0.1',
+                port: int = 0,
+                timeout: float = 60.0
+            ):
+
+        self.cache = cache
+        self.timeout = timeout
+        self._layers = dict()
+
+        self.httpd = ThreadingHTTPServer((host, port), _TileRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.tile_server = self
+        self.host, self.port = self.httpd.server_address[:2]
+
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def register(self, upstream_url: str, *key_parts) -> str:
+        """
+        Register a tile URL template of the upstream tile server.
+        Args:
+            upstream_url (str): URL with {z}, {x} and {y} placeholders
+            key_parts: values identifying the rendered tiles, e.g. the raster
+                signature, bands and style. The upstream URL is not part of
+                the key, it changes with the port of every tile server.
+        Returns:
+            str: key of the layer on this server
+        """
+        layer_key = self.cache.key(*key_parts)
+        self._layers[layer_key] = upstream_url
+        return layer_key
+
+    def tile_path(self, layer_key: str) -> str:
+        """
+        Return the path template of the cached tiles of a layer.
+        """
+        return f'/tiles/{layer_key}/{{z}}/{{x}}/{{y}}.png'
+
+    def get_tile(self, layer_key: str, z: int, x: int, y: int) -> bytes:
+        """
+        Return a tile, rendering it with the upstream server on a miss.
+        """
+        upstream_url = self._layers[layer_key]
+        key = self.cache.key(layer_key, z, x, y)
+
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        start_time = time.time()
+        with urllib.request.urlopen(
+                upstream_url.format(z=z, x=x, y=y),
+                timeout=self.timeout) as response:
+            data = response.read()
+        self.cache.put(key, data)
+        logger.debug(
+            f'Rendered tile {z}/{x}/{y} in {time.time() - start_time:.2f}s')
+        return data
+
+    def shutdown(self) -> None:
+        """
+        Stop the HTTP server.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def tiles_in_view(
+            lat: float,
+            lon: float,
+            zoom: int,
+            width: int = 1024,
+            height: int = 600,
+            tile_size: int = 256
+        ) -> list:
+    """
+    Return the (z, x, y) web mercator tiles of a map view of width by
+    height pixels centered on lat and lon, from the center outwards.
+    """
+    n_tiles = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    center_x = (lon + 180.0) / 360.0 * n_tiles * tile_size
+    center_y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) \
+        / 2.0 * n_tiles * tile_size
+
+    # a view wider than the world wraps onto the same tiles
+    tiles = set()
+    for y in range(
+            int((center_y - height / 2) // tile_size),
+            int((center_y + height / 2) // tile_size) + 1):
+        for x in range(
+                int((center_x - width / 2) // tile_size),
+                int((center_x + width / 2) // tile_size) + 1):
+            if 0 <= y < n_tiles:
+                tiles.add((zoom, x % n_tiles, y))
+
+    return sorted(tiles, key=lambda tile: (
+        ((tile[1] + 0.5) * tile_size - center_x) ** 2
+        + ((tile[2] + 0.5) * tile_size - center_y) ** 2, tile))
+
+
+class TilePrefetcher(threading.Thread):
+    """
+    Background thread rendering tiles into the cache of a tile server
+    before they are requested by the browser.
+
+    A new prefetch request replaces the tiles still waiting from the
+    previous one, the map has moved and they are no longer the next ones.
+    Args:
+        tile_server (CachedTileServer): server rendering and caching tiles
+    """
+
+    def __init__(self, tile_server: CachedTileServer):
+
+        threading.Thread.__init__(self, daemon=True)
+
+        self.tile_server = tile_server
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self.start()
+
+    def prefetch(self, layer_key: str, tiles: list) -> None:
+        """
+        Queue the (z, x, y) tiles of a layer, dropping older requests.
+        """
+        with self._condition:
+            self._pending.clear()
+            self._pending.extend((layer_key, *tile) for tile in tiles)
+            self._condition.notify()
+
+    def run(self) -> None:
+        while True:
+
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                layer_key, z, x, y = self._pending.popleft()
+
+            try:
+                self.tile_server.get_tile(layer_key, z, x, y)
+            except Exception:
+                logger.debug(f'Failed to prefetch tile {z}/{x}/{y}')
+
+
+@lru_cache(maxsize=None)
+def get_prefetcher(tile_server: CachedTileServer) -> TilePrefetcher:
+    """
+    Return the tile prefetcher of this process for a tile server.
+    """
+    return TilePrefetcher(tile_server)
+
+
+@lru_cache(maxsize=None)
+def get_tile_server(
+            cache_dir: str = None,
+            max_bytes: int = 2 * 1024 ** 3,
+            group: str = None
+        ):
+    """
+    Return the tile server of this process for a cache directory.
+    """
+    return CachedTileServer(TileCache(cache_dir, max_bytes, group))
@@ -1,27 +1,18 @@
 import os
 import pwd
-import copy
-import math
+import html
 import time
 import socket
-import ipysheet
+import logging
+import sqlite3
+import threading
 import ipyleaflet
 import numpy as np
 import pandas as pd
-import geopandas as gpd
-import rioxarray as rxr
 import ipywidgets as widgets
 
-try:
-    import whiteboxgui.whiteboxgui as wbt
-    whitebox_imported = True
-except FileNotFoundError:
-    whitebox_imported = False
-
-
-from glob import glob
+from collections import OrderedDict, deque
 from pathlib import Path
-from ipyfilechooser import FileChooser
 from IPython.display import display
 from ipyleaflet import (
     FullScreenControl,
@@ -35,19 +26,41 @@ from ipyleaflet import (
     MarkerCluster,
     WidgetControl,
     GeoData,
+    GeoJSON,
     TileLayer,
     Popup
 )
-from shapely.geometry import shape
 from eo_validation.async_write import AsyncWriteGDF
+from eo_validation.cache import DEFAULT_CACHE_DIR, DEFAULT_COG_DIR, \
+    FileCache, file_signature
+from eo_validation.gpkg_writer import SchemaChangedError, update_feature
+from eo_validation.journal import EditJournal, replay_journal
+from eo_validation.mask_index import get_mask_index
+from eo_validation.point_layer import PointLayer
+from eo_validation.point_store import PointStore, PointTableView
+from eo_validation.sampling import VALIDATION_COLUMNS, allocate_points, \
+    class_histogram, class_offset, generate_points, init_validation_points, \
+    is_verified
+from eo_validation.storage import format_extension, read_table
+from eo_validation.tile_cache import (
+    DEFAULT_TILE_CACHE_DIR,
+    get_prefetcher,
+    get_tile_server,
+    tiles_in_view
+)
+from eo_validation.whitebox_toolbox import ToolboxLoader
+
+logger = logging.getLogger(__name__)
+
+# geopandas, rasterio, pyproj, shapely, ipysheet and ipyfilechooser are
+# imported by the code paths using them, importing the dashboard only
+# loads ipyleaflet, ipywidgets and pandas
 
 
 if os.getenv("JUPYTERHUB_SERVICE_PREFIX") is not None:
     os.environ['LOCALTILESERVER_CLIENT_PREFIX'] = \
         f"{os.environ['JUPYTERHUB_SERVICE_PREFIX'].lstrip('/')}/proxy/{{port}}"
 
-from localtileserver import get_leaflet_tile_layer, TileClient
-
 
 class ValidationDashboard(ipyleaflet.Map):
     """This Map class inherits the ipyleaflet Map class.
@@ -206,6 +219,13 @@ class ValidationDashboard(ipyleaflet.Map):
         else:
             self.points_dir = kwargs['points_dir']
 
+        # Define the directory with the optimized (COG) copies of the
+        # rasters, written by eo-validation-prepare
+        if "cog_dir" not in kwargs:
+            self.cog_dir = DEFAULT_COG_DIR
+        else:
+            self.cog_dir = kwargs['cog_dir']
+
         # Define if validation points need to be generated
         if "gen_points" not in kwargs:
             self.gen_points = True
@@ -256,18 +276,179 @@ class ValidationDashboard(ipyleaflet.Map):
         else:
             self.chunks = kwargs["chunks"]
 
+        # Define cache directory, shared by the per-file caches
+        if "cache_dir" not in kwargs:
+            self.cache_dir = DEFAULT_CACHE_DIR
+        else:
+            self.cache_dir = kwargs["cache_dir"]
+
+        self.histogram_cache = FileCache(self.cache_dir, 'histograms')
+        self.stats_cache = FileCache(self.cache_dir, 'stats')
+
+        # Define if raster tiles go through the on-disk tile cache, shared
+        # by the sessions of the user, or of tile_cache_group, on the host
+        if "tile_cache" not in kwargs:
+            self.tile_cache = False
+        else:
+            self.tile_cache = kwargs["tile_cache"]
+
+        if "tile_cache_dir" not in kwargs:
+            self.tile_cache_dir = DEFAULT_TILE_CACHE_DIR
+        else:
+            self.tile_cache_dir = kwargs["tile_cache_dir"]
+
+        if "tile_cache_size" not in kwargs:
+            self.tile_cache_size = 2 * 1024 ** 3
+        else:
+            self.tile_cache_size = kwargs["tile_cache_size"]
+
+        if "tile_cache_group" not in kwargs:
+            self.tile_cache_group = None
+        else:
+            self.tile_cache_group = kwargs["tile_cache_group"]
+
+        # Define how many of the next points get their tiles rendered in
+        # the background, requires the tile cache
+        if "prefetch_points" not in kwargs:
+            self.prefetch_points_count = 3
+        else:
+            self.prefetch_points_count = kwargs["prefetch_points"]
+            if self.prefetch_points_count and not self.tile_cache:
+                logger.warning(
+                    'prefetch_points needs the tile cache, set tile_cache '
+                    'to True to prefetch the tiles of the next points')
+
+        self._tile_layer_key = None
+
+        # Define the subsample used for the display band statistics, the
+        # longest side in pixels, and if they are refined at full resolution
+        if "stats_max_size" not in kwargs:
+            self.stats_max_size = 1024
+        else:
+            self.stats_max_size = kwargs["stats_max_size"]
+
+        if "exact_stats" not in kwargs:
+            self.exact_stats = False
+        else:
+            self.exact_stats = kwargs["exact_stats"]
+
+        # Define the storage format of the validation files, gpkg or
+        # parquet, GeoPackage files can always be read
+        if "storage_format" not in kwargs:
+            self.storage_format = 'gpkg'
+        else:
+            self.storage_format = kwargs["storage_format"]
+        self.file_extension = format_extension(self.storage_format)
+
         self.output_filename = None
         self.raster_crs = None
 
+        # Define if point popups are built on the first click, and how
+        # many popup instances are kept for reuse
+        if "lazy_popups" not in kwargs:
+            self.lazy_popups = False
+        else:
+            self.lazy_popups = kwargs["lazy_popups"]
+
+        if "popup_pool_size" not in kwargs:
+            self.popup_pool_size = 8
+        else:
+            self.popup_pool_size = kwargs["popup_pool_size"]
+
+        # Define how validation points are drawn, 'markers' adds a marker
+        # per point, 'vector' draws all of them as a single vector layer
+        if "point_layer" not in kwargs:
+            self.point_layer = 'markers'
+        else:
+            self.point_layer = kwargs["point_layer"]
+
         self._validation_sheet = None
+        self._point_store = None
+        self._popup_pool = OrderedDict()
         self._markers_dict = dict()
+        self._polygon_index = dict()
+        self._polygon_positions = dict()
         self._marker_counter = -1
 
         self._current_marker_id = None
         self._current_time = None
         self._seconds_per_point = None
 
-        self.async_writer = AsyncWriteGDF()
+        # failed background writes are shown on the map, the annotator
+        # would otherwise keep working on edits that are not on disk
+        self._save_errors = []
+        self._save_warning = None
+        self._save_warning_lock = threading.Lock()
+        self.async_writer = AsyncWriteGDF(
+            on_error=lambda filename, error: self.check_save_errors())
+
+        # Define if edits go to an append-only journal, compacted into the
+        # GeoPackage in the background
+        if "journal" not in kwargs:
+            self.journal = True
+        else:
+            self.journal = kwargs["journal"]
+
+        self._journals = dict()
+
+        # Define the central store shared by every annotator, the labels
+        # are committed to it besides the annotator's own file
+        if "validation_store" not in kwargs:
+            self.validation_store = None
+        else:
+            self.validation_store = kwargs["validation_store"]
+        if isinstance(self.validation_store, str):
+            from eo_validation.validation_store import ValidationStore
+            self.validation_store = ValidationStore(self.validation_store)
+
+        self._store_filename = None
+
+        # Define if the next point comes from the scheduler of the central
+        # store, leasing unverified points to this session in batches
+        if "scheduler" not in kwargs:
+            self.scheduler = False
+        else:
+            self.scheduler = kwargs["scheduler"]
+
+        # Define the number of points per lease
+        if "lease_size" not in kwargs:
+            self.lease_size = 20
+        else:
+            self.lease_size = kwargs["lease_size"]
+
+        # Define the seconds before the points of a lease go back to the
+        # queue, e.g. when the session is abandoned
+        if "lease_seconds" not in kwargs:
+            self.lease_seconds = 1800.0
+        else:
+            self.lease_seconds = kwargs["lease_seconds"]
+
+        # Define the number of annotators labelling each point
+        if "overlap" not in kwargs:
+            self.overlap = 1
+        else:
+            self.overlap = kwargs["overlap"]
+
+        if self.scheduler is True:
+            assert self.validation_store is not None, \
+                'the scheduler needs a validation_store'
+            from eo_validation.scheduler import PointScheduler
+            self.scheduler = PointScheduler(
+                self.validation_store, self.lease_seconds, self.overlap)
+        elif not self.scheduler:
+            self.scheduler = None
+
+        self._leased_points = deque()
+
+        # Define if the WhiteboxTools tools are loaded in the background
+        # once the map is shown, otherwise on the first gears click
+        if "preload_whitebox" not in kwargs:
+            self.preload_whitebox = True
+        else:
+            self.preload_whitebox = kwargs["preload_whitebox"]
+
+        self.whitebox = None
+        self._whitebox_loader = None
 
         # Adding default Google Basemap
         google_satellite_basemap = TileLayer(
@@ -278,6 +459,20 @@ class ValidationDashboard(ipyleaflet.Map):
         # Start main toolbar
         self._main_toolbar()
 
+    def _repr_mimebundle_(self, **kwargs):
+        # the map is being shown, load the tools in the background
+        if self.preload_whitebox:
+            self.load_whitebox_toolbox()
+        return super()._repr_mimebundle_(**kwargs)
+
+    def load_whitebox_toolbox(self) -> ToolboxLoader:
+        """
+        Start loading the WhiteboxTools tools in the background, once.
+        """
+        if self._whitebox_loader is None:
+            self._whitebox_loader = ToolboxLoader(self.cache_dir)
+        return self._whitebox_loader
+
     def add_raster(
             self,
             in_raster: str,
@@ -288,29 +483,187 @@ class ValidationDashboard(ipyleaflet.Map):
         """
         Adds a raster layer to the map.
         """
+        from eo_validation.prepare_rasters import find_optimized
+        from eo_validation.raster_stats import get_band_stats
+
+        # use the optimized copy of the raster when it was prepared
+        in_raster = find_optimized(in_raster, self.data_dir, self.cog_dir)
+
+        # localtileserver starts a tile server, imported on first raster
+        from localtileserver import get_leaflet_tile_layer, TileClient
+
         # create TileClient object
         raster_client = TileClient(in_raster)
 
+        # statistics of every band, cached so reopening the scene or
+        # switching bands does not read the raster again
+        raster_stats = get_band_stats(
+            in_raster, self.stats_cache, self.stats_max_size,
+            self.exact_stats)
+
         style_list = []
         for bid, pid in zip(data_bands, ['#f00', '#0f0', '#00f']):
-            band_stats = raster_client.rasterio.statistics(bid)
-            newmin = band_stats.mean - (band_stats.std * sigma)
-            newmax = band_stats.mean + (band_stats.std * sigma)
+            band_stats = raster_stats[str(bid)]
+            newmin = band_stats['mean'] - (band_stats['std'] * sigma)
+            newmax = band_stats['mean'] + (band_stats['std'] * sigma)
             style_list.append(
                 {'band': bid, 'palette': pid, 'min': newmin, 'max': newmax})
 
-        self.add_layer(
-            get_leaflet_tile_layer(
-                raster_client, show=False, band=data_bands,
-                cmap=cmap, max_zoom=self.default_max_zoom,
-                max_native_zoom=self.default_max_zoom,
-                name=layer_name, scheme='linear',
-                dtype='uint16', style={'bands': style_list}
-            )
+        tile_layer = get_leaflet_tile_layer(
+            raster_client, show=False, band=data_bands,
+            cmap=cmap, max_zoom=self.default_max_zoom,
+            max_native_zoom=self.default_max_zoom,
+            name=layer_name, scheme='linear',
+            dtype='uint16', style={'bands': style_list}
         )
+
+        # serve the tiles through the cache shared by every session
+        self._tile_layer_key = None
+        if self.tile_cache and os.path.isfile(in_raster):
+            tile_layer.url = self.cached_tile_url(
+                raster_client, tile_layer.url, in_raster,
+                data_bands, cmap, style_list)
+
+        self.add_layer(tile_layer)
         self.center = raster_client.center()  # center Map around raster
         self.zoom = raster_client.default_zoom  # zoom to raster center
 
+    def cached_tile_url(self, raster_client, url, in_raster, *key_parts):
+        """
+        Register the tile URL of a raster in the shared tile cache and
+        return the URL of the cached tiles.
+        """
+        tile_server = get_tile_server(
+            self.tile_cache_dir, self.tile_cache_size, self.tile_cache_group)
+
+        # the browser may reach the tile server through a proxy prefix,
+        # the cache fetches the tiles from the server directly
+        client_base_url = raster_client.client_base_url.rstrip('/')
+        if client_base_url and url.startswith(client_base_url):
+            url = raster_client.server_base_url.rstrip('/') + \
+                url[len(client_base_url):]
+
+        self._tile_layer_key = tile_server.register(
+            url, file_signature(in_raster), *key_parts)
+        path = tile_server.tile_path(self._tile_layer_key)
+
+        if raster_client.client_prefix:
+            return raster_client.client_prefix.rstrip('/').replace(
+                str(raster_client.server_port), str(tile_server.port)) + path
+        return f'http://{tile_server.host}:{tile_server.port}{path}'
+
+    def prefetch_points(self, step: int = 1) -> None:
+        """
+        Render in the background the tiles of the next prefetch_points
+        points in traversal order, step is +1 or -1, and of the previous
+        point, at default_zoom for the current raster bands.
+        """
+        if self._tile_layer_key is None or not self.prefetch_points_count:
+            return
+
+        locations = list(self._markers_dict)
+        if len(locations) == 0:
+            return
+
+        offsets = [
+            step * offset
+            for offset in range(1, self.prefetch_points_count + 1)
+        ] + [-step]
+
+        tiles = []
+        for offset in offsets:
+            lat, lon = locations[
+                (self._marker_counter + offset) % len(locations)]
+            tiles.extend(tiles_in_view(lat, lon, self.default_zoom))
+
+        tile_server = get_tile_server(
+            self.tile_cache_dir, self.tile_cache_size, self.tile_cache_group)
+        get_prefetcher(tile_server).prefetch(
+            self._tile_layer_key, list(dict.fromkeys(tiles)))
+
+    def next_leased_point(self):
+        """
+        Return the next point, or polygon, leased to this session by the
+        scheduler, None without scheduler or when no point is available,
+        every point of the file is done or leased to other annotators.
+        """
+        if self.scheduler is None or self._store_filename is None:
+            return None
+
+        # polygons are split between annotators by their group
+        group = None
+        if self._point_store is None:
+            group = self.filter_points_by
+
+        # lease a new batch once the current one is used, points already
+        # verified in this session's file are recorded as done and skipped
+        leased = set()
+        while True:
+            if not self._leased_points:
+                point_ids = [
+                    point_id for point_id in self.scheduler.lease(
+                        self._store_filename, self.username,
+                        self.lease_size, group)
+                    if point_id not in leased
+                ]
+                if not point_ids:
+                    return None
+                leased.update(point_ids)
+                self._leased_points.extend(point_ids)
+
+            verified = dict()
+            while self._leased_points:
+                point_id = self._leased_points.popleft()
+                if self.marker_position(point_id) is None:
+                    continue
+                values = self.get_point_values(point_id)
+                if not is_verified(values['verified']):
+                    self.record_verified(verified)
+                    return point_id
+                verified[point_id] = values
+            self.record_verified(verified)
+
+    def get_point_values(self, point_id) -> dict:
+        """
+        Return the columns of a point, or of a polygon, by its ID.
+        """
+        if self._point_store is not None:
+            return self._point_store.get(point_id)
+        return self.get_polygon_properties(point_id)
+
+    def marker_position(self, point_id):
+        """
+        Return the position of a point, or polygon, in the traversal
+        order, None if it is not shown on the map.
+        """
+        if self._point_store is not None:
+            try:
+                return self._point_store.position(point_id)
+            except KeyError:
+                return None
+        return self._polygon_positions.get(point_id)
+
+    def complete_lease(self, point_id, verified) -> None:
+        """
+        End the lease of a saved point once it is verified.
+        """
+        if self.scheduler is not None and self._store_filename is not None \
+                and is_verified(verified):
+            self.scheduler.complete(
+                self._store_filename, self.username, [point_id])
+
+    def record_verified(self, points: dict) -> None:
+        """
+        Commit points verified in this session's file to the central
+        store and end their leases, so they are not leased again.
+        """
+        if not points:
+            return
+        self.validation_store.save_labels(
+            self._store_filename, self.username, points)
+        self.scheduler.complete(
+            self._store_filename, self.username, list(points))
+
     def generate_points(
                 self,
                 raster_filename: str,
@@ -320,127 +673,47 @@ class ValidationDashboard(ipyleaflet.Map):
         """
         Generate points.
         """
-        if mask_filename is not None:
-
-            # read prediction raster
-            raster_prediction = rxr.open_rasterio(
-                mask_filename, chunks=self.chunks)
-            raster_prediction.name = "predicted"
-            raster_prediction = raster_prediction.rio.reproject("EPSG:4326")
-            self.raster_crs = raster_prediction.rio.crs
-
-            # Convert to dataframe and filter no-data
-            raster_prediction = \
-                raster_prediction.squeeze().to_dataframe().reset_index()
-
-            # drop some unecessary columns
-            raster_prediction = raster_prediction.drop(
-                ['band', 'spatial_ref'], axis=1)
-
-            # Only select appropiate values, remove no-data
-            raster_prediction = raster_prediction[
-                raster_prediction['predicted'] >= 0]
-            raster_prediction = raster_prediction[
-                raster_prediction['predicted'] < 255]
-
-            # Make sure classes start from 1, substract 1 if not
-            if raster_prediction['predicted'].min() > 0:
-                raster_prediction['predicted'] = \
-                    raster_prediction['predicted'] - 1
-
-            # Convert mask to int
-            raster_prediction = raster_prediction.astype({'predicted': 'int'})
-            unique_counts = raster_prediction['predicted'].value_counts()
-            original_shape = raster_prediction.shape[0]
-
-            # Make sure expected accuracies match size of classes found
-            if len(self.expected_accuracies) != \
-                    raster_prediction['predicted'].max() + 1:
-                self.expected_accuracies = \
-                    [self.expected_accuracies[0]] * \
-                    (raster_prediction['predicted'].max() + 1)
-
-            percentage_counts, standard_deviation = [], []
-            for class_id, class_count in unique_counts.iteritems():
-                percentage_counts.append(class_count / original_shape)
-                standard_deviation.append(
-                    math.sqrt(
-                        self.expected_accuracies[class_id]
-                        * (1 - self.expected_accuracies[class_id]))
-                )
-
-            unique_counts = unique_counts.to_frame()
-            unique_counts['percent'] = percentage_counts
-            unique_counts['standard_deviation'] = standard_deviation
-            unique_counts = unique_counts.round(2)
-
-            # Choose between Oloffson or static number of points
-            if n_points is not None:
-                val_total_points = n_points
-            else:
-                val_total_points = round(((
-                    unique_counts['percent']
-                    * unique_counts['standard_deviation']).sum()
-                    / self.expected_standard_error) ** 2)
-
-            # Get the number of points per class
-            unique_counts['n_point'] = \
-                (unique_counts['percent'] * val_total_points).apply(np.floor)
-
-            if unique_counts['n_point'].sum() < val_total_points:
-                unique_counts.at[0, 'n_point'] += \
-                    val_total_points - unique_counts['n_point'].sum()
-            elif unique_counts['n_point'].sum() > val_total_points:
-                unique_counts.at[
-                    unique_counts['n_point'].idxmax(), 'n_point'] -= \
-                    unique_counts['n_point'].sum() - val_total_points
-
-            for class_id, row in unique_counts.iterrows():
-                raster_prediction = raster_prediction.drop(
-                    raster_prediction[
-                        raster_prediction['predicted'] == class_id].sample(
-                            n=int(row['predicted'] - row['n_point']),
-                            random_state=24).index
-                )
-
-        # we do not have any mask filename
-        else:
-
-            # read prediction raster
-            raster_prediction = rxr.open_rasterio(
-                raster_filename, chunks=self.chunks)[0, :, :]
-            raster_prediction.name = "predicted"
-            raster_prediction = raster_prediction.rio.reproject("EPSG:4326")
-            self.raster_crs = raster_prediction.rio.crs
-
-            # Convert to dataframe and filter no-data
-            raster_prediction = \
-                raster_prediction.squeeze().to_dataframe().reset_index()
-
-            # drop some unecessary columns
-            raster_prediction = raster_prediction.drop(
-                ['band', 'spatial_ref'], axis=1)
-
-            # Only select appropiate values, remove no-data
-            raster_prediction = raster_prediction[
-                raster_prediction['predicted'] >= 0]
-
-            # Convert mask to int
-            raster_prediction = raster_prediction.astype({'predicted': 'int'})
+        validation_points = generate_points(
+            raster_filename,
+            mask_filename,
+            n_points,
+            expected_accuracies=self.expected_accuracies,
+            expected_standard_error=self.expected_standard_error,
+            chunks=self.chunks,
+            histogram_cache=self.histogram_cache
+        )
+        self.raster_crs = validation_points.crs
+        return validation_points
 
-            # Generate random points (drop randomly from the dataset
-            raster_prediction = raster_prediction.sample(n=n_points)
+    def allocate_points(
+                self,
+                mask_filename: str,
+                n_points: int = None
+            ) -> pd.DataFrame:
+        """
+        Allocate validation points per class from the mask histogram.
+        The histogram is cached per mask, so the allocation can be
+        recomputed instantly after changing expected_accuracies or
+        expected_standard_error.
+        """
+        counts = self.histogram_cache.get(mask_filename)
+        if counts is None:
+            counts = class_histogram(mask_filename, self.chunks)
+            self.histogram_cache.put(mask_filename, counts.tolist())
+        counts = np.asarray(counts, dtype=np.int64)
 
-        # Generate geometry dataframe
-        geometry = gpd.points_from_xy(raster_prediction.x, raster_prediction.y)
-        raster_prediction = gpd.GeoDataFrame(
-            raster_prediction,
-            crs=self.raster_crs,
-            geometry=geometry).reset_index(drop=True)
+        n_point = allocate_points(
+            counts, self.expected_accuracies,
+            self.expected_standard_error, n_points)
 
-        return raster_prediction
+        classes = np.flatnonzero(counts)
+        return pd.DataFrame(
+            {'count': counts[classes], 'n_point': n_point[classes]},
+            index=pd.Index(classes - class_offset(counts), name='class'))
 
     def calculate_centroid(self, polygon_coordinates, geom_type):
+        from shapely.geometry import shape
+
         polygon = shape({
             "type": geom_type,
             "coordinates": polygon_coordinates
@@ -457,21 +730,21 @@ class ValidationDashboard(ipyleaflet.Map):
             ):
 
         # Extract label filename from data filename
-        mask_filename = glob(
-            os.path.join(self.mask_dir, f'{Path(in_raster).stem}*.tif'))
-
-        if len(mask_filename) > 0:
-            mask_filename = mask_filename[0]
-        else:
-            mask_filename = None
+        mask_filename = get_mask_index(
+            self.mask_dir, self.cache_dir).lookup(in_raster)
 
+        # original points in the storage format, GeoPackage is imported
         original_points_filename = os.path.join(
-            self.points_dir, f'{Path(in_raster).stem}.gpkg')
+            self.points_dir, f'{Path(in_raster).stem}{self.file_extension}')
+        if not os.path.isfile(original_points_filename):
+            original_points_filename = os.path.join(
+                self.points_dir, f'{Path(in_raster).stem}.gpkg')
 
         # Extract output filename if None available and doing offline points
         if self.output_filename is None or offline:
             self.output_filename = os.path.join(
-                self.output_dir, f"{Path(in_raster).stem}.gpkg")
+                self.output_dir,
+                f"{Path(in_raster).stem}{self.file_extension}")
 
         # Case #1: student is already working on the points
         if not gen_points or os.path.isfile(self.output_filename):
@@ -485,141 +758,263 @@ class ValidationDashboard(ipyleaflet.Map):
 
         # Case #3: no points available, generate them from scratch
         else:
-            validation_points = self.generate_points(
-                in_raster, mask_filename, n_points)
-            validation_points = validation_points.drop(
-                ['predicted'], axis=1).to_crs(4326)
-            validation_points['operator'] = self.default_class
-            validation_points['burnt'] = 0
-            validation_points['confidence'] = 1
-            validation_points['verified'] = 'false'
-            validation_points['date'] = None
-            validation_points['seconds_taken'] = None
-
-        # Create ipysheet object
-        self._validation_sheet = ipysheet.sheet(
-            ipysheet.from_dataframe(
-                validation_points.to_crs(4326).drop(['geometry'], axis=1)))
+            validation_points = init_validation_points(
+                self.generate_points(in_raster, mask_filename, n_points),
+                self.default_class)
+
+        # verified is edited through checkboxes, store it as boolean
+        validation_points['verified'] = \
+            validation_points['verified'].map(is_verified)
+
+        # the point store is the single source of truth of the session
+        self._point_store = PointStore(validation_points.to_crs(4326))
+
+        # register the points of the file in the central store
+        if self.validation_store is not None:
+            self._store_filename = Path(in_raster).stem
+            self.validation_store.add_points(
+                self._store_filename, self._point_store.ids,
+                self._point_store.lon, self._point_store.lat)
+        self._leased_points.clear()
         widgets.Dropdown.value.tag(sync=True)
 
         if not offline:
 
-            # Iterate over each point and add them to the map
-            for index, point in validation_points.iterrows():
-
-                # get coordinates
-                coordinates = (point['geometry'].y, point['geometry'].x)
-                if point['verified'] == 'false' or not point['verified']:
-                    verified_option = False
-                else:
-                    verified_option = True
-
-                radio_check_widget = widgets.RadioButtons(
-                    options=self.validation_classes,
-                    value=point['operator'],
-                    layout={'width': 'max-content'},
-                    description='Validation:',
-                    disabled=False
-                )
-
-                radio_burn_widget = widgets.RadioButtons(
-                    options=[('not-burnt', 0), ('burnt', 1)],
-                    value=point['burnt'],
-                    layout={'width': 'max-content'},
-                    description='Burnt:',
-                    disabled=False
-                )
+            self._validation_sheet = PointTableView(self._point_store)
+            self._popup_pool = OrderedDict()
 
-                radio_confidence_widget = widgets.RadioButtons(
-                    options=[
-                        ('high-confidence', 1),
-                        ('medium-confidence', 2),
-                        ('low-confidence', 3)],
-                    value=point['confidence'],
-                    layout={'width': 'max-content'},
-                    description='Confidence:',
-                    disabled=False
-                )
+            def handle_marker_on_click(*args, **kwargs):
 
-                point_id_widget = widgets.IntText(
-                    value=index,
-                    description='ID:',
-                    disabled=True
+                clicked_marker = self._markers_dict[
+                    tuple(kwargs['coordinates'])]
+                clicked_marker.icon = AwesomeIcon(
+                    name='check-square',
+                    marker_color='green',
+                    icon_color='black'
                 )
 
-                checked_widget = widgets.Checkbox(
-                    value=verified_option,
-                    description='Verified:',
-                    disabled=False
-                )
+                if self.lazy_popups:
+                    self.open_point_popup(
+                        clicked_marker._row_id, clicked_marker.location)
+                self.save_point(clicked_marker._row_id)
 
-                popup = widgets.VBox([
-                    point_id_widget,
-                    radio_check_widget,
-                    radio_burn_widget,
-                    radio_confidence_widget,
-                    checked_widget
-                ])
-
-                marker = Marker(
-                    name=str(index),
-                    location=coordinates,
-                    draggable=False,
-                    keyboard=True,
-                    popup=popup
-                )
+            # all points in one vector layer, popups are built on click
+            if self.point_layer == 'vector':
 
-                if verified_option:
-                    marker.icon = AwesomeIcon(
-                        name='check-square',
-                        marker_color='green',
-                        icon_color='black'
-                    )
+                def handle_point_on_click(row_id):
+                    self.open_point_popup(
+                        row_id, self._point_store.location(row_id))
+                    self.save_point(row_id)
 
-                cell = ipysheet.cell(index, 2, point['operator'])
-                widgets.jslink((cell, 'value'), (radio_check_widget, 'value'))
-                cell = ipysheet.cell(index, 3, point['burnt'])
-                widgets.jslink((cell, 'value'), (radio_burn_widget, 'value'))
-                cell = ipysheet.cell(index, 4, point['confidence'])
-                widgets.jslink(
-                    (cell, 'value'), (radio_confidence_widget, 'value'))
-                cell = ipysheet.cell(index, 5, verified_option)
-                widgets.jslink((cell, 'value'), (checked_widget, 'value'))
+                self._markers_dict = dict(zip(
+                    zip(self._point_store.lat.tolist(),
+                        self._point_store.lon.tolist()),
+                    self._point_store.ids.tolist()))
 
-                # Store the real marker object in the dictionary
-                self._markers_dict[tuple(marker.location)] = marker
+                point_layer = PointLayer(
+                    self._point_store, classes=self.validation_classes)
+                point_layer.on_click(handle_point_on_click)
+                self.add_layer(point_layer)
 
-                def handle_marker_on_click(*args, **kwargs):
+            else:
 
-                    self._markers_dict[
-                        tuple(kwargs['coordinates'])].icon = AwesomeIcon(
+                # Iterate over each point and add them to the map
+                for index, lat, lon, verified in zip(
+                        self._point_store.ids,
+                        self._point_store.lat,
+                        self._point_store.lon,
+                        self._point_store.columns['verified']):
+
+                    # only the ID and location, widgets are built on click
+                    if self.lazy_popups:
+                        marker = Marker(
+                            name=str(index),
+                            location=(lat, lon),
+                            draggable=False,
+                            keyboard=True
+                        )
+
+                    else:
+                        point_widgets = self.create_point_widgets(
+                            index, self._point_store.get(index))
+                        for widget in point_widgets[1:]:
+                            widget.observe(
+                                lambda change, index=index:
+                                    self._point_store.update(index, {
+                                        change['owner']._property_key:
+                                            change['new']}),
+                                'value')
+
+                        marker = Marker(
+                            name=str(index),
+                            location=(lat, lon),
+                            draggable=False,
+                            keyboard=True,
+                            popup=widgets.VBox(point_widgets)
+                        )
+
+                    marker._row_id = index
+
+                    if is_verified(verified):
+                        marker.icon = AwesomeIcon(
                             name='check-square',
                             marker_color='green',
                             icon_color='black'
-                    )
+                        )
 
-                    self.save_gpkg(
-                        ipysheet.to_dataframe(self._validation_sheet),
-                        self.output_filename
-                    )
-                marker.on_click(handle_marker_on_click)
+                    # Store the real marker object in the dictionary
+                    self._markers_dict[tuple(marker.location)] = marker
+                    marker.on_click(handle_marker_on_click)
 
-            marker_cluster = MarkerCluster(
-                markers=tuple(list(self._markers_dict.values())),
-                name="validation"
-            )
+                marker_cluster = MarkerCluster(
+                    markers=tuple(list(self._markers_dict.values())),
+                    name="validation"
+                )
 
-            # Add layer to map
-            self.add_layer(marker_cluster)
+                # Add layer to map
+                self.add_layer(marker_cluster)
+
+            # render the tiles of the first points in the background
+            self.prefetch_points(1)
 
         # Save GPKG file with dataframe
-        self.save_gpkg(
-            ipysheet.to_dataframe(self._validation_sheet),
-            self.output_filename
-        )
+        self.save_gpkg(self._point_store.to_dataframe(), self.output_filename)
 
         return
 
+    def create_point_widgets(self, index, point) -> list:
+        """
+        Create the popup widgets of a single validation point.
+        """
+        radio_check_widget = widgets.RadioButtons(
+            options=self.validation_classes,
+            value=point['operator'],
+            layout={'width': 'max-content'},
+            description='Validation:',
+            disabled=False
+        )
+        radio_check_widget._property_key = 'operator'
+
+        radio_burn_widget = widgets.RadioButtons(
+            options=[('not-burnt', 0), ('burnt', 1)],
+            value=point['burnt'],
+            layout={'width': 'max-content'},
+            description='Burnt:',
+            disabled=False
+        )
+        radio_burn_widget._property_key = 'burnt'
+
+        radio_confidence_widget = widgets.RadioButtons(
+            options=[
+                ('high-confidence', 1),
+                ('medium-confidence', 2),
+                ('low-confidence', 3)],
+            value=point['confidence'],
+            layout={'width': 'max-content'},
+            description='Confidence:',
+            disabled=False
+        )
+        radio_confidence_widget._property_key = 'confidence'
+
+        point_id_widget = widgets.IntText(
+            value=index,
+            description='ID:',
+            disabled=True
+        )
+
+        checked_widget = widgets.Checkbox(
+            value=is_verified(point['verified']),
+            description='Verified:',
+            disabled=False
+        )
+        checked_widget._property_key = 'verified'
+
+        return [
+            point_id_widget,
+            radio_check_widget,
+            radio_burn_widget,
+            radio_confidence_widget,
+            checked_widget
+        ]
+
+    def open_point_popup(self, row_id, location) -> None:
+        """
+        Open the popup of a point at location, popups are built on demand
+        and the least recently used ones are rebound to new points.
+        """
+        point = self._point_store.get(row_id)
+
+        if row_id in self._popup_pool:
+            self._popup_pool.move_to_end(row_id)
+            popup = self._popup_pool[row_id]
+
+        else:
+            if len(self._popup_pool) >= self.popup_pool_size:
+                _, popup = self._popup_pool.popitem(last=False)
+            else:
+                popup = Popup(
+                    child=widgets.VBox(self.create_point_widgets(
+                        row_id, point)),
+                    close_button=True,
+                    auto_close=False,
+                    name='Validation point'
+                )
+                for widget in popup.child.children[1:]:
+                    widget.observe(
+                        lambda change, popup=popup:
+                            self._point_widget_changed(popup, change),
+                        'value')
+
+            # rebind the widgets to the clicked point
+            popup._binding = True
+            popup.child.children[0].value = row_id
+            for widget in popup.child.children[1:]:
+                value = point[widget._property_key]
+                if widget._property_key == 'verified':
+                    value = is_verified(value)
+                widget.value = value
+            popup._binding = False
+            popup._row_id = row_id
+            self._popup_pool[row_id] = popup
+
+        if popup not in self.layers:
+            popup.location = location
+            self.add_layer(popup)
+        else:
+            popup.open_popup(location)
+
+    def _point_widget_changed(self, popup, change) -> None:
+        """
+        Store the edit of a pooled popup widget in the point store.
+        """
+        if getattr(popup, '_binding', False):
+            return
+        self._point_store.update(
+            popup._row_id, {change['owner']._property_key: change['new']})
+        self.save_point(popup._row_id)
+
+    def save_point(self, row_id) -> None:
+        """
+        Save the editable columns of a single point from the point store.
+        """
+        point = self._point_store.get(row_id)
+
+        # fids are assigned in row order on full writes
+        self.save_row(
+            {column: point[column]
+             for column in ['operator', 'burnt', 'confidence', 'verified']},
+            'fid', self._point_store.position(row_id) + 1,
+            lambda: self.save_gpkg(
+                self._point_store.to_dataframe(), self.output_filename)
+        )
+
+        if self.validation_store is not None:
+            self.validation_store.save_labels(
+                self._store_filename, self.username, {row_id: point})
+
+        # verified points are done, their lease ends
+        self.complete_lease(row_id, point['verified'])
+
     def add_polygon_markers(
                 self,
                 in_filename: str
@@ -630,7 +1025,8 @@ class ValidationDashboard(ipyleaflet.Map):
             # self.output_filename = os.path.join(
             #    self.output_dir, f"{Path(in_filename).stem}.gpkg")
             self.output_filename = os.path.join(
-                self.output_dir, f"{Path(in_filename).stem}.gpkg")
+                self.output_dir,
+                f"{Path(in_filename).stem}{self.file_extension}")
 
         # Case #1: student is already working on the points
         if os.path.isfile(self.output_filename):
@@ -650,7 +1046,17 @@ class ValidationDashboard(ipyleaflet.Map):
             validation_points['date'] = None
             validation_points['seconds_taken'] = None
 
+        # register the polygons of the file in the central store
+        if self.validation_store is not None:
+            self._store_filename = Path(in_filename).stem
+            self.validation_store.add_points(
+                self._store_filename, validation_points['ID'],
+                validation_points['x'], validation_points['y'],
+                validation_points['Group']
+                if 'Group' in validation_points.columns else None)
+
         # Create ipysheet object
+        import ipysheet
         self._validation_sheet = ipysheet.sheet(
             ipysheet.from_dataframe(
                 validation_points.to_crs(4326).drop(['geometry'], axis=1)))
@@ -674,12 +1080,109 @@ class ValidationDashboard(ipyleaflet.Map):
             validation_points.Group
         )
 
+        # traversal position of every polygon shown, to go to the
+        # polygons leased by the scheduler
+        positions = {
+            location: position
+            for position, location in enumerate(self._markers_dict)
+        }
+        self._polygon_positions = {
+            polygon_id: positions[location]
+            for polygon_id, location in zip(
+                validation_points['ID'].tolist(),
+                zip(validation_points.y.astype(float),
+                    validation_points.x.astype(float)))
+        }
+        self._leased_points.clear()
+
         self.geo_data_layer.on_click(self.on_click_polygon_object)
         self.add_layer(self.geo_data_layer)
         self._geo_data = self.geo_data_layer.data
 
+        # ID to row and feature positions, lookups on click and save
+        # do not depend on the number of polygons
+        self._polygon_index = self.build_polygon_index(
+            self.geo_data_layer.geo_dataframe, self._geo_data)
+
+        # edited polygons are drawn on top of the layer, saving only
+        # sends them instead of the whole collection
+        self._edited_features = OrderedDict()
+        self._edited_layer = GeoJSON(
+            data={'type': 'FeatureCollection', 'features': []},
+            style=self.geo_data_layer.style,
+            hover_style=self.geo_data_layer.hover_style,
+            name='Validation edits'
+        )
+        self._edited_layer.on_click(self.on_click_polygon_object)
+        self.add_layer(self._edited_layer)
+
         return
 
+    def build_polygon_index(self, geo_dataframe, geo_data) -> dict:
+        """
+        Map each polygon ID to its row position in geo_dataframe and
+        its feature position in geo_data.
+        """
+        feature_positions = {
+            feature['properties']['ID']: position
+            for position, feature in enumerate(geo_data['features'])
+        }
+        return {
+            polygon_id: (row_position, feature_positions.get(polygon_id))
+            for row_position, polygon_id in enumerate(
+                geo_dataframe['ID'].tolist())
+        }
+
+    def get_polygon_properties(self, polygon_id) -> dict:
+        """
+        Return the properties of a polygon from the layer dataframe.
+        """
+        geo_dataframe = self.geo_data_layer.geo_dataframe
+        row_position = self._polygon_index[polygon_id][0]
+        return geo_dataframe.iloc[row_position].drop(
+            geo_dataframe.geometry.name).to_dict()
+
+    def set_polygon_properties(self, properties: dict) -> None:
+        """
+        Store the properties of a polygon in the layer dataframe.
+        """
+        geo_dataframe = self.geo_data_layer.geo_dataframe
+        index = geo_dataframe.index[self._polygon_index[properties['ID']][0]]
+        for column, value in properties.items():
+            try:
+                geo_dataframe.at[index, column] = value
+            except (TypeError, ValueError):
+                # the widget value does not fit the stored dtype
+                geo_dataframe[column] = geo_dataframe[column].astype(object)
+                geo_dataframe.at[index, column] = value
+
+    def update_polygon_feature(
+                self, properties: dict, max_edited: int = 500) -> None:
+        """
+        Patch the properties of a polygon feature on the map. The feature
+        is updated in place and drawn in the edits layer, only the edited
+        features are sent to the browser. The edits are folded into the
+        main layer, with a single full update, once max_edited is reached.
+        """
+        feature_position = self._polygon_index[properties['ID']][1]
+        if feature_position is None:
+            return
+
+        feature = self._geo_data['features'][feature_position]
+        feature['properties'].update(properties)
+        self._edited_features[properties['ID']] = feature
+
+        if len(self._edited_features) >= max_edited:
+            self.geo_data_layer.data = dict(
+                self._geo_data, features=list(self._geo_data['features']))
+            self._geo_data = self.geo_data_layer.data
+            self._edited_features.clear()
+
+        self._edited_layer.data = {
+            'type': 'FeatureCollection',
+            'features': list(self._edited_features.values())
+        }
+
     def create_property_widgets(self, properties):
         """Dynamically create widgets for each property."""
 
@@ -687,11 +1190,7 @@ class ValidationDashboard(ipyleaflet.Map):
         property_items = dict(properties.items())
 
         # adding all properties
-        if property_items['verified'] == 'false' \
-                or not property_items['verified']:
-            verified_option = False
-        else:
-            verified_option = True
+        verified_option = is_verified(property_items['verified'])
 
         radio_check_widget = widgets.RadioButtons(
             options=self.validation_classes,
@@ -773,11 +1272,25 @@ class ValidationDashboard(ipyleaflet.Map):
                     widget.value
 
             # updating the information with new data
-            self.geo_data_layer.geo_dataframe.loc[
-                self.geo_data_layer.geo_dataframe['ID']
-                == self._feature['properties']['ID'],
-                self._feature['properties'].keys()] = \
-                self._feature['properties'].values()
+            self.set_polygon_properties(self._feature['properties'])
+
+            # journal the edit, folded into the file in the background
+            if self.journal and b['name'] == 'value':
+                self.get_journal().append(
+                    'ID', self._feature['properties']['ID'],
+                    {column: self._feature['properties'][column]
+                     for column in VALIDATION_COLUMNS
+                     if column in self._feature['properties']},
+                    self._seconds_per_point
+                )
+                if self.validation_store is not None:
+                    self.validation_store.save_labels(
+                        self._store_filename, self.username,
+                        {self._feature['properties']['ID']:
+                         self._feature['properties']})
+                self.complete_lease(
+                    self._feature['properties']['ID'],
+                    self._feature['properties']['verified'])
 
         checked_widget.observe(changed_checked_widget)
 
@@ -799,10 +1312,8 @@ class ValidationDashboard(ipyleaflet.Map):
         self._current_time = time.time()
         self._feature = feature
 
-        self._feature['properties'] = self.geo_data_layer.geo_dataframe.loc[
-                self.geo_data_layer.geo_dataframe['ID']
-                == self._feature['properties']['ID']
-        ].to_dict(orient='records')[0]
+        self._feature['properties'] = self.get_polygon_properties(
+            self._feature['properties']['ID'])
 
         # Dynamically create input widgets for each property
         self.property_widgets = self.create_property_widgets(
@@ -837,33 +1348,36 @@ class ValidationDashboard(ipyleaflet.Map):
 
         def save_changes(_):
 
-            original_data = copy.deepcopy(self.geo_data_layer.data)
-            original_feature = copy.deepcopy(self._feature)
-
             # Update the properties with the new values
             for widget in self.property_widgets:
                 self._feature['properties'][widget._property_key] = \
                     widget.value
 
-            for i, f in enumerate(original_data['features']):
-                if f == original_feature:
-                    original_data['features'][i] = self._feature
-                    break
-
             # Update the GeoJSON layer to reflect the changes
-            self.geo_data_layer.data = original_data
-            self._geo_data = original_data
+            self.update_polygon_feature(self._feature['properties'])
 
             # updating the information with new data
-            self.geo_data_layer.geo_dataframe.loc[
-                self.geo_data_layer.geo_dataframe['ID']
-                == self._feature['properties']['ID'],
-                self._feature['properties'].keys()] = \
-                self._feature['properties'].values()
+            self.set_polygon_properties(self._feature['properties'])
+
+            # saving output, only the edited feature is written
+            self.save_row(
+                {column: self._feature['properties'][column]
+                 for column in VALIDATION_COLUMNS
+                 if column in self._feature['properties']},
+                'ID', self._feature['properties']['ID'],
+                lambda: self.async_writer.save(
+                    self.geo_data_layer.geo_dataframe, self.output_filename)
+            )
+            if self.validation_store is not None:
+                self.validation_store.save_labels(
+                    self._store_filename, self.username,
+                    {self._feature['properties']['ID']:
+                     self._feature['properties']})
 
-            # saving output
-            self.geo_data_layer.geo_dataframe.to_file(
-                self.output_filename, layer='validation', driver="GPKG")
+            # verified polygons are done, their lease ends
+            self.complete_lease(
+                self._feature['properties']['ID'],
+                self._feature['properties']['verified'])
 
             # Close the popup by removing it from the map
             self.remove_layer(self._popup)
@@ -875,24 +1389,142 @@ class ValidationDashboard(ipyleaflet.Map):
         # verified_widget.observe(save_changes)
         save_button.on_click(save_changes)
 
+    def get_journal(self, filename: str = None) -> EditJournal:
+        """
+        Return the edit journal of filename, output_filename by default.
+        """
+        if filename is None:
+            filename = self.output_filename
+        if filename not in self._journals:
+            self._journals[filename] = EditJournal(
+                filename, user=self.username, writer=self.async_writer)
+        return self._journals[filename]
+
+    def save_row(self, values, key_column, key_value, save_full):
+        """
+        Save a single edited row. With the journal enabled the edit is
+        appended to it and folded into the file in the background,
+        otherwise the row is updated in place. save_full is only called
+        when the file does not exist yet or its schema changed.
+        """
+        try:
+            self._save_row(values, key_column, key_value, save_full)
+        except (OSError, sqlite3.Error) as e:
+            self.report_save_error(self.output_filename, e)
+        self.check_save_errors()
+        return
+
+    def _save_row(self, values, key_column, key_value, save_full):
+        if self.journal:
+            self.get_journal().append(
+                key_column, key_value, values, values.get('seconds_taken'))
+
+            # the first save writes the whole file
+            if not os.path.isfile(self.output_filename) \
+                    and not self.async_writer.is_pending(
+                        self.output_filename):
+                save_full()
+            return
+
+        # a queued full snapshot would overwrite the in place update
+        if self.async_writer.is_pending(self.output_filename):
+            save_full()
+            return
+
+        try:
+            update_feature(
+                self.output_filename, values, key_column, key_value)
+        except (FileNotFoundError, SchemaChangedError):
+            save_full()
+        return
+
+    def report_save_error(self, filename, error) -> None:
+        """
+        Show a failed save on the map until the annotator dismisses it.
+        """
+        # also called by the writer thread
+        with self._save_warning_lock:
+            self._show_save_error(filename, error)
+
+    def _show_save_error(self, filename, error) -> None:
+        self._save_errors.append(
+            f'{os.path.basename(str(filename))}: '
+            f'{type(error).__name__}: {error}')
+
+        if self._save_warning is None:
+            message = widgets.HTML()
+            dismiss_button = widgets.Button(
+                description='Dismiss', button_style='danger')
+            self._save_warning = WidgetControl(
+                widget=widgets.VBox([message, dismiss_button]),
+                position='bottomleft')
+
+            def dismiss_click(b):
+                self._save_errors = []
+                if self._save_warning in self.controls:
+                    self.remove_control(self._save_warning)
+
+            dismiss_button.on_click(dismiss_click)
+
+        # the latest errors, the same failure repeats on every save
+        self._save_warning.widget.children[0].value = (
+            '<b style="color:red">Saving failed, the latest edits are '
+            'not on disk:</b><br>'
+            + '<br>'.join(html.escape(error)
+                          for error in self._save_errors[-5:]))
+        if self._save_warning not in self.controls:
+            self.add_control(self._save_warning)
+
+    def check_save_errors(self) -> bool:
+        """
+        Show the failed background writes, called after each save and
+        flush and by the writer thread.
+        Returns:
+            bool: True if a write failed since the last check
+        """
+        errors = self.async_writer.pop_errors()
+        for filename, error in errors:
+            self.report_save_error(filename, error)
+        return len(errors) > 0
+
+    def flush_saves(self, timeout: float = None) -> bool:
+        """
+        Wait for the queued background writes and show the failed ones.
+        Returns:
+            bool: True if no failed save is shown, every failure since the
+                warning was last dismissed counts
+        """
+        self.async_writer.flush(timeout)
+        self.check_save_errors()
+        return not self._save_errors
+
     def save_gpkg(self, df, output_filename, layer="validation"):
         """
         Save gpkg.
         """
+        import geopandas as gpd
+
         gdf = gpd.GeoDataFrame(
             df, crs=self.raster_crs,
             geometry=gpd.points_from_xy(df.x, df.y))
-        gdf.to_file(output_filename, layer=layer, driver="GPKG")
+        self.async_writer.save(gdf, output_filename, layer=layer)
+        self.check_save_errors()
         return
 
     def load_gpkg(self, input_filename):
         """
         Load gpkg.
         """
+        # make sure queued snapshots are on disk before reading
+        self.flush_saves()
+
         # read file and drop index from dataframe
-        gdf = gpd.read_file(input_filename).drop(
+        gdf = read_table(input_filename).drop(
             ['index'], axis=1, errors='ignore')
 
+        # apply the edits that were not folded into the file yet
+        gdf = replay_journal(gdf, input_filename)
+
         # save the raster/dataframe crs
         self.raster_crs = gdf.crs
 
@@ -906,11 +1538,10 @@ class ValidationDashboard(ipyleaflet.Map):
         else:
             verified_list = gdf['verified'].tolist()
 
-        self._marker_counter = [
-            i for i, x in enumerate(verified_list) if not x][0] - 1
-
-        if self._marker_counter is None:
-            self._marker_counter = -1
+        # start before the first unverified point, 'false' is not verified
+        unverified = [
+            i for i, x in enumerate(verified_list) if not is_verified(x)]
+        self._marker_counter = unverified[0] - 1 if unverified else -1
 
         return gdf
 
@@ -1016,9 +1647,11 @@ class ValidationDashboard(ipyleaflet.Map):
         buttons.style.button_width = "80px"
 
         # Define FileChooser widget
+        from ipyfilechooser import FileChooser
         fc = FileChooser(self.data_dir)
         fc.use_dir_icons = True
-        fc.filter_pattern = ["*.tif", "*.gpkg", "*.shp", "*.geojson"]
+        fc.filter_pattern = [
+            "*.tif", "*.gpkg", "*.parquet", "*.shp", "*.geojson"]
         filechooser_widget = widgets.VBox([fc, bands_widget, buttons])
 
         def button_click(change):
@@ -1051,7 +1684,9 @@ class ValidationDashboard(ipyleaflet.Map):
 
                     short_filename = Path(self._selected_filename).stem
                     self.output_filename = os.path.join(
-                        output_dir, f"{self.username}-{short_filename}.gpkg")
+                        output_dir,
+                        f"{self.username}-{short_filename}"
+                        f"{self.file_extension}")
 
                     # Visualize or generate markers for validation
                     self.add_markers(
@@ -1081,31 +1716,48 @@ class ValidationDashboard(ipyleaflet.Map):
 
                 elif b.icon == "gears":
 
-                    if hasattr(self, "whitebox") \
-                            and self.whitebox is not None \
-                            and whitebox_imported:
-                        if self.whitebox in self.controls:
-                            self.remove_control(self.whitebox)
-
-                    tools_dict = wbt.get_wbt_dict()
-                    wbt_toolbox = wbt.build_toolbox(
-                        tools_dict, max_width="800px", max_height="500px"
-                    )
-
-                    wbt_control = WidgetControl(
-                        widget=wbt_toolbox, position="bottomright")
-
-                    self.whitebox = wbt_control
-                    self.add_control(wbt_control)
+                    # the toolbox is built once, later clicks show or
+                    # hide the same control
+                    if self.whitebox is None:
+                        wbt_toolbox = self.load_whitebox_toolbox().result()
+                        if wbt_toolbox is None:
+                            print('whiteboxgui is not available')
+                            return
+                        self.whitebox = WidgetControl(
+                            widget=wbt_toolbox, position="bottomright")
+
+                    if self.whitebox in self.controls:
+                        self.remove_control(self.whitebox)
+                    else:
+                        self.add_control(self.whitebox)
 
                 elif b.icon == "arrow-right":
-                    self._marker_counter = self._marker_counter + 1
-                    if len(list(self._markers_dict)) <= self._marker_counter:
-                        self._marker_counter = 0
+
+                    # the next point leased to this session, stay on the
+                    # current one when none is left, the remaining points
+                    # belong to other annotators
+                    if self.scheduler is not None:
+                        point_id = self.next_leased_point()
+                        if point_id is None:
+                            print(
+                                'No point left to validate, the remaining '
+                                'points are verified or leased to other '
+                                'annotators')
+                            return
+                        self._marker_counter = \
+                            self.marker_position(point_id)
+
+                    # or the next point in file order
+                    else:
+                        self._marker_counter = self._marker_counter + 1
+                        if len(list(self._markers_dict)) <= \
+                                self._marker_counter:
+                            self._marker_counter = 0
 
                     self.center = tuple(
                         list(self._markers_dict)[self._marker_counter])
                     self.zoom = self.default_zoom
+                    self.prefetch_points(1)
 
                 elif b.icon == "arrow-left":
                     self._marker_counter = self._marker_counter - 1
@@ -1116,6 +1768,7 @@ class ValidationDashboard(ipyleaflet.Map):
                     self.center = tuple(
                         list(self._markers_dict)[self._marker_counter])
                     self.zoom = self.default_zoom
+                    self.prefetch_points(-1)
 
         for i in range(rows):
             for j in range(cols):
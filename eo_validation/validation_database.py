@@ -0,0 +1,424 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import shutil
+import argparse
+import pandas as pd
+import geopandas as gpd
+
+from glob import glob
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from eo_validation.cache import DEFAULT_CACHE_DIR, FileCache, file_signature
+from eo_validation.async_write import atomic_to_file
+from eo_validation.gpkg_writer import accepts_column, delete_features, \
+    layer_columns
+from eo_validation.journal import journal_signature, read_journaled_table
+from eo_validation.sampling import VALIDATION_COLUMNS, is_verified
+from eo_validation.storage import is_parquet, read_table, write_table
+from eo_validation.validation_store import ValidationStore
+
+# directories under data_dir that do not belong to annotators
+SKIP_DIRS = ['.ipynb_checkpoints', 'original_points']
+
+# validation files of every storage format, relative to data_dir
+VALIDATION_PATTERNS = [
+    os.path.join('*', 'data', '**', '*.gpkg'),
+    os.path.join('*', 'data', '**', '*.parquet'),
+]
+
+PROGRESS_COLUMNS = [
+    'username', 'short_filename', 'n_points', 'n_verified', 'status',
+    'error', 'filename']
+
+
+def find_validation_files(data_dir: str, pattern: str = None) -> list:
+    """
+    Return the validation files of every annotator under data_dir,
+    GeoPackages and Parquet files unless a glob pattern is given.
+    """
+    patterns = VALIDATION_PATTERNS if pattern is None else [pattern]
+    return sorted(
+        filename for pattern in patterns
+        for filename in glob(os.path.join(data_dir, pattern), recursive=True)
+        if os.path.relpath(filename, data_dir).split(os.sep)[0]
+        not in SKIP_DIRS
+    )
+
+
+def split_filename(filename: str) -> tuple:
+    """
+    Split <username>-<short_filename>.gpkg into its two parts.
+    """
+    username, _, short_filename = Path(filename).stem.partition('-')
+    return username, short_filename
+
+
+def validation_signature(filename: str) -> dict:
+    """
+    Signature of a validation file and of its journal, edits not compacted
+    into the file yet change it too.
+    """
+    signature = file_signature(filename)
+    signature['journal'] = journal_signature(filename)
+    return signature
+
+
+def normalize_validation_columns(gdf):
+    """
+    Cast the validation columns to fixed types, so files with unlabelled
+    (all missing) and labelled columns merge into the same schema.
+    """
+    for column in VALIDATION_COLUMNS:
+        if column not in gdf.columns:
+            gdf[column] = None
+    gdf['verified'] = is_verified(gdf['verified'])
+    for column in ['operator', 'date']:
+        gdf[column] = gdf[column].astype('string')
+    for column in ['burnt', 'confidence']:
+        gdf[column] = pd.to_numeric(
+            gdf[column], errors='coerce').astype('Int64')
+    gdf['seconds_taken'] = pd.to_numeric(
+        gdf['seconds_taken'], errors='coerce').astype('float64')
+    return gdf
+
+
+def _count_verified(verified: pd.Series) -> int:
+    return int(is_verified(verified).sum())
+
+
+def summarize_file(filename: str) -> dict:
+    """
+    Count the points and verified points of a validation file, only the
+    verified column is read unless its journal holds edits.
+    """
+    username, short_filename = split_filename(filename)
+    summary = {
+        'username': username,
+        'short_filename': short_filename,
+        'n_points': 0,
+        'n_verified': 0,
+        'status': 'done',
+        'error': None,
+        'filename': filename
+    }
+    try:
+        df = read_journaled_table(
+            filename, columns=['verified'], geometry=False)
+        summary['n_points'] = int(df.shape[0])
+        if 'verified' in df.columns:
+            summary['n_verified'] = _count_verified(df['verified'])
+    except Exception as e:
+        summary['status'] = 'broken'
+        summary['error'] = f'{type(e).__name__}: {e}'
+    return summary
+
+
+def read_validation_file(filename: str, crs: str = 'EPSG:4326'):
+    """
+    Read a validation file, with the edits of its journal, and the columns
+    added to the database.
+    """
+    username, short_filename = split_filename(filename)
+    gdf = normalize_validation_columns(
+        read_journaled_table(filename).to_crs(crs))
+    gdf['username'] = username
+    gdf['short_filename'] = short_filename
+    gdf['source_filename'] = os.path.abspath(filename)
+    return gdf
+
+
+def progress_report(
+            filenames: list,
+            cache_dir: str = None,
+            n_workers: int = None
+        ) -> pd.DataFrame:
+    """
+    Summarize every validation file, the summaries are cached per file
+    and only the files or journals modified since the last run are read
+    again.
+    Args:
+        filenames (list): validation files
+        cache_dir (str): cache directory of the summaries
+        n_workers (int): number of processes, all cores if None
+    Returns:
+        pd.DataFrame: one progress row per file
+    """
+    cache = FileCache(cache_dir, 'progress')
+
+    summaries, missing = [], []
+    signatures = dict()
+    for filename in filenames:
+        signatures[filename] = validation_signature(filename)
+        summary = cache.get(filename, signatures[filename])
+        if summary is None:
+            missing.append(filename)
+        else:
+            summaries.append(summary)
+
+    if missing:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(summarize_file, filename)
+                for filename in missing
+            ]
+            for future in as_completed(futures):
+                summary = future.result()
+                summaries.append(summary)
+                if summary['status'] == 'done':
+                    cache.put(
+                        summary['filename'], summary,
+                        signatures[summary['filename']])
+
+    return pd.DataFrame(summaries, columns=PROGRESS_COLUMNS) \
+        .sort_values(['username', 'short_filename']) \
+        .reset_index(drop=True)
+
+
+def _state_filename(database_filename: str) -> str:
+    return f'{database_filename}.state.json'
+
+
+def _write_state(state_filename: str, state: dict) -> None:
+    tmp_filename = f'{state_filename}.tmp'
+    with open(tmp_filename, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(tmp_filename, state_filename)
+
+
+def _part_filename(database_filename: str, filename: str) -> str:
+    """
+    Part of a Parquet database holding the rows of a validation file.
+    """
+    digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+    return os.path.join(database_filename, f'{digest}.parquet')
+
+
+def _remove_database(database_filename: str) -> None:
+    if os.path.isdir(database_filename):
+        shutil.rmtree(database_filename)
+    elif os.path.isfile(database_filename):
+        os.remove(database_filename)
+
+
+def _delete_rows(
+            database_filename: str,
+            filenames: list,
+            layer: str
+        ) -> None:
+    """
+    Delete the rows of the validation files from the database.
+    """
+    if not is_parquet(database_filename):
+        delete_features(database_filename, 'source_filename', filenames, layer)
+        return
+    for filename in filenames:
+        part_filename = _part_filename(database_filename, filename)
+        if os.path.isfile(part_filename):
+            os.remove(part_filename)
+
+
+def _same_schema(gdf: gpd.GeoDataFrame, columns: dict) -> bool:
+    """
+    Check if the rows of gdf can be appended to a GeoPackage layer with
+    the given declared column types, without adding or converting columns.
+    """
+    for column in gdf.columns:
+        if column == gdf.geometry.name:
+            continue
+        if column not in columns \
+                or not accepts_column(columns[column], gdf[column]):
+            return False
+    return True
+
+
+def _append_rows(
+            gdf: gpd.GeoDataFrame,
+            database_filename: str,
+            filename: str,
+            layer: str
+        ) -> None:
+    """
+    Append the rows of a validation file to the database, a Parquet
+    database is a directory with one part file per validation file.
+    A GeoPackage is rewritten with the union of the columns when the
+    rows bring new columns or types.
+    """
+    if not is_parquet(database_filename):
+        if not os.path.isfile(database_filename):
+            atomic_to_file(gdf, database_filename, layer=layer)
+        elif _same_schema(gdf, layer_columns(database_filename, layer)):
+            gdf.to_file(
+                database_filename, layer=layer, driver='GPKG', mode='a')
+        else:
+            database = read_table(database_filename, layer=layer)
+            atomic_to_file(
+                pd.concat([database, gdf.to_crs(database.crs)],
+                          ignore_index=True),
+                database_filename, layer=layer)
+        return
+    os.makedirs(database_filename, exist_ok=True)
+    part_filename = _part_filename(database_filename, filename)
+    tmp_filename = f'{part_filename}.tmp'
+    gdf.to_parquet(tmp_filename, compression='zstd')
+    os.replace(tmp_filename, part_filename)
+
+
+def build_database(
+            filenames: list,
+            database_filename: str,
+            layer: str = 'validation',
+            n_workers: int = None,
+            rebuild: bool = False
+        ) -> dict:
+    """
+    Merge the validation files into a single GeoPackage or a Parquet
+    dataset directory, incrementally.
+
+    A state file next to the database records the signature of every
+    merged file. On a new run the rows of the files modified or removed
+    since are deleted and only the modified and new files are read and
+    appended. The database is rebuilt when it is missing or rebuild is set.
+    Args:
+        filenames (list): validation files
+        database_filename (str): merged GeoPackage, or directory of
+            Parquet parts when it ends with .parquet
+        layer (str): layer name of the merged GeoPackage
+        n_workers (int): number of processes, all cores if None
+        rebuild (bool): merge every file again
+    Returns:
+        dict: number of files added, removed and failed
+    """
+    state = dict()
+    state_filename = _state_filename(database_filename)
+    if not rebuild and os.path.exists(database_filename) \
+            and os.path.isfile(state_filename):
+        with open(state_filename, 'r') as state_file:
+            state = json.load(state_file)
+    else:
+        _remove_database(database_filename)
+
+    signatures = {
+        os.path.abspath(filename): validation_signature(filename)
+        for filename in filenames
+    }
+    changed = [
+        filename for filename, signature in signatures.items()
+        if state.get(filename) != signature
+    ]
+    removed = [filename for filename in state if filename not in signatures]
+    report = {'added': 0, 'removed': len(removed), 'failed': []}
+
+    # drop the rows of the removed and modified files, also of new files
+    # appended by a run that stopped before recording them
+    if os.path.exists(database_filename) and (removed or changed):
+        _delete_rows(database_filename, removed + changed, layer)
+        for filename in removed + changed:
+            state.pop(filename, None)
+        _write_state(state_filename, state)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+
+        futures = {
+            executor.submit(read_validation_file, filename): filename
+            for filename in changed
+        }
+
+        # appending is serialized in this process, the workers only read
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                _append_rows(
+                    future.result(), database_filename, filename, layer)
+            except Exception as e:
+                report['failed'].append(
+                    (filename, f'{type(e).__name__}: {e}'))
+                continue
+
+            # a crash keeps the files merged so far
+            state[filename] = signatures[filename]
+            _write_state(state_filename, state)
+            report['added'] += 1
+
+    return report
+
+
+def main(argv=None):
+    """
+    Command line entry point for the validation database.
+    """
+    parser = argparse.ArgumentParser(
+        description='Merge the validation files of every annotator.')
+    parser.add_argument(
+        '--data-dir', type=str, default=None,
+        help='directory with one subdirectory per annotator')
+    parser.add_argument(
+        '--pattern', type=str, default=None,
+        help='glob pattern of the validation files inside data-dir, '
+             'GeoPackage and Parquet files by default')
+    parser.add_argument(
+        '--database', type=str, default=None,
+        help='merged GeoPackage, or Parquet dataset directory when it ends '
+             'with .parquet, only the progress report if not given')
+    parser.add_argument(
+        '--report', type=str, default=None, help='progress report CSV')
+    parser.add_argument(
+        '--store', type=str, default=None,
+        help='central validation store, read instead of the files')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        '--n-workers', type=int, default=os.cpu_count(),
+        help='number of worker processes')
+    parser.add_argument(
+        '--rebuild', action='store_true',
+        help='merge every file again instead of only the modified ones')
+    args = parser.parse_args(argv)
+    if args.data_dir is None and args.store is None:
+        parser.error('one of --data-dir or --store is required')
+
+    start_time = time.time()
+
+    # the central store already holds the labels of every annotator
+    if args.store is not None:
+        store = ValidationStore(args.store)
+        progress = store.progress()
+        print(progress.to_string(index=False))
+        if args.report is not None:
+            progress.to_csv(args.report, index=False)
+        if args.database is not None:
+            write_table(store.to_geodataframe(), args.database)
+        print(f'{len(progress)} files in {time.time() - start_time:.3f}s')
+        return 0
+
+    filenames = find_validation_files(args.data_dir, args.pattern)
+
+    progress = progress_report(filenames, args.cache_dir, args.n_workers)
+    print(progress[
+        ['username', 'short_filename', 'n_points', 'n_verified', 'status']
+    ].to_string(index=False))
+    if args.report is not None:
+        progress.to_csv(args.report, index=False)
+
+    failed = (progress['status'] != 'done').any()
+    if args.database is not None:
+        report = build_database(
+            [filename for filename, status in zip(
+                progress['filename'], progress['status'])
+             if status == 'done'],
+            args.database,
+            n_workers=args.n_workers,
+            rebuild=args.rebuild
+        )
+        print(
+            f"{report['added']} files merged, {report['removed']} removed, "
+            f"{len(report['failed'])} failed")
+        failed = failed or len(report['failed']) > 0
+
+    print(f'{len(filenames)} files in {time.time() - start_time:.1f}s')
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import time
+import sqlite3
+import threading
+import pandas as pd
+import geopandas as gpd
+
+from contextlib import contextmanager
+from eo_validation.gpkg_writer import _to_sql_value
+from eo_validation.sampling import VALIDATION_COLUMNS, is_verified
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    short_filename TEXT NOT NULL,
+    point_id INTEGER NOT NULL,
+    lon REAL,
+    lat REAL,
+    point_group TEXT,
+    PRIMARY KEY (short_filename, point_id)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    short_filename TEXT NOT NULL,
+    point_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    operator TEXT,
+    burnt INTEGER,
+    confidence INTEGER,
+    verified INTEGER NOT NULL DEFAULT 0,
+    date TEXT,
+    seconds_taken REAL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (short_filename, point_id, username)
+);
+CREATE INDEX IF NOT EXISTS labels_username
+    ON labels (username, short_filename);
+"""
+
+
+class ValidationStore(object):
+    """
+    Central SQLite database holding the labels of every annotator.
+
+    The database runs in WAL mode, readers never block the writer and
+    concurrent sessions queue their short write transactions instead of
+    overwriting each other's files. Every annotator writes only its own
+    rows, labels are keyed by file, point and username, so the same point
+    can be labelled by several annotators. WAL needs the database on a
+    local disk, not on a network filesystem.
+    Args:
+        filename (str): SQLite database filename
+        timeout (float): seconds to wait for a concurrent writer
+    """
+
+    def __init__(self, filename: str, timeout: float = 30.0):
+
+        self.filename = filename
+        self.timeout = timeout
+
+        # the connection is shared by the threads of the session
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            filename, timeout=timeout, isolation_level=None,
+            check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self.create_tables(_SCHEMA)
+
+        # stores created before the points had a group
+        columns = [row[1] for row in self._connection.execute(
+            'PRAGMA table_info(points)')]
+        if 'point_group' not in columns:
+            with self.transaction() as connection:
+                connection.execute(
+                    'ALTER TABLE points ADD COLUMN point_group TEXT')
+
+    def create_tables(self, schema: str) -> None:
+        """
+        Run the CREATE ... IF NOT EXISTS statements of a schema.
+        """
+        with self._lock:
+            self._connection.executescript(schema)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Write transaction, the database is locked for writing from the
+        start so reads inside it see the latest committed state.
+        """
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._connection
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def _write(self, statement: str, rows: list) -> None:
+        """
+        Run a statement for every row in a single write transaction.
+        """
+        with self.transaction() as connection:
+            connection.executemany(statement, rows)
+
+    def add_points(
+                self,
+                short_filename: str,
+                point_ids,
+                lon,
+                lat,
+                groups=None
+            ) -> None:
+        """
+        Register the points of a file, points already known are kept and
+        only get the group they are missing. groups is the group of every
+        point, e.g. the Group column splitting the polygons of a file
+        between annotators.
+        """
+        if groups is None:
+            groups = [None] * len(point_ids)
+        self._write(
+            'INSERT INTO points '
+            '(short_filename, point_id, lon, lat, point_group) '
+            'VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (short_filename, point_id) DO UPDATE SET '
+            'point_group = COALESCE(points.point_group, '
+            'excluded.point_group)',
+            [(short_filename, int(point_id), float(x), float(y),
+              None if group is None else str(group))
+             for point_id, x, y, group in zip(point_ids, lon, lat, groups)])
+
+    def save_labels(
+                self,
+                short_filename: str,
+                username: str,
+                labels: dict
+            ) -> None:
+        """
+        Insert or update the labels of an annotator.
+        Args:
+            short_filename (str): file the points belong to
+            username (str): annotator
+            labels (dict): point id to {column: value}, only the
+                validation columns are stored
+        """
+        updated = time.time()
+        rows = []
+        for point_id, values in labels.items():
+            row = {
+                column: _to_sql_value(values.get(column))
+                for column in VALIDATION_COLUMNS
+            }
+            row['verified'] = int(is_verified(values.get('verified')))
+            rows.append((
+                short_filename, int(point_id), username,
+                *[row[column] for column in VALIDATION_COLUMNS], updated))
+
+        self._write(
+            f'INSERT INTO labels VALUES (?, ?, ?, '
+            f'{", ".join("?" * len(VALIDATION_COLUMNS))}, ?) '
+            f'ON CONFLICT (short_filename, point_id, username) DO UPDATE SET '
+            + ', '.join(
+                f'{column} = excluded.{column}'
+                for column in VALIDATION_COLUMNS + ['updated']),
+            rows)
+
+    def read_labels(
+                self,
+                short_filename: str = None,
+                username: str = None
+            ) -> pd.DataFrame:
+        """
+        Read the labels, optionally of a single file or annotator.
+        """
+        conditions, parameters = [], []
+        for column, value in [
+                ('short_filename', short_filename), ('username', username)]:
+            if value is not None:
+                conditions.append(f'labels.{column} = ?')
+                parameters.append(value)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+
+        with self._lock:
+            return pd.read_sql_query(
+                f'SELECT labels.*, points.lon, points.lat FROM labels '
+                f'LEFT JOIN points USING (short_filename, point_id) {where}',
+                self._connection, params=parameters)
+
+    def to_geodataframe(self, **kwargs) -> gpd.GeoDataFrame:
+        """
+        Return the labels as a GeoDataFrame in EPSG:4326, with the
+        columns of the validation database.
+        """
+        df = self.read_labels(**kwargs)
+        df['verified'] = df['verified'].astype(bool)
+        return gpd.GeoDataFrame(
+            df, crs='EPSG:4326', geometry=gpd.points_from_xy(df.lon, df.lat))
+
+    def progress(self) -> pd.DataFrame:
+        """
+        Count the points and verified points of every annotator and file,
+        a single query instead of reading every validation file.
+        """
+        with self._lock:
+            return pd.read_sql_query(
+                'SELECT username, short_filename, '
+                '(SELECT COUNT(*) FROM points '
+                ' WHERE points.short_filename = labels.short_filename) '
+                'AS n_points, SUM(verified) AS n_verified '
+                'FROM labels GROUP BY username, short_filename '
+                'ORDER BY username, short_filename',
+                self._connection)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
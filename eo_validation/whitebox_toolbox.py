@@ -0,0 +1,124 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+
+from functools import lru_cache
+from importlib import metadata
+
+logger = logging.getLogger(__name__)
+
+
+def import_whiteboxgui():
+    """
+    Import whiteboxgui on first use, the import can take seconds and
+    download the WhiteboxTools binary. Returns None if it is unavailable.
+    """
+    try:
+        import whiteboxgui.whiteboxgui as wbt
+    except (ImportError, FileNotFoundError):
+        return None
+    return wbt
+
+
+def whitebox_version() -> str:
+    """
+    Return the version of the installed whitebox package.
+    """
+    try:
+        return metadata.version('whitebox')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+@lru_cache(maxsize=None)
+def get_wbt_dict(cache_dir: str = None) -> dict:
+    """
+    Return the WhiteboxTools tool dictionary, cached per process and, when
+    cache_dir is given, on disk per WhiteboxTools version.
+    """
+    filename = None
+    if cache_dir is not None:
+        filename = os.path.join(
+            cache_dir, 'whitebox', f'tools-{whitebox_version()}.json')
+        try:
+            with open(filename, 'r') as tools_file:
+                return json.load(tools_file)
+        except (OSError, ValueError):
+            pass
+
+    wbt = import_whiteboxgui()
+    if wbt is None:
+        return None
+    tools_dict = wbt.get_wbt_dict()
+
+    if filename is not None:
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            fd, tmp_filename = tempfile.mkstemp(
+                dir=os.path.dirname(filename))
+            with os.fdopen(fd, 'w') as tools_file:
+                json.dump(tools_dict, tools_file)
+            os.replace(tmp_filename, filename)
+        except OSError:
+            logger.warning(f'Could not cache the tools in {filename}')
+    return tools_dict
+
+
+def build_toolbox(
+            tools_dict: dict,
+            max_width: str = '800px',
+            max_height: str = '500px'
+        ):
+    """
+    Build the WhiteboxTools toolbox widget from the tool dictionary, None
+    if whiteboxgui is unavailable. Widgets are created on the calling
+    thread, call it from the kernel thread.
+    """
+    if tools_dict is None:
+        return None
+    wbt = import_whiteboxgui()
+    if wbt is None:
+        return None
+    return wbt.build_toolbox(
+        tools_dict, max_width=max_width, max_height=max_height)
+
+
+class ToolboxLoader(threading.Thread):
+    """
+    Background thread loading the WhiteboxTools tool dictionary, so the
+    toolbox is built without waiting when the gears button is first
+    clicked. The widgets themselves are built by result, on the kernel
+    thread, ipywidgets is not thread safe.
+    Args:
+        cache_dir (str): cache directory of the tool dictionary
+    """
+
+    def __init__(self, cache_dir: str = None):
+
+        threading.Thread.__init__(self, daemon=True)
+
+        self.cache_dir = cache_dir
+        self.tools_dict = None
+        self.toolbox = None
+        self.start()
+
+    def run(self) -> None:
+        try:
+            self.tools_dict = get_wbt_dict(self.cache_dir)
+        except Exception:
+            logger.exception('Failed to load the WhiteboxTools tools')
+
+    def result(self, timeout: float = None):
+        """
+        Wait for the tool dictionary and build the toolbox on first call,
+        None if it could not be built.
+        """
+        self.join(timeout)
+        if self.toolbox is None and self.tools_dict is not None:
+            try:
+                self.toolbox = build_toolbox(self.tools_dict)
+            except Exception:
+                logger.exception('Failed to build the WhiteboxTools toolbox')
+        return self.toolbox
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pytest
+import rasterio
+
+from rasterio.transform import from_origin
+
+CRS = 'EPSG:32628'
+SIZE = 256
+
+
+class Scene(object):
+    """
+    Synthetic raster and mask of a campaign, with the directories the
+    dashboard reads and writes.
+    """
+
+    def __init__(self, directory: str):
+
+        self.data_dir = os.path.join(directory, 'data')
+        self.mask_dir = os.path.join(directory, 'mask')
+        self.points_dir = os.path.join(directory, 'original_points')
+        self.output_dir = os.path.join(directory, 'output')
+        self.cache_dir = os.path.join(directory, 'cache')
+        for path in [self.data_dir, self.mask_dir, self.points_dir]:
+            os.makedirs(path)
+
+        rng = np.random.default_rng(0)
+        profile = {
+            'driver': 'GTiff', 'width': SIZE, 'height': SIZE, 'crs': CRS,
+            'tiled': True, 'transform': from_origin(300000, 1600000, 30, 30)}
+
+        self.raster_filename = os.path.join(self.data_dir, 'scene.tif')
+        with rasterio.open(
+                self.raster_filename, 'w', count=3, dtype='uint16',
+                **profile) as dst:
+            dst.write(rng.integers(0, 10000, (3, SIZE, SIZE), dtype='uint16'))
+
+        self.mask_filename = os.path.join(self.mask_dir, 'scene_mask.tif')
+        with rasterio.open(
+                self.mask_filename, 'w', count=1, dtype='uint8',
+                **profile) as dst:
+            dst.write(rng.integers(0, 3, (SIZE, SIZE), dtype='uint8'), 1)
+
+
+@pytest.fixture
+def scene(tmp_path):
+    return Scene(str(tmp_path))
+
+
+@pytest.fixture
+def make_dashboard(scene):
+    """
+    Build dashboards on the synthetic scene, kwargs override the options.
+    """
+    from eo_validation.validation_dashboard import ValidationDashboard
+
+    dashboards = []
+
+    def make(**kwargs):
+        options = dict(
+            data_dir=scene.data_dir,
+            mask_dir=scene.mask_dir,
+            points_dir=scene.points_dir,
+            output_dir=scene.output_dir,
+            cache_dir=scene.cache_dir,
+            preload_whitebox=False)
+        options.update(kwargs)
+        dashboard = ValidationDashboard(**options)
+        dashboards.append(dashboard)
+        return dashboard
+
+    yield make
+    for dashboard in dashboards:
+        dashboard.flush_saves()
+        for journal in dashboard._journals.values():
+            journal.close()
+        dashboard.async_writer.close()
+
+
+@pytest.fixture
+def polygons_filename(scene):
+    """
+    Grid of square polygons with their centroids, as distributed to the
+    annotators of a polygon campaign.
+    """
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    n_polygons = 12
+    x = -17 + 0.01 * np.arange(n_polygons)
+    y = np.full(n_polygons, 14.5)
+    gdf = gpd.GeoDataFrame(
+        {'ID': np.arange(100, 100 + n_polygons), 'Group': 'A', 'x': x, 'y': y},
+        crs='EPSG:4326',
+        geometry=[box(lon - 0.004, lat - 0.004, lon + 0.004, lat + 0.004)
+                  for lon, lat in zip(x, y)])
+    filename = os.path.join(scene.points_dir, 'polygons.gpkg')
+    gdf.to_file(filename, driver='GPKG')
+    return filename
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from eo_validation.assessment import assess_accuracy, bootstrap_matrices, \
+    reference_labels
+
+# worked example of Olofsson et al. (2014), section 5: deforestation,
+# forest gain, stable forest and stable non-forest, 30 m pixels
+MATRIX = np.array([
+    [66, 0, 5, 4],
+    [0, 55, 8, 12],
+    [1, 0, 153, 11],
+    [2, 1, 9, 313]])
+PIXEL_COUNTS = np.array([200000, 150000, 3200000, 6450000])
+PIXEL_AREA = 0.09
+
+
+def _labels(matrix: np.ndarray) -> tuple:
+    """
+    Expand a confusion matrix into the map and reference label of every
+    point.
+    """
+    map_labels, reference = np.nonzero(matrix)
+    counts = matrix[map_labels, reference]
+    return np.repeat(map_labels, counts), np.repeat(reference, counts)
+
+
+@pytest.fixture(scope='module')
+def assessment():
+    return assess_accuracy(
+        *_labels(MATRIX), PIXEL_COUNTS, pixel_area=PIXEL_AREA,
+        n_replicates=2000, random_state=0)
+
+
+def test_olofsson_example(assessment):
+    overall = assessment['overall']
+    assert overall['n_samples'] == 640
+    assert overall['overall_accuracy'] == pytest.approx(0.9465, abs=1e-4)
+    assert overall['overall_accuracy_se'] == pytest.approx(0.0094, abs=1e-4)
+
+    np.testing.assert_array_equal(
+        assessment['confusion_matrix'].to_numpy(), MATRIX)
+
+    classes = assessment['classes']
+    np.testing.assert_allclose(
+        classes['users_accuracy'], [0.88, 0.7333, 0.9273, 0.9631],
+        atol=1e-4)
+    np.testing.assert_allclose(
+        classes['producers_accuracy'], [0.7487, 0.8472, 0.9345, 0.9616],
+        atol=1e-4)
+
+    # areas in ha and their 95% confidence half-widths from the paper
+    np.testing.assert_allclose(
+        classes['area'], [21158, 11686, 285770, 581386], atol=1)
+    np.testing.assert_allclose(
+        1.96 * classes['area_se'], [6158, 3756, 15510, 16282], atol=1)
+
+
+def test_bootstrap_intervals(assessment):
+    overall = assessment['overall']
+    assert overall['overall_accuracy_low'] \
+        < overall['overall_accuracy'] < overall['overall_accuracy_high']
+
+    # the percentile interval is close to the normal one at this size
+    half_width = 1.96 * overall['overall_accuracy_se']
+    assert overall['overall_accuracy_high'] \
+        - overall['overall_accuracy_low'] \
+        == pytest.approx(2 * half_width, rel=0.2)
+
+
+def test_bootstrap_keeps_strata():
+    replicates = bootstrap_matrices(MATRIX, 100, random_state=0)
+    assert replicates.shape == (100, 4, 4)
+    np.testing.assert_array_equal(
+        replicates.sum(axis=2), np.broadcast_to(MATRIX.sum(axis=1), (100, 4)))
+
+
+def test_reference_labels():
+    np.testing.assert_array_equal(
+        reference_labels(['forest', 'water', None], ['water', 'forest']),
+        [1, 0, -1])
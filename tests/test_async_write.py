@@ -0,0 +1,62 @@
+import threading
+import numpy as np
+import geopandas as gpd
+
+from eo_validation.async_write import AsyncWriteGDF, atomic_to_file
+from eo_validation.storage import read_table
+
+
+def _points(n_points: int, value: int) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {'ID': np.arange(n_points), 'value': value},
+        geometry=gpd.points_from_xy(np.arange(n_points), np.arange(n_points)),
+        crs='EPSG:4326')
+
+
+def test_concurrent_writers(tmp_path):
+    filename = str(tmp_path / 'points.gpkg')
+    errors = []
+
+    def write(value):
+        try:
+            for _ in range(5):
+                atomic_to_file(_points(500, value), filename)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=write, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    gdf = read_table(filename)
+    assert gdf.shape[0] == 500 and gdf['value'].nunique() == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['points.gpkg']
+
+
+def test_writer_coalesces(tmp_path):
+    filename = str(tmp_path / 'points.gpkg')
+    writer = AsyncWriteGDF()
+    for value in range(10):
+        writer.save(_points(10, value), filename)
+    writer.close()
+
+    assert writer.errors == []
+    assert read_table(filename)['value'].tolist() == [9] * 10
+
+
+def test_writer_errors(tmp_path):
+    filename = str(tmp_path / 'missing' / 'points.gpkg')
+    reported = []
+    writer = AsyncWriteGDF(
+        on_error=lambda *error: reported.append(error))
+    writer.save(_points(10, 0), filename)
+    writer.flush()
+
+    assert [error[0] for error in reported] == [filename]
+    assert [error[0] for error in writer.pop_errors()] == [filename]
+    assert writer.pop_errors() == []
+    writer.close()
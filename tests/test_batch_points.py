@@ -0,0 +1,92 @@
+import os
+import signal
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+import rasterio
+
+from rasterio.transform import from_origin
+from eo_validation.batch_points import generate_campaign_points
+
+N_RASTERS = 8
+SIZE = 512
+
+
+def _write_campaign(directory) -> tuple:
+    """
+    Write rasters and masks of classes 0 to 2 for a small campaign.
+    """
+    data_dir, mask_dir = directory / 'data', directory / 'mask'
+    data_dir.mkdir()
+    mask_dir.mkdir()
+    rng = np.random.default_rng(0)
+    profile = {
+        'driver': 'GTiff', 'width': SIZE, 'height': SIZE, 'count': 1,
+        'dtype': 'uint8', 'crs': 'EPSG:32628', 'tiled': True,
+        'transform': from_origin(300000, 1600000, 30, 30)}
+    for index in range(N_RASTERS):
+        data = rng.integers(0, 3, (SIZE, SIZE), dtype=np.uint8)
+        for filename in [
+                data_dir / f'scene{index}.tif',
+                mask_dir / f'scene{index}_mask.tif']:
+            with rasterio.open(filename, 'w', **profile) as dst:
+                dst.write(data, 1)
+    return str(data_dir), str(mask_dir)
+
+
+def _kill_worker(stop: threading.Event) -> None:
+    """
+    Kill the first worker process of the pool, as the OOM killer would.
+    """
+    while not stop.is_set():
+        children = multiprocessing.active_children()
+        if children:
+            os.kill(children[0].pid, signal.SIGKILL)
+            return
+        stop.wait(0.001)
+
+
+def test_campaign(tmp_path):
+    data_dir, mask_dir = _write_campaign(tmp_path)
+    points_dir = str(tmp_path / 'points')
+    report_filename = str(tmp_path / 'summary.csv')
+
+    summary = generate_campaign_points(
+        data_dir, mask_dir, points_dir, n_workers=2, n_points=20,
+        report_filename=report_filename, cache_dir=str(tmp_path / 'cache'))
+    assert (summary['status'] == 'done').all()
+    assert (summary['n_points'] == 20).all()
+    assert len(os.listdir(points_dir)) == N_RASTERS
+
+    # a rerun skips the existing outputs
+    summary = generate_campaign_points(
+        data_dir, mask_dir, points_dir, n_workers=2, n_points=20,
+        report_filename=report_filename, cache_dir=str(tmp_path / 'cache'))
+    assert (summary['status'] == 'skipped').all()
+    assert pd.read_csv(report_filename).shape[0] == N_RASTERS
+
+
+def test_worker_killed(tmp_path):
+    data_dir, mask_dir = _write_campaign(tmp_path)
+    points_dir = str(tmp_path / 'points')
+    report_filename = str(tmp_path / 'summary.csv')
+
+    stop = threading.Event()
+    killer = threading.Thread(target=_kill_worker, args=(stop,))
+    killer.start()
+    try:
+        summary = generate_campaign_points(
+            data_dir, mask_dir, points_dir, n_workers=1,
+            report_filename=report_filename,
+            cache_dir=str(tmp_path / 'cache'))
+    finally:
+        stop.set()
+        killer.join()
+
+    # every raster is reported, the ones lost with the pool as failed
+    assert pd.read_csv(report_filename).shape[0] == N_RASTERS
+    failed = summary[summary['status'] == 'failed']
+    assert not failed.empty
+    assert failed['error'].str.startswith('BrokenProcessPool').all()
+    assert set(summary['status']) <= {'done', 'failed'}
@@ -0,0 +1,125 @@
+import logging
+
+from eo_validation.journal import read_journaled_table
+
+
+def test_popup_pool(scene, make_dashboard):
+    dashboard = make_dashboard(popup_pool_size=2, point_layer='vector')
+    dashboard.add_markers(scene.raster_filename, n_points=10)
+    store = dashboard._point_store
+    first, second, third = store.ids[:3].tolist()
+
+    for point_id in [first, second, first]:
+        dashboard.open_point_popup(point_id, store.location(point_id))
+    popups = dict(dashboard._popup_pool)
+
+    # the least recently used popup, of the second point, is rebound
+    dashboard.open_point_popup(third, store.location(third))
+    assert list(dashboard._popup_pool) == [first, third]
+    popup = dashboard._popup_pool[third]
+    assert popup is popups[second]
+    assert dashboard._popup_pool[first] is popups[first]
+    assert popup.child.children[0].value == third
+
+    # an edit through the reused popup goes to the third point only
+    operator_widget, *_, verified_widget = popup.child.children[1:]
+    operator_widget.value = 'water'
+    verified_widget.value = True
+    assert store.get(third)['operator'] == 'water'
+    assert store.get(third)['verified']
+    assert store.get(second)['operator'] == 'other'
+    assert not store.get(second)['verified']
+
+    assert dashboard.flush_saves()
+    gdf = read_journaled_table(dashboard.output_filename)
+    assert gdf['operator'].tolist()[:3] == ['other', 'other', 'water']
+    assert gdf['verified'].tolist()[:3] == [False, False, True]
+
+
+def _save_polygon(dashboard, polygon_id, operator):
+    """
+    Open the popup of a polygon and save it with a new operator.
+    """
+    feature = dashboard._geo_data['features'][
+        dashboard._polygon_index[polygon_id][1]]
+    dashboard.on_click_polygon_object(event='click', feature=dict(feature))
+    widgets = {
+        getattr(widget, '_property_key', None): widget
+        for widget in dashboard.property_widgets
+    }
+    widgets['operator'].value = operator
+    dashboard._popup.child.children[-1].click()
+
+    # closed now, their observers would run at interpreter shutdown
+    for widget in dashboard.property_widgets:
+        widget.close()
+
+
+def test_polygon_edits(make_dashboard, polygons_filename):
+    dashboard = make_dashboard()
+    dashboard.add_polygon_markers(polygons_filename)
+    main_data = dashboard.geo_data_layer.data
+    index = dict(dashboard._polygon_index)
+
+    # saving only sends the edited polygons, on the edits layer
+    for polygon_id, operator in [(101, 'water'), (105, 'cropland'),
+                                 (101, 'build')]:
+        _save_polygon(dashboard, polygon_id, operator)
+    assert dashboard.geo_data_layer.data is main_data
+    assert [feature['properties']['ID'] for feature in
+            dashboard._edited_layer.data['features']] == [101, 105]
+    assert dashboard._edited_layer.data['features'][0][
+        'properties']['operator'] == 'build'
+
+    # the index still resolves every polygon after the edits
+    assert dashboard._polygon_index == index
+    for polygon_id in [101, 105, 110]:
+        assert dashboard.get_polygon_properties(polygon_id)['ID'] \
+            == polygon_id
+    assert dashboard.get_polygon_properties(101)['operator'] == 'build'
+    assert dashboard.get_polygon_properties(105)['operator'] == 'cropland'
+    assert dashboard.get_polygon_properties(110)['operator'] == 'other'
+
+    assert dashboard.flush_saves()
+    gdf = read_journaled_table(dashboard.output_filename)
+    assert gdf.set_index('ID')['operator'][[101, 105, 110]].tolist() == [
+        'build', 'cropland', 'other']
+
+
+def test_polygon_edits_fold_back(make_dashboard, polygons_filename):
+    dashboard = make_dashboard()
+    dashboard.add_polygon_markers(polygons_filename)
+    main_data = dashboard.geo_data_layer.data
+
+    for polygon_id in [100, 101]:
+        dashboard.update_polygon_feature(
+            {'ID': polygon_id, 'operator': 'water'}, max_edited=3)
+    assert dashboard.geo_data_layer.data is main_data
+    assert len(dashboard._edited_layer.data['features']) == 2
+
+    # the third edit folds the overlay into the main layer
+    dashboard.update_polygon_feature(
+        {'ID': 102, 'operator': 'water'}, max_edited=3)
+    assert dashboard.geo_data_layer.data is not main_data
+    assert dashboard._edited_layer.data['features'] == []
+    operators = [feature['properties']['operator']
+                 for feature in dashboard.geo_data_layer.data['features']]
+    assert operators[:4] == ['water', 'water', 'water', 'other']
+
+    # later edits go to the overlay of the folded layer
+    dashboard.update_polygon_feature(
+        {'ID': 103, 'operator': 'water'}, max_edited=3)
+    assert dashboard._geo_data is dashboard.geo_data_layer.data
+    assert [feature['properties']['ID'] for feature in
+            dashboard._edited_layer.data['features']] == [103]
+
+
+def test_prefetch_needs_tile_cache(make_dashboard, caplog):
+    with caplog.at_level(logging.WARNING):
+        make_dashboard()
+        make_dashboard(prefetch_points=3, tile_cache=True)
+    assert not caplog.records
+
+    with caplog.at_level(logging.WARNING):
+        make_dashboard(prefetch_points=3)
+    assert 'tile cache' in caplog.text
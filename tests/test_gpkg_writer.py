@@ -0,0 +1,72 @@
+import sqlite3
+import numpy as np
+import pytest
+import geopandas as gpd
+
+from shapely.geometry import box
+from eo_validation.async_write import atomic_to_file
+from eo_validation.gpkg_writer import SchemaChangedError, delete_features, \
+    update_feature, update_features
+from eo_validation.storage import read_table
+
+
+@pytest.fixture
+def filename(tmp_path):
+    filename = str(tmp_path / 'polygons.gpkg')
+    atomic_to_file(gpd.GeoDataFrame({
+        'ID': np.arange(10),
+        'operator': 'other',
+        'confidence': 1,
+        'verified': False,
+        'seconds_taken': np.nan,
+    }, geometry=[box(x, x, x + 1, x + 1) for x in range(10)],
+        crs='EPSG:4326'), filename)
+    return filename
+
+
+def test_update_round_trip(filename):
+    before = read_table(filename)
+    update_feature(filename, {
+        'operator': 'forest', 'confidence': np.int64(3), 'verified': True,
+        'seconds_taken': 12.5}, 'ID', 4)
+    after = read_table(filename)
+
+    row = after.iloc[4]
+    assert (row['operator'], row['confidence'], row['verified'],
+            row['seconds_taken']) == ('forest', 3, True, 12.5)
+
+    # the other features and every geometry are untouched
+    unchanged = after.index != 4
+    assert after[unchanged].drop(columns='geometry').equals(
+        before[unchanged].drop(columns='geometry'))
+    assert after.geometry.geom_equals(before.geometry).all()
+
+    # the spatial index still finds the features
+    assert gpd.read_file(
+        filename, layer='validation', bbox=(4.2, 4.2, 4.8, 4.8)
+    )['operator'].tolist() == ['forest']
+
+    connection = sqlite3.connect(filename)
+    assert connection.execute('PRAGMA integrity_check').fetchone() == ('ok',)
+    connection.close()
+
+
+def test_update_rejected(filename):
+    with pytest.raises(SchemaChangedError):
+        update_feature(filename, {'burnt': 1}, 'ID', 0)
+    with pytest.raises(SchemaChangedError):
+        update_feature(filename, {'confidence': 'high'}, 'ID', 0)
+
+    # a missing feature rolls back the whole transaction
+    with pytest.raises(SchemaChangedError):
+        update_features(filename, {
+            0: {'operator': 'water'}, 99: {'operator': 'water'}}, 'ID')
+    assert (read_table(filename)['operator'] == 'other').all()
+
+    with pytest.raises(FileNotFoundError):
+        update_feature(filename + '.missing', {'operator': 'water'}, 'ID', 0)
+
+
+def test_delete_features(filename):
+    assert delete_features(filename, 'ID', [1, 2, 99]) == 2
+    assert read_table(filename)['ID'].tolist() == [0, 3, 4, 5, 6, 7, 8, 9]
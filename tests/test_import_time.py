@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import subprocess
+
+from functools import lru_cache
+
+# seconds allowed to import the dashboard, override on slower machines
+IMPORT_BUDGET = float(os.getenv('EO_VALIDATION_IMPORT_BUDGET', '1.2'))
+
+# modules only needed by code paths run after the dashboard is shown,
+# pyarrow is not in the list, pandas imports it
+DEFERRED_MODULES = [
+    'geopandas', 'rasterio', 'pyproj', 'shapely', 'ipysheet',
+    'ipyfilechooser', 'localtileserver', 'whiteboxgui']
+
+_IMPORT_SCRIPT = """
+import sys
+import json
+import time
+
+start_time = time.perf_counter()
+import eo_validation.validation_dashboard  # noqa: F401
+seconds = time.perf_counter() - start_time
+
+print(json.dumps({'seconds': seconds, 'modules': list(sys.modules)}))
+"""
+
+
+@lru_cache(maxsize=None)
+def _import_dashboard() -> dict:
+    """
+    Import the dashboard in a fresh interpreter, best of three runs.
+    """
+    results = []
+    for _ in range(3):
+        output = subprocess.run(
+            [sys.executable, '-c', _IMPORT_SCRIPT],
+            capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return min(results, key=lambda result: result['seconds'])
+
+
+def test_import_time():
+    result = _import_dashboard()
+    assert result['seconds'] < IMPORT_BUDGET, \
+        f"import took {result['seconds']:.2f}s, budget {IMPORT_BUDGET}s"
+
+
+def test_deferred_imports():
+    modules = _import_dashboard()['modules']
+    imported = [module for module in DEFERRED_MODULES if module in modules]
+    assert not imported, f'{imported} imported with the dashboard'
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+import pytest
+import geopandas as gpd
+
+from eo_validation.async_write import atomic_to_file
+from eo_validation.journal import EditJournal, read_journal, \
+    read_journaled_table
+from eo_validation.storage import read_table
+
+
+@pytest.fixture
+def filename(tmp_path):
+    filename = str(tmp_path / 'points.gpkg')
+    atomic_to_file(gpd.GeoDataFrame(
+        {'ID': np.arange(5), 'operator': 'other', 'verified': False},
+        geometry=gpd.points_from_xy(np.arange(5), np.arange(5)),
+        crs='EPSG:4326'), filename)
+    return filename
+
+
+def _journal(filename: str) -> EditJournal:
+    # compaction only runs when called by the test
+    return EditJournal(filename, user='user0', compact_interval=3600)
+
+
+def test_replay_and_compact(filename):
+    journal = _journal(filename)
+    journal.append('ID', 1, {'operator': 'forest'}, seconds_taken=2.0)
+    journal.append('ID', 1, {'verified': True})
+    journal.append('ID', 3, {'operator': 'water'})
+
+    # readers see the edits before they are compacted
+    assert read_table(filename)['operator'].tolist() == ['other'] * 5
+    gdf = read_journaled_table(filename)
+    assert gdf['operator'].tolist() == \
+        ['other', 'forest', 'other', 'water', 'other']
+    assert gdf['verified'].tolist() == [False, True, False, False, False]
+
+    assert journal.compact() == 3
+    assert read_journal(filename) == []
+    assert not os.path.exists(f'{filename}.journal')
+    assert read_table(filename)['operator'].tolist() == \
+        gdf['operator'].tolist()
+
+    # the folded edits are kept as the audit trail
+    with open(f'{filename}.history') as history_file:
+        assert len(history_file.readlines()) == 3
+    journal.close()
+
+
+def test_schema_change(filename):
+    journal = _journal(filename)
+    journal.append('ID', 2, {'notes': 'cloudy'})
+    assert journal.compact() == 1
+    notes = read_table(filename)['notes']
+    assert notes.iloc[2] == 'cloudy' and notes.drop(2).isna().all()
+    journal.close()
+
+
+def test_recover_after_crash(filename):
+    crashed = _journal(filename)
+    crashed.append('ID', 0, {'operator': 'forest'})
+    crashed.append('ID', 1, {'operator': 'forest'})
+
+    # the session dies after moving the journal aside and half way
+    # through writing the next edit
+    crashed._rotate()
+    crashed.append('ID', 2, {'operator': 'forest'})
+    with open(f'{filename}.journal', 'a') as journal_file:
+        journal_file.write('{"key": "ID", "id": 3, "val')
+
+    assert len(read_journal(filename)) == 3
+    assert read_journaled_table(filename)['operator'].tolist() == \
+        ['forest', 'forest', 'forest', 'other', 'other']
+
+    # the next session keeps its edits apart from the torn line and
+    # finishes the interrupted compaction first
+    journal = _journal(filename)
+    journal.append('ID', 4, {'operator': 'water'})
+    assert journal.compact() == 2
+    assert journal.compact() == 2
+    assert read_table(filename)['operator'].tolist() == \
+        ['forest', 'forest', 'forest', 'other', 'water']
+    assert read_journal(filename) == []
+    journal.close()
@@ -0,0 +1,43 @@
+import os
+import pytest
+
+from eo_validation.cache import FileCache
+from eo_validation.mask_index import MaskIndex
+
+
+@pytest.fixture
+def mask_dir(tmp_path):
+    for filename in [
+            'tile10_mask.tif', 'tile1_mask.tif', 'tile2.tif', 'tile2_v2.tif',
+            'tile3a.tif', 'notes.txt']:
+        (tmp_path / filename).touch()
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('raster_filename, mask_filename', [
+    ('tile1.tif', 'tile1_mask.tif'),
+    ('tile10.tif', 'tile10_mask.tif'),
+    ('/data/tile2.tif', 'tile2.tif'),
+    ('tile3.tif', None),
+    ('tile4.tif', None),
+])
+def test_lookup(mask_dir, raster_filename, mask_filename):
+    mask_index = MaskIndex(mask_dir)
+    if mask_filename is not None:
+        mask_filename = os.path.join(mask_dir, mask_filename)
+    assert mask_index.lookup(raster_filename) == mask_filename
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_lookup_new_mask(tmp_path, mask_dir, cached):
+    cache = FileCache(str(tmp_path / 'cache'), 'masks') if cached else None
+    mask_index = MaskIndex(mask_dir, cache=cache, check_interval=0.0)
+    assert mask_index.lookup('tile4.tif') is None
+
+    # the new mask changes the directory mtime, coarse filesystem
+    # timestamps could miss it within the same second
+    open(os.path.join(mask_dir, 'tile4-mask.tif'), 'w').close()
+    mtime = os.stat(mask_dir).st_mtime
+    os.utime(mask_dir, (mtime + 1, mtime + 1))
+    assert mask_index.lookup('tile4.tif') == \
+        os.path.join(mask_dir, 'tile4-mask.tif')
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pytest
+
+from eo_validation.point_layer import PointLayer
+from eo_validation.point_store import PointStore, PointTableView
+
+
+def _points(n_points: int = 10, index=None) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {
+            'ID': np.arange(n_points),
+            'class': np.arange(n_points, dtype='uint8') % 3,
+            'operator': ['other'] * n_points,
+            'verified': np.zeros(n_points, bool),
+            'confidence': np.linspace(0, 1, n_points)
+        },
+        index=index if index is not None else pd.RangeIndex(n_points),
+        crs='EPSG:4326',
+        geometry=gpd.points_from_xy(
+            np.linspace(-17, -16, n_points), np.linspace(14, 15, n_points)))
+
+
+@pytest.mark.parametrize('index', [None, pd.Index([5, 3, 9, 1])])
+def test_store_by_id(index):
+    gdf = _points(4, index)
+    store = PointStore(gdf)
+    point_id = gdf.index[2]
+
+    assert store.position(point_id) == 2
+    assert store.get(point_id)['class'] == 2
+    assert store.location(point_id) == (gdf.geometry.y[point_id],
+                                        gdf.geometry.x[point_id])
+    with pytest.raises(KeyError):
+        store.position(100)
+
+    updates = []
+    store.observe(lambda *args: updates.append(args))
+    store.update(point_id, {'operator': 'water', 'verified': True})
+    assert store.get(point_id)['operator'] == 'water'
+    assert store.get(point_id)['verified']
+    assert store.get(gdf.index[1])['operator'] == 'other'
+    assert updates == [
+        (point_id, 2, {'operator': 'water', 'verified': True})]
+
+
+def test_store_round_trip():
+    gdf = _points()
+    store = PointStore(gdf)
+    store.update(3, {'verified': True, 'confidence': 0.5})
+
+    frame = store.to_geodataframe()
+    assert frame.crs == gdf.crs
+    assert frame.dtypes.equals(gdf.dtypes)
+    assert frame.geometry.geom_equals(gdf.geometry).all()
+    assert frame['verified'].tolist() == [False] * 3 + [True] + [False] * 6
+    assert frame.loc[3, 'confidence'] == 0.5
+
+    # a value that does not fit the column keeps the others typed
+    store.update(4, {'class': 'water'})
+    frame = store.to_dataframe()
+    assert frame['class'].dtype == object
+    assert frame['verified'].dtype == bool
+    assert frame.loc[4, 'class'] == 'water'
+
+
+def test_table_view_refresh(monkeypatch):
+    store = PointStore(_points(50))
+    view = PointTableView(store, rows=10)
+    assert view.sheet.row_headers == [str(index) for index in range(10)]
+
+    refreshes = []
+    monkeypatch.setattr(
+        view, 'refresh', lambda: refreshes.append(view.start_widget.value))
+
+    # points outside the window leave the sheet alone
+    store.update(25, {'operator': 'water'})
+    assert refreshes == []
+    store.update(5, {'operator': 'water'})
+    assert refreshes == [0]
+
+    monkeypatch.undo()
+    view.start_widget.value = 20
+    assert view.sheet.row_headers == [str(index) for index in range(20, 30)]
+    operator = list(store.columns).index('operator')
+    assert view.cells[operator].value[5] == 'water'
+
+
+def test_layer_restyle():
+    store = PointStore(_points(10))
+    layer = PointLayer(store, classes=['other', 'water'], chunk_size=4)
+    chunks = [chunk.data for chunk in layer.layers]
+
+    sent = []
+    for chunk in layer.layers:
+        chunk.observe(lambda change: sent.append(change['owner']), 'data')
+
+    store.update(5, {'operator': 'water', 'verified': True})
+    assert sent == [layer.layers[1]]
+    assert [chunk.data for chunk in layer.layers[::2]] == chunks[::2]
+
+    style = layer.layers[1].data['features'][1]['properties']['style']
+    assert style == {
+        'color': 'green', 'fillColor': layer.palette['water'],
+        'fillOpacity': 0.9}
+
+    # legacy string flags use the shared verified check
+    store.update(6, {'verified': 'false'})
+    assert layer.point_style(6)['color'] == 'black'
@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pytest
+import rasterio
+
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from eo_validation.prepare_rasters import find_optimized, is_optimized, \
+    main, prepare_rasters
+
+SIZE = 1200
+
+
+def _write_raster(filename: str, tiled: bool) -> None:
+    profile = {
+        'driver': 'GTiff', 'width': SIZE, 'height': SIZE, 'count': 1,
+        'dtype': 'uint16', 'crs': 'EPSG:32628', 'tiled': tiled,
+        'transform': from_origin(300000, 1600000, 30, 30)}
+    if tiled:
+        profile.update(blockxsize=256, blockysize=256)
+    data = np.random.default_rng(0).integers(
+        0, 10000, (SIZE, SIZE), dtype=np.uint16)
+    with rasterio.open(filename, 'w', **profile) as dst:
+        dst.write(data, 1)
+        if tiled:
+            dst.build_overviews([2, 4], Resampling.average)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / 'data' / 'region'
+    data_dir.mkdir(parents=True)
+    _write_raster(str(data_dir / 'striped.tif'), tiled=False)
+    _write_raster(str(data_dir / 'tiled.tif'), tiled=True)
+    return str(tmp_path / 'data')
+
+
+def test_prepare_rasters(tmp_path, data_dir):
+    cog_dir = str(tmp_path / 'cogs')
+    striped = os.path.join(data_dir, 'region', 'striped.tif')
+    tiled = os.path.join(data_dir, 'region', 'tiled.tif')
+    assert not is_optimized(striped) and is_optimized(tiled)
+
+    summary = prepare_rasters(
+        data_dir, cog_dir, pattern='**/*.tif', n_workers=1, blocksize=256)
+    status = dict(zip(summary['raster'], summary['status']))
+    assert status == {striped: 'done', tiled: 'optimized'}
+
+    # the copy keeps the layout of data_dir, tiled with overviews
+    output_filename = os.path.join(cog_dir, 'region', 'striped.tif')
+    with rasterio.open(output_filename) as src:
+        assert src.profile['tiled']
+        assert src.block_shapes[0] == (256, 256)
+        assert src.overviews(1)
+    assert is_optimized(output_filename)
+    assert find_optimized(striped, data_dir, cog_dir) == output_filename
+
+    # the optimized raster is used as is
+    assert find_optimized(tiled, data_dir, cog_dir) == tiled
+    assert not os.path.exists(os.path.join(cog_dir, 'region', 'tiled.tif'))
+
+    summary = prepare_rasters(
+        data_dir, cog_dir, pattern='**/*.tif', n_workers=1, blocksize=256)
+    status = dict(zip(summary['raster'], summary['status']))
+    assert status == {striped: 'skipped', tiled: 'optimized'}
+
+
+def test_main(tmp_path, data_dir):
+    cog_dir = str(tmp_path / 'cogs')
+    assert main([
+        '--data-dir', data_dir, '--cog-dir', cog_dir,
+        '--pattern', '**/*.tif', '--n-workers', '1',
+        '--blocksize', '256']) == 0
+    assert os.listdir(os.path.join(cog_dir, 'region')) == ['striped.tif']
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+import pytest
+import rasterio
+
+from rasterio.transform import from_origin
+from eo_validation.cache import FileCache
+from eo_validation.raster_stats import compute_band_stats, get_band_stats
+
+
+def _write_raster(filename: str, data: np.ndarray, nodata=None) -> None:
+    with rasterio.open(
+            filename, 'w', driver='GTiff', width=data.shape[1],
+            height=data.shape[0], count=1, dtype=data.dtype, nodata=nodata,
+            crs='EPSG:32628',
+            transform=from_origin(300000, 1600000, 30, 30)) as dst:
+        dst.write(data, 1)
+
+
+def _rewrite(filename: str, value: int) -> None:
+    """
+    Change the pixels of a raster, keeping its size and mtime.
+    """
+    file_stat = os.stat(filename)
+    with rasterio.open(filename, 'r+') as dst:
+        dst.write(np.full((dst.height, dst.width), value, dtype='uint16'), 1)
+    assert os.stat(filename).st_size == file_stat.st_size
+    os.utime(filename, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+
+
+@pytest.fixture
+def filename(tmp_path):
+    filename = str(tmp_path / 'scene.tif')
+    _write_raster(filename, np.full((64, 64), 10, dtype='uint16'))
+    return filename
+
+
+def test_cache_hit(tmp_path, filename):
+    cache = FileCache(str(tmp_path / 'cache'), 'stats')
+    assert get_band_stats(filename, cache)['1']['mean'] == 10
+
+    # an unchanged signature is served from the cache
+    _rewrite(filename, 20)
+    assert get_band_stats(filename, cache)['1']['mean'] == 10
+
+    # a new modification time invalidates the entry
+    os.utime(filename)
+    assert get_band_stats(filename, cache)['1']['mean'] == 20
+
+    # so does a new size
+    _write_raster(filename, np.full((32, 32), 30, dtype='uint16'))
+    os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns))
+    assert get_band_stats(filename, cache)['1']['mean'] == 30
+
+
+def test_parameters_key(tmp_path, filename):
+    cache = FileCache(str(tmp_path / 'cache'), 'stats')
+    get_band_stats(filename, cache)
+    get_band_stats(filename, cache, max_size=16)
+    get_band_stats(filename, cache, exact=True)
+    assert len(os.listdir(cache.cache_dir)) == 3
+
+    # switching back to earlier parameters is still a hit
+    _rewrite(filename, 20)
+    for kwargs in [{}, {'max_size': 16}, {'exact': True}]:
+        assert get_band_stats(filename, cache, **kwargs)['1']['mean'] == 10
+
+
+@pytest.mark.parametrize('exact', [False, True])
+def test_nodata(tmp_path, exact):
+    filename = str(tmp_path / 'nodata.tif')
+    data = np.full((64, 64), 100, dtype='uint16')
+    data[:, :32] = 0
+    data[0, 32] = 50
+    _write_raster(filename, data, nodata=0)
+
+    stats = compute_band_stats(filename, exact=exact)['1']
+    assert stats['min'] == 50
+    assert stats['max'] == 100
+    assert stats['mean'] == pytest.approx((50 + 100 * 2047) / 2048)
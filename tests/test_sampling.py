@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+
+from rasterio.transform import from_origin
+from eo_validation.cache import FileCache
+from eo_validation.sampling import allocate_points, class_histogram, \
+    generate_points, is_verified, reproject_points
+
+CRS = 'EPSG:32628'
+SIZE = 200
+
+
+@pytest.fixture(scope='module')
+def mask_filename(tmp_path_factory):
+    """
+    Mask of classes 1 to 3 drawn per pixel, with some no-data, so a point
+    off its pixel centre lands on another class.
+    """
+    filename = str(tmp_path_factory.mktemp('mask') / 'scene_mask.tif')
+    mask = np.random.default_rng(0).choice(
+        [1, 2, 3, 255], p=[0.6, 0.25, 0.1, 0.05],
+        size=(SIZE, SIZE)).astype(np.uint8)
+    with rasterio.open(
+            filename, 'w', driver='GTiff', width=SIZE, height=SIZE,
+            count=1, dtype='uint8', crs=CRS, tiled=True, nodata=255,
+            blockxsize=64, blockysize=64,
+            transform=from_origin(300000, 1600000, 30, 30)) as dst:
+        dst.write(mask, 1)
+    return filename
+
+
+def test_allocate_points():
+    # classes start from 1, Olofsson total (0.3 * 0.3 / 0.01) ** 2 = 900
+    counts = np.array([0, 5000, 3000, 2000])
+    np.testing.assert_array_equal(
+        allocate_points(counts, [0.9, 0.9, 0.9], 0.01), [0, 450, 270, 180])
+
+    # the remainder of a static total goes to the first class
+    np.testing.assert_array_equal(
+        allocate_points(counts, [0.9], 0.01, n_points=101),
+        [0, 51, 30, 20])
+
+    # rounded proportions over 100% take the excess from the largest class
+    np.testing.assert_array_equal(
+        allocate_points([335, 335, 330], [0.9], 0.01, n_points=100),
+        [33, 34, 33])
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_points_on_their_class(tmp_path, mask_filename, cached):
+    histogram_cache = None
+    if cached:
+        histogram_cache = FileCache(str(tmp_path), 'histograms')
+        histogram_cache.put(
+            mask_filename, class_histogram(mask_filename).tolist())
+
+    points = generate_points(
+        None, mask_filename, n_points=300, chunks={'x': 64, 'y': 64},
+        histogram_cache=histogram_cache)
+
+    counts = class_histogram(mask_filename)
+    allocation = allocate_points(counts, [0.9], 0.01, n_points=300)
+    np.testing.assert_array_equal(
+        np.bincount(points['predicted'], minlength=3), allocation[1:4])
+
+    with rasterio.open(mask_filename) as src:
+        mask = src.read(1)
+        x, y = reproject_points(points['x'], points['y'], 'EPSG:4326', CRS)
+        rows, cols = rasterio.transform.rowcol(src.transform, x, y)
+
+    # every point is a distinct pixel of the class it was sampled from
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    assert len(set(zip(rows, cols))) == len(points)
+    np.testing.assert_array_equal(
+        mask[rows, cols] - 1, points['predicted'])
+
+
+def test_is_verified():
+    values = [True, np.True_, 1, 'true', False, 0, 'false', None, np.nan]
+    assert [is_verified(value) for value in values] == [True] * 4 + [False] * 5
+    assert is_verified(pd.Series(values, dtype=object)).tolist() == \
+        [True] * 4 + [False] * 5
@@ -0,0 +1,132 @@
+import time
+import pytest
+import multiprocessing
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from eo_validation.scheduler import PointScheduler
+from eo_validation.validation_store import ValidationStore
+
+N_PROCESSES = 8
+N_POINTS = 400
+
+
+def _drain(filename: str, username: str, overlap: int) -> list:
+    """
+    Label leased points until the scheduler has none left for username.
+    """
+    store = ValidationStore(filename)
+    scheduler = PointScheduler(store, overlap=overlap)
+    labelled = []
+    while True:
+        point_ids = scheduler.lease('scene', username, 5)
+        if not point_ids:
+            break
+        store.save_labels(
+            'scene', username,
+            {point_id: {'verified': True} for point_id in point_ids})
+        scheduler.complete('scene', username, point_ids)
+        labelled.extend(point_ids)
+    store.close()
+    return labelled
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ValidationStore(str(tmp_path / 'store.db'))
+    store.add_points(
+        'scene', range(6), range(6), range(6),
+        ['a', 'b', 'a', 'b', 'a', 'b'])
+    yield store
+    store.close()
+
+
+def test_lease_group(store):
+    scheduler = PointScheduler(store)
+    assert scheduler.lease('scene', 'user0', 10, group='a') == [0, 2, 4]
+    assert scheduler.lease('scene', 'user1', 10, group='b') == [1, 3, 5]
+
+
+def test_complete(store):
+    scheduler = PointScheduler(store)
+    assert scheduler.lease('scene', 'user0', 2) == [0, 1]
+
+    # a completed point without a verified label goes back to the queue
+    scheduler.complete('scene', 'user0', [0])
+    assert scheduler.lease('scene', 'user1', 2) == [0, 2]
+
+    store.save_labels('scene', 'user0', {1: {'verified': True}})
+    scheduler.complete('scene', 'user0', [1])
+    assert scheduler.lease('scene', 'user0', 10) == [3, 4, 5]
+
+
+def test_lease_exclusive(store):
+    scheduler = PointScheduler(store)
+    assert scheduler.lease('scene', 'user0', 4) == [0, 1, 2, 3]
+    assert scheduler.lease('scene', 'user1', 4) == [4, 5]
+    assert scheduler.lease('scene', 'user2', 4) == []
+
+    # with no new point left, a new lease renews theirs
+    assert scheduler.lease('scene', 'user0', 2) == [0, 1]
+
+
+def test_skip_then_lease(store):
+    scheduler = PointScheduler(store)
+    assert scheduler.lease('scene', 'user0', 2) == [0, 1]
+
+    # point 0 is skipped, the next batch moves on to new points
+    store.save_labels('scene', 'user0', {1: {'verified': True}})
+    scheduler.complete('scene', 'user0', [1])
+    assert scheduler.lease('scene', 'user0', 2) == [2, 3]
+    assert scheduler.lease('scene', 'user0', 3) == [4, 5, 0]
+
+    # the skipped point stays leased to user0 and comes back once the
+    # new points are done
+    assert scheduler.lease('scene', 'user1', 6) == []
+    assert scheduler.lease('scene', 'user0', 6) == [0, 2, 3, 4, 5]
+
+
+def test_overlap(store):
+    scheduler = PointScheduler(store, overlap=2)
+    assert scheduler.lease('scene', 'user0', 1) == [0]
+
+    # saved but not completed yet, user0 still counts once
+    store.save_labels('scene', 'user0', {0: {'verified': True}})
+    assert scheduler.lease('scene', 'user1', 1) == [0]
+    assert scheduler.lease('scene', 'user2', 1) == [1]
+
+
+def test_lease_expiry(store):
+    scheduler = PointScheduler(store, lease_seconds=0.1)
+    assert scheduler.lease('scene', 'user0', 6) == list(range(6))
+    assert scheduler.lease('scene', 'user1', 6) == []
+
+    # the abandoned session gives its points back
+    time.sleep(0.2)
+    assert scheduler.lease('scene', 'user1', 6) == list(range(6))
+
+
+@pytest.mark.parametrize('overlap', [1, 2])
+def test_concurrent_annotators(tmp_path, overlap):
+    filename = str(tmp_path / 'store.db')
+    store = ValidationStore(filename)
+    store.add_points(
+        'scene', range(N_POINTS), range(N_POINTS), range(N_POINTS))
+    PointScheduler(store)
+    store.close()
+
+    usernames = [f'user{index}' for index in range(N_PROCESSES)]
+    with ProcessPoolExecutor(
+            N_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn')) as executor:
+        labelled = list(executor.map(
+            _drain, [filename] * N_PROCESSES, usernames,
+            [overlap] * N_PROCESSES))
+
+    # every point is labelled by overlap annotators, never twice by one
+    for point_ids in labelled:
+        assert len(point_ids) == len(set(point_ids))
+    counts = Counter(
+        point_id for point_ids in labelled for point_id in point_ids)
+    assert sorted(counts) == list(range(N_POINTS))
+    assert set(counts.values()) == {overlap}
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+import geopandas as gpd
+
+from shapely.geometry import box
+from eo_validation.storage import read_table, write_table
+
+
+def _polygons() -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {'ID': [1, 2], 'Group': ['a', 'b']},
+        geometry=[box(0, 0, 1, 1), box(2, 0, 3, 1)], crs='EPSG:4326')
+
+
+def test_read_default_layer(tmp_path):
+    filename = str(tmp_path / 'polygons.gpkg')
+    _polygons().to_file(filename, layer='polys')
+
+    gdf = read_table(filename)
+    assert gdf['ID'].tolist() == [1, 2]
+
+
+def test_read_geojson(tmp_path):
+    filename = str(tmp_path / 'polygons.geojson')
+    _polygons().to_file(filename, driver='GeoJSON')
+
+    gdf = read_table(filename, columns=['ID'])
+    assert gdf['ID'].tolist() == [1, 2]
+
+
+def test_parquet_round_trip(tmp_path):
+    filename = str(tmp_path / 'polygons.parquet')
+    write_table(_polygons(), filename)
+
+    gdf = read_table(filename, filters=[('Group', '==', 'b')])
+    assert gdf['ID'].tolist() == [2]
+
+
+def _points(verified: list) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame({
+        'ID': [0, 1, 2],
+        'operator': ['forest', 'water', 'other'],
+        'burnt': [0, 1, 0],
+        'confidence': [1, 3, 2],
+        'verified': verified,
+        'date': ['2024-05-01 10:00:00', '2024-05-02 11:30:00', None],
+        'seconds_taken': [12.5, 3.0, None],
+    }, geometry=gpd.points_from_xy([0, 1, 2], [0, 1, 2]), crs='EPSG:4326')
+
+
+@pytest.mark.parametrize('extension', ['.gpkg', '.parquet'])
+def test_validation_columns_round_trip(tmp_path, extension):
+    filename = str(tmp_path / f'points{extension}')
+    write_table(_points([True, False, False]), filename)
+
+    gdf = read_table(filename)
+    assert gdf['operator'].tolist() == ['forest', 'water', 'other']
+    assert gdf['burnt'].tolist() == [0, 1, 0]
+    assert gdf['confidence'].tolist() == [1, 3, 2]
+    assert gdf['verified'].dtype == bool
+    assert gdf['verified'].tolist() == [True, False, False]
+    assert pd.to_datetime(gdf['date'][:2]).tolist() == [
+        pd.Timestamp('2024-05-01 10:00:00'),
+        pd.Timestamp('2024-05-02 11:30:00')]
+    assert pd.isna(gdf['date'][2])
+    assert gdf['seconds_taken'][:2].tolist() == [12.5, 3.0]
+    assert pd.isna(gdf['seconds_taken'][2])
+
+
+def test_parquet_legacy_verified(tmp_path):
+    filename = str(tmp_path / 'points.parquet')
+    write_table(_points([True, False, 'false']), filename)
+    assert read_table(filename)['verified'].tolist() == [True, False, False]
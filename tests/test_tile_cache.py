@@ -0,0 +1,96 @@
+import os
+import stat
+import time
+import pytest
+
+from eo_validation.tile_cache import CachedTileServer, TileCache, \
+    TilePrefetcher, tiles_in_view
+
+
+def test_private_directory(tmp_path):
+    cache = TileCache(str(tmp_path / 'tiles'))
+    cache.put(cache.key('tile'), b'png')
+
+    assert stat.S_IMODE(os.stat(cache.cache_dir).st_mode) == 0o700
+    filename = os.path.join(cache.cache_dir, f"{cache.key('tile')}.tile")
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+    assert cache.get(cache.key('tile')) == b'png'
+
+
+def test_refuse_world_writable(tmp_path):
+    cache_dir = tmp_path / 'tiles'
+    cache_dir.mkdir()
+    os.chmod(cache_dir, 0o777)
+    with pytest.raises(PermissionError):
+        TileCache(str(cache_dir))
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason='needs to change the owner')
+def test_refuse_other_owner(tmp_path):
+    cache_dir = tmp_path / 'tiles'
+    cache_dir.mkdir(mode=0o755)
+    os.chown(cache_dir, os.getuid() + 1000, -1)
+    with pytest.raises(PermissionError):
+        TileCache(str(cache_dir))
+
+
+def test_size_across_processes(tmp_path):
+    cache_dir = str(tmp_path / 'tiles')
+    first = TileCache(cache_dir, max_bytes=1000, size_check_interval=0.0)
+    second = TileCache(cache_dir, max_bytes=1000, size_check_interval=0.0)
+
+    # each cache writes less than max_bytes, together more
+    for tile in range(6):
+        first.put(first.key('first', tile), b'x' * 100)
+        second.put(second.key('second', tile), b'x' * 100)
+
+    assert first._disk_size() <= 1000
+
+
+def test_tiles_in_view():
+    # a 256 pixel view on the corner of four tiles
+    assert tiles_in_view(0, 0, 2, width=256, height=256) == [
+        (2, 1, 1), (2, 1, 2), (2, 2, 1), (2, 2, 2)]
+
+    # the tile holding the center comes first
+    assert tiles_in_view(10, 5, 3, width=300, height=200) == [
+        (3, 4, 3), (3, 3, 3), (3, 4, 4), (3, 3, 4)]
+
+    # wrapped around the antimeridian, clipped at the poles
+    assert set(tiles_in_view(0, 179.9, 2, width=256, height=256)) == {
+        (2, 3, 1), (2, 3, 2), (2, 0, 1), (2, 0, 2)}
+    assert tiles_in_view(85, 0, 1, width=512, height=512) == [
+        (1, 0, 0), (1, 1, 0), (1, 0, 1), (1, 1, 1)]
+
+
+def test_prefetcher(tmp_path):
+    # the upstream tile server is stubbed by tiles on disk
+    upstream_dir = tmp_path / 'upstream'
+    tiles = tiles_in_view(10, 5, 3, width=300, height=200)
+    for z, x, y in tiles[:3]:
+        (upstream_dir / str(z) / str(x)).mkdir(parents=True, exist_ok=True)
+        (upstream_dir / str(z) / str(x) / f'{y}.png').write_bytes(
+            f'{z}/{x}/{y}'.encode())
+
+    cache = TileCache(str(tmp_path / 'tiles'))
+    tile_server = CachedTileServer(cache)
+    try:
+        layer_key = tile_server.register(
+            f'file://{upstream_dir}/{{z}}/{{x}}/{{y}}.png', 'scene', 'rgb')
+        prefetcher = TilePrefetcher(tile_server)
+        prefetcher.prefetch(layer_key, tiles)
+
+        keys = [cache.key(layer_key, *tile) for tile in tiles]
+        deadline = time.monotonic() + 10
+        while prefetcher._pending or not all(
+                os.path.exists(cache._filename(key)) for key in keys[:3]):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+        # the missing upstream tile is skipped, the others are cached
+        for key, (z, x, y) in zip(keys, tiles[:3]):
+            assert cache.get(key) == f'{z}/{x}/{y}'.encode()
+        assert cache.get(keys[3]) is None
+        assert prefetcher.is_alive()
+    finally:
+        tile_server.shutdown()
@@ -0,0 +1,111 @@
+import os
+import atexit
+import numpy as np
+import pytest
+import geopandas as gpd
+
+from eo_validation.journal import EditJournal
+from eo_validation.storage import read_table
+from eo_validation.validation_database import build_database, \
+    find_validation_files, progress_report
+
+
+def write_validation_file(
+            data_dir: str,
+            username: str,
+            n_points: int,
+            **columns
+        ) -> str:
+    """
+    Write the validation file of an annotator with extra columns.
+    """
+    filename = os.path.join(
+        data_dir, username, 'data', 'region', f'{username}-scene.gpkg')
+    os.makedirs(os.path.dirname(filename))
+    gdf = gpd.GeoDataFrame({
+        'ID': np.arange(n_points),
+        'operator': 'other',
+        'burnt': 0,
+        'confidence': 1,
+        'verified': 'false',
+        'date': None,
+        'seconds_taken': None,
+        **columns
+    }, geometry=gpd.points_from_xy(
+        np.arange(n_points), np.arange(n_points)), crs='EPSG:4326')
+    gdf.to_file(filename, layer='validation')
+    return filename
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = str(tmp_path / 'validation')
+
+    # unlabelled file, then a labelled one with an extra column
+    write_validation_file(data_dir, 'user0', 3)
+    write_validation_file(
+        data_dir, 'user1', 2, Group='a', verified=True, seconds_taken=4.5,
+        date='2024-01-01')
+    return data_dir
+
+
+@pytest.mark.parametrize('extension', ['gpkg', 'parquet'])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_build_heterogeneous_files(data_dir, tmp_path, extension, reverse):
+    filenames = find_validation_files(data_dir)
+    if reverse:
+        filenames = filenames[::-1]
+    database_filename = str(tmp_path / f'database.{extension}')
+
+    # merge one file per run, so both files are appended in either order
+    for position in range(len(filenames)):
+        report = build_database(
+            filenames[:position + 1], database_filename, n_workers=1)
+        assert report['failed'] == []
+
+    gdf = read_table(database_filename).sort_values(
+        ['username', 'ID']).reset_index(drop=True)
+    assert gdf['username'].tolist() == ['user0'] * 3 + ['user1'] * 2
+    assert gdf['Group'].isna().tolist() == [True] * 3 + [False] * 2
+    assert gdf['verified'].tolist() == [False] * 3 + [True] * 2
+    assert gdf['seconds_taken'].dtype == np.float64
+    assert gdf['seconds_taken'].isna().sum() == 3
+
+
+def test_build_parallel(data_dir, tmp_path):
+    database_filename = str(tmp_path / 'database.gpkg')
+    report = build_database(
+        find_validation_files(data_dir), database_filename, n_workers=2)
+
+    assert report['added'] == 2 and report['failed'] == []
+    assert read_table(database_filename).shape[0] == 5
+
+
+def test_journal_edits(data_dir, tmp_path):
+    filename = find_validation_files(data_dir)[0]
+
+    # a session killed before compacting leaves its edits in the journal
+    journal = EditJournal(filename, user='user0', compact_interval=3600)
+    journal.append('ID', 1, {'verified': True, 'operator': 'burnt'})
+    atexit.unregister(journal.close)
+
+    cache_dir = str(tmp_path / 'cache')
+    progress = progress_report([filename], cache_dir, n_workers=1)
+    assert progress['n_verified'].tolist() == [1]
+
+    # the cached summary is stale once the journal grows
+    journal.append('ID', 2, {'verified': True})
+    progress = progress_report([filename], cache_dir, n_workers=1)
+    assert progress['n_verified'].tolist() == [2]
+
+    database_filename = str(tmp_path / 'database.gpkg')
+    build_database([filename], database_filename, n_workers=1)
+    gdf = read_table(database_filename).sort_values('ID')
+    assert gdf['verified'].tolist() == [False, True, True]
+    assert gdf['operator'].tolist() == ['other', 'burnt', 'other']
+
+    # later edits are merged on the next incremental run
+    journal.append('ID', 0, {'verified': True})
+    report = build_database([filename], database_filename, n_workers=1)
+    assert report['added'] == 1
+    assert read_table(database_filename)['verified'].all()
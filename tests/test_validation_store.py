@@ -0,0 +1,57 @@
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from eo_validation.validation_store import ValidationStore
+
+N_PROCESSES = 8
+N_LABELS = 200
+
+
+def _save_labels(filename: str, username: str) -> None:
+    store = ValidationStore(filename)
+    for point_id in range(N_LABELS):
+        store.save_labels('scene', username, {
+            point_id: {'operator': 'forest', 'verified': point_id % 2 == 0}})
+    store.close()
+
+
+def test_save_labels(tmp_path):
+    store = ValidationStore(str(tmp_path / 'store.db'))
+    store.add_points('scene', [0, 1], [10.0, 11.0], [20.0, 21.0])
+    store.save_labels('scene', 'user0', {0: {'operator': 'water'}})
+    store.save_labels('scene', 'user0', {
+        0: {'operator': 'forest', 'verified': True, 'confidence': 3}})
+    store.save_labels('scene', 'user1', {0: {'verified': 'false'}})
+
+    labels = store.read_labels(username='user0')
+    assert labels[['point_id', 'operator', 'verified', 'confidence']] \
+        .values.tolist() == [[0, 'forest', 1, 3]]
+
+    gdf = store.to_geodataframe(short_filename='scene')
+    assert sorted(gdf['username']) == ['user0', 'user1']
+    assert gdf.geometry.x.tolist() == [10.0, 10.0]
+
+    progress = store.progress()
+    assert progress[['username', 'n_points', 'n_verified']] \
+        .values.tolist() == [['user0', 2, 1], ['user1', 2, 0]]
+    store.close()
+
+
+def test_concurrent_sessions(tmp_path):
+    filename = str(tmp_path / 'store.db')
+    ValidationStore(filename).close()
+
+    usernames = [f'user{index}' for index in range(N_PROCESSES)]
+    with ProcessPoolExecutor(
+            N_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn')) as executor:
+        list(executor.map(_save_labels, [filename] * N_PROCESSES, usernames))
+
+    store = ValidationStore(filename)
+    labels = store.read_labels()
+    store.close()
+
+    # no label of any session is lost
+    assert len(labels) == N_PROCESSES * N_LABELS
+    assert labels.groupby('username')['verified'].sum().tolist() \
+        == [N_LABELS // 2] * N_PROCESSES
@@ -0,0 +1,62 @@
+import os
+import json
+import threading
+
+from eo_validation import whitebox_toolbox
+from eo_validation.whitebox_toolbox import ToolboxLoader, get_wbt_dict, \
+    whitebox_version
+
+TOOLS = {'Slope': {'name': 'Slope', 'parameters': []}}
+
+
+class _Whiteboxgui(object):
+    """
+    Stand-in for whiteboxgui, records the threads using it.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def get_wbt_dict(self):
+        self.calls.append(('get_wbt_dict', threading.current_thread()))
+        return TOOLS
+
+    def build_toolbox(self, tools_dict, **kwargs):
+        self.calls.append(('build_toolbox', threading.current_thread()))
+        return ('toolbox', tools_dict)
+
+
+def test_tools_cache(tmp_path, monkeypatch):
+    wbt = _Whiteboxgui()
+    monkeypatch.setattr(whitebox_toolbox, 'import_whiteboxgui', lambda: wbt)
+    cache_dir = str(tmp_path)
+    filename = os.path.join(
+        cache_dir, 'whitebox', f'tools-{whitebox_version()}.json')
+
+    get_wbt_dict.cache_clear()
+    assert get_wbt_dict(cache_dir) == TOOLS
+    with open(filename) as tools_file:
+        assert json.load(tools_file) == TOOLS
+
+    # a new process reads the file instead of asking WhiteboxTools
+    get_wbt_dict.cache_clear()
+    assert get_wbt_dict(cache_dir) == TOOLS
+    assert [call for call, _ in wbt.calls] == ['get_wbt_dict']
+    get_wbt_dict.cache_clear()
+
+
+def test_toolbox_on_calling_thread(tmp_path, monkeypatch):
+    wbt = _Whiteboxgui()
+    monkeypatch.setattr(whitebox_toolbox, 'import_whiteboxgui', lambda: wbt)
+
+    get_wbt_dict.cache_clear()
+    loader = ToolboxLoader(str(tmp_path))
+    toolbox = loader.result()
+    assert toolbox == ('toolbox', TOOLS)
+    assert loader.result() is toolbox
+    get_wbt_dict.cache_clear()
+
+    # only the dictionary is loaded in the background
+    assert wbt.calls == [
+        ('get_wbt_dict', loader),
+        ('build_toolbox', threading.current_thread())]